@@ -0,0 +1,472 @@
+"""Micro-benchmarks for the steganography engine
+
+Run from the repository root:
+
+    python scripts/benchmark.py lsb
+
+Carriers are the sizes produced by tests/data/generate_test_data.py. The
+generated files are used when present, otherwise random carriers of the
+same dimensions are created in memory.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests" / "data"))
+
+from steganography import SteganoExfil, KeySession  # noqa: E402
+from generate_test_data import CARRIER_SIZES  # noqa: E402
+
+DATA_DIR = ROOT / "tests" / "data"
+MAX_PAYLOAD = 1024 * 1024
+
+
+def load_carrier(width: int, height: int, ext: str = ".png") -> np.ndarray:
+    """Load a generated test carrier or create a random one"""
+    path = DATA_DIR / f"carrier_{width}x{height}{ext}"
+    if path.exists():
+        img = cv2.imread(str(path))
+        if img is not None:
+            return img
+    rng = np.random.default_rng(width * height)
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+def timed(func, repeat: int = 3) -> float:
+    """Return the best wall time of several runs in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _hide_lsb_reference(data: bytes, carrier: np.ndarray) -> np.ndarray:
+    """Per-bit LSB embedding as implemented before vectorization"""
+    binary_data = ''.join(format(byte, '08b') for byte in data)
+    flat_carrier = carrier.flatten()
+    for i in range(len(binary_data)):
+        flat_carrier[i] = (flat_carrier[i] & 254) | int(binary_data[i])
+    return flat_carrier.reshape(carrier.shape)
+
+
+def bench_lsb(args: argparse.Namespace) -> None:
+    """Compare per-bit and vectorized LSB embedding"""
+    stego = SteganoExfil()
+    print(f"{'carrier':>11} {'payload':>9} {'reference':>11} {'vectorized':>11} {'speedup':>8}")
+    for width, height in CARRIER_SIZES:
+        carrier = load_carrier(width, height)
+        payload = os.urandom(min(MAX_PAYLOAD, carrier.size // 8))
+
+        new = timed(lambda: stego._hide_lsb(payload, carrier), args.repeat)
+        if args.skip_reference:
+            print(f"{width}x{height:<6} {len(payload):>9} {'-':>11} {new * 1000:>9.2f}ms {'-':>8}")
+            continue
+        old = timed(lambda: _hide_lsb_reference(payload, carrier), 1)
+        print(f"{width}x{height:<6} {len(payload):>9} {old * 1000:>9.1f}ms "
+              f"{new * 1000:>9.2f}ms {old / new:>7.0f}x")
+
+
+def _extract_lsb_reference(stego: np.ndarray) -> bytes:
+    """Whole-image string-based LSB extraction as implemented before"""
+    extracted_bits = [str(pixel & 1) for pixel in stego.flatten()]
+    return bytes(int(''.join(extracted_bits[i:i+8]), 2)
+                 for i in range(0, len(extracted_bits), 8))
+
+
+def bench_extract(args: argparse.Namespace) -> None:
+    """Compare whole-image and header-first LSB extraction of a 1 KB payload"""
+    stego = SteganoExfil()
+    payload = os.urandom(1024)
+    framed = len(payload).to_bytes(4, byteorder='big') + payload
+    print(f"{'carrier':>11} {'reference':>11} {'header-first':>13} {'speedup':>8}")
+    for width, height in CARRIER_SIZES:
+        image = stego._hide_lsb(framed, load_carrier(width, height))
+
+        new = timed(lambda: stego._extract_lsb(image), args.repeat)
+        if args.skip_reference:
+            print(f"{width}x{height:<6} {'-':>11} {new * 1000:>11.3f}ms {'-':>8}")
+            continue
+        old = timed(lambda: _extract_lsb_reference(image), 1)
+        print(f"{width}x{height:<6} {old * 1000:>9.1f}ms {new * 1000:>11.3f}ms {old / new:>7.0f}x")
+
+
+def bench_dct(args: argparse.Namespace) -> None:
+    """Measure block DCT embedding and extraction throughput at full capacity"""
+    stego = SteganoExfil()
+    print(f"{'carrier':>11} {'payload':>9} {'hide':>10} {'extract':>10} {'MB/s':>7}")
+    for width, height in CARRIER_SIZES:
+        carrier = load_carrier(width, height)
+        payload = os.urandom(stego.capacity(carrier.shape, 'dct').raw_bytes)
+
+        hide = timed(lambda: stego._hide_dct(payload, carrier), args.repeat)
+        image = stego._hide_dct(payload, carrier)
+        read = timed(lambda: stego._read_dct(image, 0, len(payload)), args.repeat)
+        print(f"{width}x{height:<6} {len(payload):>9} {hide * 1000:>8.1f}ms "
+              f"{read * 1000:>8.1f}ms {len(payload) / hide / 1e6:>7.2f}")
+
+
+def _prepare_jpeg_reference(image_path: str) -> np.ndarray:
+    """JPEG normalization through a temporary PNG as implemented before"""
+    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    temp_path = image_path + '.tmp.png'
+    cv2.imwrite(temp_path, img)
+    img = cv2.imread(temp_path)
+    os.remove(temp_path)
+    return img
+
+
+def bench_jpeg(args: argparse.Namespace) -> None:
+    """Compare temp-file and in-memory JPEG carrier loading for a batch"""
+    import tempfile
+
+    stego = SteganoExfil()
+    batch = 20
+    print(f"{'carrier':>11} {'batch':>6} {'temp PNG':>10} {'in-memory':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES:
+            path = os.path.join(tmp, f"carrier_{width}x{height}.jpg")
+            cv2.imwrite(path, load_carrier(width, height, ".jpg"))
+
+            old = timed(lambda: [_prepare_jpeg_reference(path) for _ in range(batch)], 1)
+            new = timed(lambda: [stego._prepare_carrier_image(path) for _ in range(batch)], 1)
+            print(f"{width}x{height:<6} {batch:>6} {old * 1000:>8.0f}ms "
+                  f"{new * 1000:>8.0f}ms {old / new:>7.1f}x")
+
+
+def bench_session(args: argparse.Namespace) -> None:
+    """Compare per-hide key derivation with one KeySession for a batch"""
+    stego = SteganoExfil()
+    batch = 20
+    payload = os.urandom(1024)
+    print(f"{'carrier':>11} {'batch':>6} {'password':>10} {'session':>10} {'speedup':>8}")
+    for width, height in CARRIER_SIZES:
+        carrier = load_carrier(width, height)
+
+        old = timed(lambda: [stego.hide_array(payload, carrier, "password", method='lsb')
+                             for _ in range(batch)], 1)
+        new = timed(lambda: [stego.hide_array(payload, carrier, session, method='lsb')
+                             for session in [KeySession("password")] for _ in range(batch)], 1)
+        print(f"{width}x{height:<6} {batch:>6} {old * 1000:>8.0f}ms "
+              f"{new * 1000:>8.0f}ms {old / new:>7.1f}x")
+
+
+def bench_probe(args: argparse.Namespace) -> None:
+    """Compare full-decode and partial-read probing of a directory of PNGs"""
+    import tempfile
+
+    stego = SteganoExfil()
+    count = 1000
+    session = KeySession("password")
+    print(f"{'carrier':>11} {'images':>7} {'full decode':>12} {'probe':>8} {'probe -j':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[:3]:
+            carrier = load_carrier(width, height)
+            paths = []
+            for i in range(count):
+                image = carrier
+                if i % 10 == 0:
+                    image = stego.hide_array(b"payload %d" % i, carrier, session, method='lsb')
+                paths.append(os.path.join(tmp, f"{width}x{height}_{i:05d}.png"))
+                cv2.imwrite(paths[-1], image)
+
+            def full_decode():
+                for path in paths:
+                    try:
+                        stego.read_header(stego._prepare_carrier_image(path), 'lsb')
+                    except Exception:
+                        pass
+
+            old = timed(full_decode, 1)
+            serial = timed(lambda: list(stego.probe_many(paths, workers=1)), 1)
+            pooled = timed(lambda: list(stego.probe_many(paths)), 1)
+            print(f"{width}x{height:<6} {count:>7} {old * 1000:>10.0f}ms {serial * 1000:>6.0f}ms "
+                  f"{pooled * 1000:>7.0f}ms {old / pooled:>7.0f}x")
+
+
+def bench_shard(args: argparse.Namespace) -> None:
+    """Split one payload across a set of carriers with 1 and N worker processes"""
+    import tempfile
+
+    stego = SteganoExfil()
+    count = 8
+    workers = os.cpu_count() or 1
+    print(f"{'carrier':>11} {'images':>7} {'payload':>9} {'hide -j1':>9} {'hide -jN':>9} "
+          f"{'extract -j1':>12} {'extract -jN':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[1:]:
+            carrier = load_carrier(width, height)
+            carriers = [os.path.join(tmp, f"c{i}.png") for i in range(count)]
+            outputs = [os.path.join(tmp, f"s{i}.png") for i in range(count)]
+            for path in carriers:
+                cv2.imwrite(path, carrier)
+            room = stego.capacity(carrier.shape, 'lsb').payload_bytes
+            data = os.urandom(room * count // 2)
+            session = KeySession("password")
+
+            times = []
+            for jobs in (1, workers):
+                times.append(timed(lambda: stego.hide_sharded(
+                    data, carriers, outputs, session, method='lsb', workers=jobs), args.repeat))
+            for jobs in (1, workers):
+                times.append(timed(lambda: stego.extract_sharded(
+                    outputs, session, method='lsb', workers=jobs), args.repeat))
+            print(f"{width}x{height:<6} {count:>7} {len(data) / 2**20:>7.1f}MB "
+                  + " ".join(f"{t * 1000:>{w}.0f}ms" for t, w in zip(times, (7, 7, 10, 10))))
+
+
+def bench_fanout(args: argparse.Namespace) -> None:
+    """Embed one payload into many carriers: hide_data per carrier vs hide_fanout"""
+    import tempfile
+
+    stego = SteganoExfil()
+    count = 100
+    workers = os.cpu_count() or 1
+    data = b"provenance: " + os.urandom(256)
+    print(f"{'carrier':>11} {'images':>7} {'hide_data':>10} {'fanout -j1':>11} "
+          f"{'fanout -jN':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[:3]:
+            carrier = load_carrier(width, height)
+            carriers = [os.path.join(tmp, f"c{i}.png") for i in range(count)]
+            outputs = [os.path.join(tmp, f"s{i}.png") for i in range(count)]
+            for path in carriers:
+                cv2.imwrite(path, carrier)
+
+            def per_carrier():
+                for carrier_path, output in zip(carriers, outputs):
+                    stego.hide_data(data, carrier_path, output, "password", method='lsb')
+
+            old = timed(per_carrier, 1)
+            serial = timed(lambda: list(stego.hide_fanout(
+                data, carriers, outputs, "password", method='lsb', workers=1)), 1)
+            pooled = timed(lambda: list(stego.hide_fanout(
+                data, carriers, outputs, "password", method='lsb', workers=workers)), 1)
+            print(f"{width}x{height:<6} {count:>7} {old * 1000:>8.0f}ms {serial * 1000:>9.0f}ms "
+                  f"{pooled * 1000:>9.0f}ms {old / min(serial, pooled):>7.1f}x")
+
+
+def bench_plan(args: argparse.Namespace) -> None:
+    """Place payloads by trying hide_data per carrier vs planning from headers"""
+    import tempfile
+    from steganography.planner import plan_jobs
+
+    stego = SteganoExfil()
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        carriers = []
+        for i, (width, height) in enumerate(CARRIER_SIZES[:3] * 4):
+            carriers.append(os.path.join(tmp, f"c{i}.png"))
+            cv2.imwrite(carriers[-1], load_carrier(width, height))
+        payloads = []
+        for i in range(40):
+            payloads.append(os.path.join(tmp, f"p{i}.bin"))
+            Path(payloads[-1]).write_bytes(os.urandom(int(rng.integers(100, 60000))))
+
+        def trial():
+            # Try carriers in order until one accepts the payload
+            for payload in payloads:
+                data = Path(payload).read_bytes()
+                for carrier in carriers:
+                    try:
+                        stego.hide_data(data, carrier, os.path.join(tmp, "out.png"),
+                                        "password", method='lsb')
+                        break
+                    except Exception:
+                        continue
+
+        old = timed(trial, 1)
+        new = timed(lambda: plan_jobs(payloads, carriers, tmp, method='lsb'), args.repeat)
+        plan = plan_jobs(payloads, carriers, tmp, method='lsb')
+        print(f"{len(payloads)} payloads, {len(carriers)} carriers: trial and error "
+              f"{old * 1000:.0f}ms, plan {new * 1000:.1f}ms "
+              f"({len(plan.jobs)} carriers used, {len(plan.unplaced)} unplaced)")
+
+
+def bench_batch(args: argparse.Namespace) -> None:
+    """Throughput of hide_many / extract_many as the worker count grows"""
+    import tempfile
+    from steganography import HideJob, ExtractJob
+
+    stego = SteganoExfil()
+    count = 48
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, cpus} | {n for n in (2, 4, 8, 16, 32) if n < cpus})
+    print(f"{'carrier':>11} {'jobs':>5} {'workers':>8} {'hide':>10} {'extract':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[1:3]:
+            carrier = load_carrier(width, height)
+            carrier_path = os.path.join(tmp, "carrier.png")
+            cv2.imwrite(carrier_path, carrier)
+            jobs = [HideJob(os.urandom(4096), carrier_path, os.path.join(tmp, f"s{i}.png"))
+                    for i in range(count)]
+            extract_jobs = [ExtractJob(job.output) for job in jobs]
+            for workers in counts:
+                hide = timed(lambda: list(stego.hide_many(jobs, "password", workers)), 1)
+                extract = timed(lambda: list(stego.extract_many(extract_jobs, "password",
+                                                                workers)), 1)
+                print(f"{width}x{height:<6} {count:>5} {workers:>8} {count / hide:>7.1f}/s "
+                      f"{count / extract:>7.1f}/s")
+
+
+def bench_shared(args: argparse.Namespace) -> None:
+    """Cost of handing an array carrier to a worker and its stego array back"""
+    import pickle
+    from steganography import HideJob
+    from steganography.batch import SharedArray
+
+    print(f"{'carrier':>11} {'pickled job':>12} {'shared job':>11} {'pickle':>9} {'shared':>9}")
+    for width, height in CARRIER_SIZES:
+        carrier = load_carrier(width, height)
+        job = HideJob(b"x" * 4096, carrier)
+
+        def pickled():
+            # Job to the worker, stego array back
+            received = pickle.loads(pickle.dumps(job))
+            pickle.loads(pickle.dumps(received.carrier))
+
+        def shared():
+            with SharedArray.copy_of(carrier) as block:
+                pickle.loads(pickle.dumps(job._replace(carrier=block.ref)))
+                block.array.copy()
+
+        with SharedArray.copy_of(carrier) as block:
+            shared_size = len(pickle.dumps(job._replace(carrier=block.ref)))
+        print(f"{width}x{height:<6} {len(pickle.dumps(job)):>11,}B {shared_size:>10,}B "
+              f"{timed(pickled, args.repeat) * 1000:>7.1f}ms "
+              f"{timed(shared, args.repeat) * 1000:>7.1f}ms")
+
+
+def bench_pipeline(args: argparse.Namespace) -> None:
+    """hide_many against the staged hide_pipeline, with stage utilization"""
+    import tempfile
+    from steganography import HideJob
+
+    stego = SteganoExfil()
+    count = 24
+    workers = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[1:3]:
+            carrier_path = os.path.join(tmp, "carrier.png")
+            cv2.imwrite(carrier_path, load_carrier(width, height))
+            jobs = [HideJob(os.urandom(4096), carrier_path, os.path.join(tmp, f"s{i}.png"))
+                    for i in range(count)]
+            many = timed(lambda: list(stego.hide_many(jobs, "password", workers)), 1)
+            pipeline = stego.hide_pipeline(jobs, "password", workers=workers)
+            staged = timed(lambda: list(pipeline), 1)
+            usage = ", ".join(f"{s.name} {s.utilization:.0%}" for s in pipeline.stats())
+            print(f"{width}x{height}: hide_many {count / many:.1f}/s, "
+                  f"pipeline {count / staged:.1f}/s ({usage})")
+
+
+def bench_async(args: argparse.Namespace) -> None:
+    """Throughput of concurrent ahide/aextract and the event loop lag they cause"""
+    import asyncio
+    import tempfile
+    from steganography import KeyCache
+
+    engine = SteganoExfil(key_cache=KeyCache())
+    count = 16
+
+    async def run(carrier_path: str, outputs: list) -> tuple:
+        lags, done = [], asyncio.Event()
+
+        async def ticker():
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - start - 0.001)
+
+        tick = asyncio.create_task(ticker())
+        limiter = asyncio.Semaphore(os.cpu_count() or 1)
+        start = time.perf_counter()
+        await asyncio.gather(*(engine.ahide(os.urandom(4096), carrier_path, output,
+                                            "password", limiter=limiter) for output in outputs))
+        await asyncio.gather(*(engine.aextract(output, "password", limiter=limiter)
+                               for output in outputs))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await tick
+        lags.sort()
+        return elapsed, lags[int(len(lags) * 0.99)], lags[-1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[1:3]:
+            carrier_path = os.path.join(tmp, "carrier.png")
+            cv2.imwrite(carrier_path, load_carrier(width, height))
+            outputs = [os.path.join(tmp, f"s{i}.png") for i in range(count)]
+            elapsed, p99, worst = asyncio.run(run(carrier_path, outputs))
+            print(f"{width}x{height}: {2 * count / elapsed:.1f} calls/s, "
+                  f"loop lag p99 {p99 * 1000:.1f}ms, max {worst * 1000:.1f}ms")
+
+
+def bench_threads(args: argparse.Namespace) -> None:
+    """Batch throughput with one native thread per worker against oversubscription"""
+    import tempfile
+    from steganography import HideJob
+    from steganography.threads import configure_threads
+
+    stego = SteganoExfil()
+    cores = os.cpu_count() or 1
+    workers = max(2, cores)
+    count = 4 * workers
+    # (label, thread budget, workers); each worker gets budget // workers
+    # native threads, so the last setup is what every worker got by default
+    # before the budget existed
+    setups = [(f"serial x {cores} thread{'s' if cores > 1 else ''}", cores, 1),
+              (f"{workers} workers x 1 thread", workers, workers),
+              (f"{workers} workers x {workers} threads", workers * workers, workers)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in CARRIER_SIZES[2:4]:
+            carrier_path = os.path.join(tmp, "carrier.png")
+            cv2.imwrite(carrier_path, load_carrier(width, height))
+            jobs = [HideJob(os.urandom(32768), carrier_path, os.path.join(tmp, f"s{i}.png"))
+                    for i in range(count)]
+            rates = []
+            for label, budget, pool in setups:
+                configure_threads(budget)
+                elapsed = timed(lambda: list(stego.hide_many(jobs, "password", pool)),
+                                args.repeat)
+                rates.append(f"{label} {count / elapsed:.1f}/s")
+            configure_threads(cores)
+            print(f"{width}x{height}: " + ", ".join(rates))
+
+
+BENCHMARKS = {
+    "jpeg": bench_jpeg,
+    "lsb": bench_lsb,
+    "extract": bench_extract,
+    "dct": bench_dct,
+    "session": bench_session,
+    "probe": bench_probe,
+    "shard": bench_shard,
+    "fanout": bench_fanout,
+    "plan": bench_plan,
+    "batch": bench_batch,
+    "shared": bench_shared,
+    "pipeline": bench_pipeline,
+    "async": bench_async,
+    "threads": bench_threads,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Steganography engine benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Repetitions per measurement")
+    parser.add_argument("--skip-reference", action="store_true",
+                        help="Skip the slow pre-optimization reference implementations")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
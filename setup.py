@@ -50,7 +50,8 @@ setup(
     },
     entry_points={
         "console_scripts": [
-            "stego-cli=steganography.cli:main",
+            "stego-cli=interfaces.client:main",
+            "stego-server=interfaces.server:main",
             "stego-gui=interfaces.desktop.app:main",
             "stego-web=interfaces.web.app:main",
         ],
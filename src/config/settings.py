@@ -21,7 +21,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -73,7 +74,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -125,7 +127,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -177,7 +180,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -229,7 +233,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -281,7 +286,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -333,7 +339,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -385,7 +392,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -437,7 +445,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -489,7 +498,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -541,7 +551,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -593,7 +604,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -645,7 +657,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -697,7 +710,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -749,7 +763,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -801,7 +816,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -853,7 +869,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -905,7 +922,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -957,7 +975,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1009,7 +1028,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1061,7 +1081,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1113,7 +1134,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1165,7 +1187,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1217,7 +1240,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1269,7 +1293,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1321,7 +1346,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1373,7 +1399,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1425,7 +1452,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1477,7 +1505,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1529,7 +1558,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1581,7 +1611,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1633,7 +1664,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1685,7 +1717,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1737,7 +1770,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1789,7 +1823,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1841,7 +1876,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1893,7 +1929,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1945,7 +1982,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1997,7 +2035,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2049,7 +2088,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2101,7 +2141,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2153,7 +2194,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2205,7 +2247,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2257,7 +2300,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2309,7 +2353,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2361,7 +2406,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2413,7 +2459,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2465,7 +2512,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2517,7 +2565,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2569,7 +2618,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2621,7 +2671,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2673,7 +2724,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2725,7 +2777,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2777,7 +2830,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2829,7 +2883,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2881,7 +2936,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2933,7 +2989,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -2985,7 +3042,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3037,7 +3095,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3089,7 +3148,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3141,7 +3201,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3193,7 +3254,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3245,7 +3307,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3297,7 +3360,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3349,7 +3413,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3401,7 +3466,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3453,7 +3519,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3505,7 +3572,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3557,7 +3625,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3609,7 +3678,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3661,7 +3731,8 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -3713,7 +3784,9 @@ class Settings:
             "recent_files": [],
             "auto_cleanup": True,
             "preview_size": (300, 300),
-            "max_recent_files": 5
+            "max_recent_files": 5,
+            "compression_level": 6,
+            "threads": None  # None: $STEGO_THREADS, else the CPU count
         }
         
     def load(self) -> None:
@@ -1,41 +1,159 @@
 import argparse
+import csv
+import glob
+import json
 import sys
+import time
 from pathlib import Path
 from typing import Optional
-from steganography import SteganoExfil
+from steganography import SteganoExfil, KeySession, HideJob, ExtractJob
+from steganography.batch import JobStore
+from steganography.compression import CODECS
+from steganography.planner import STRATEGIES, manifest, plan_jobs, read_manifest, write_manifest
+from steganography.threads import configure_threads, resolve_threads
 from steganography.exceptions import SteganoError
 
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+def memory_size(text: str) -> int:
+    """Parse a byte count such as 512M or 4G (binary units)"""
+    value = text.strip().upper().rstrip('B').rstrip('I')
+    unit = value[-1:] if value[-1:] in SIZE_UNITS else ''
+    try:
+        size = int(float(value[:len(value) - len(unit)]) * SIZE_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive: {text}")
+    return size
+
 class CLI:
     def __init__(self):
         self.stego = SteganoExfil()
         self.parser = self._create_parser()
+        # Off where the process's threads are already sized, e.g. in a server worker
+        self.manage_threads = True
         
     def _create_parser(self) -> argparse.ArgumentParser:
         """Create command line argument parser"""
         parser = argparse.ArgumentParser(
             description="Steganography Tool - Hide and extract data in images"
         )
+        parser.add_argument('--threads', type=int, default=None,
+                            help='Threads shared by OpenCV, BLAS and worker processes '
+                                 '(default: $STEGO_THREADS or the CPU count); '
+                                 'batch workers get one each')
         
         subparsers = parser.add_subparsers(dest='command', required=True)
         
         # Hide command
         hide_parser = subparsers.add_parser('hide', help='Hide data in image')
-        hide_parser.add_argument('-i', '--input', required=True, help='Carrier image path')
-        hide_parser.add_argument('-d', '--data', required=True, help='Data file to hide')
-        hide_parser.add_argument('-o', '--output', required=True, help='Output image path')
+        carriers = hide_parser.add_mutually_exclusive_group(required=True)
+        carriers.add_argument('-i', '--input', nargs='+', help='Carrier image path(s)')
+        carriers.add_argument('--carriers', metavar='GLOB',
+                              help='Embed one data file into every carrier matching GLOB '
+                                   '(quote it; ** matches subdirectories)')
+        hide_parser.add_argument('-d', '--data', required=True, nargs='+',
+                               help='Data file(s) to hide, one per carrier or one for all')
+        hide_parser.add_argument('-o', '--output', required=True,
+                               help='Output image path, or directory for several carriers')
         hide_parser.add_argument('-p', '--password', required=True, help='Encryption password')
         hide_parser.add_argument('-m', '--method', choices=['dct', 'lsb'], 
                                default='dct', help='Steganography method')
         hide_parser.add_argument('-q', '--quality', type=float, default=0.8,
                                help='Image quality (0.1-1.0)')
+        hide_parser.add_argument('-a', '--archive', action='store_true',
+                               help='Pack all data files into one archive in a single carrier')
+        hide_parser.add_argument('-s', '--shard', action='store_true',
+                               help='Split one data file across all carriers')
+        hide_parser.add_argument('-j', '--jobs', type=int, default=None,
+                               help='Worker processes for --shard and --carriers '
+                                    '(default: thread budget)')
+        hide_parser.add_argument('-z', '--compression-level', type=int, default=6,
+                               choices=range(10), metavar='0-9',
+                               help='Compression level, 0 disables (default: 6)')
         
         # Extract command
         extract_parser = subparsers.add_parser('extract', help='Extract hidden data')
-        extract_parser.add_argument('-i', '--input', required=True, help='Stego image path')
-        extract_parser.add_argument('-o', '--output', required=True, help='Output file path')
+        extract_parser.add_argument('-i', '--input', required=True, nargs='+',
+                                  help='Stego image path, or all images of a shard set')
+        extract_parser.add_argument('-o', '--output',
+                                  help='Output file path, or directory for a whole archive')
         extract_parser.add_argument('-p', '--password', required=True, help='Decryption password')
         extract_parser.add_argument('-m', '--method', choices=['dct', 'lsb'],
                                   default='dct', help='Steganography method')
+        extract_parser.add_argument('--list', action='store_true',
+                                  help='List the members of an archive')
+        extract_parser.add_argument('--member', help='Extract one archive member by name')
+        extract_parser.add_argument('-s', '--shard', action='store_true',
+                                  help='Reassemble data split across the input images')
+        extract_parser.add_argument('-j', '--jobs', type=int, default=None,
+                                  help='Worker processes for --shard (default: thread budget)')
+        
+        # Probe command
+        probe_parser = subparsers.add_parser(
+            'probe', help='Find images carrying hidden data (no password needed)')
+        probe_parser.add_argument('paths', nargs='+', help='Images or directories to scan')
+        probe_parser.add_argument('-r', '--recursive', action='store_true',
+                                help='Scan directories recursively')
+        probe_parser.add_argument('-j', '--jobs', type=int, default=None,
+                                help='Worker processes (default: thread budget)')
+        probe_parser.add_argument('-a', '--all', action='store_true',
+                                help='Also report images without hidden data')
+        
+        # Plan command
+        plan_parser = subparsers.add_parser(
+            'plan', help='Assign many payload files to carriers by capacity')
+        plan_source = plan_parser.add_mutually_exclusive_group(required=True)
+        plan_source.add_argument('-d', '--data', nargs='+',
+                                 help='Payload files or directories')
+        plan_source.add_argument('--from', dest='from_manifest', metavar='MANIFEST',
+                                 help='Execute a previously written manifest')
+        plan_parser.add_argument('-c', '--carriers', nargs='+',
+                                 help='Carrier images or directories')
+        plan_parser.add_argument('-o', '--output', help='Output directory for stego images')
+        plan_parser.add_argument('-m', '--method', choices=['dct', 'lsb'],
+                                 default='dct', help='Steganography method')
+        plan_parser.add_argument('--strategy', choices=STRATEGIES, default='fewest',
+                                 help='Use the fewest carriers, or spread the load (default: fewest)')
+        plan_parser.add_argument('-r', '--recursive', action='store_true',
+                                 help='Scan directories recursively')
+        plan_parser.add_argument('--manifest', help='Write the plan to this JSON file '
+                                                    '(default: print it)')
+        plan_parser.add_argument('-p', '--password', help='Execute the plan with this password')
+        plan_parser.add_argument('-z', '--compression-level', type=int, default=6,
+                                 choices=range(10), metavar='0-9',
+                                 help='Compression level, 0 disables (default: 6)')
+        
+        # Batch command
+        batch_parser = subparsers.add_parser(
+            'batch', help='Run many hides or extractions, resumable after interruption')
+        batch_parser.add_argument('kind', choices=['hide', 'extract'], help='Job kind')
+        batch_parser.add_argument('source', nargs='?',
+                                  help='CSV of jobs, a directory of images, or a plan '
+                                       'manifest (.json) from "plan --manifest"; '
+                                       'omit to resume the jobs already in --db')
+        batch_parser.add_argument('--db', default='stego-batch.sqlite',
+                                  help='SQLite job manifest (default: stego-batch.sqlite)')
+        batch_parser.add_argument('-p', '--password', required=True, help='Password')
+        batch_parser.add_argument('-d', '--data',
+                                  help='Payload file for every carrier of a directory source')
+        batch_parser.add_argument('-o', '--output',
+                                  help='Output directory for a directory source')
+        batch_parser.add_argument('-m', '--method', choices=['dct', 'lsb'], default='dct',
+                                  help='Method for jobs that do not name one')
+        batch_parser.add_argument('-r', '--recursive', action='store_true',
+                                  help='Scan a directory source recursively')
+        batch_parser.add_argument('-j', '--jobs', type=int, default=None,
+                                  help='Worker processes (default: thread budget)')
+        batch_parser.add_argument('--retry-failed', action='store_true',
+                                  help='Also rerun jobs that failed before')
+        batch_parser.add_argument('--pipeline', action='store_true',
+                                  help='Hide with overlapping read, embed and write stages '
+                                       'and report how busy each stage was')
+        batch_parser.add_argument('--memory-budget', type=memory_size, metavar='SIZE',
+                                  help='Admit jobs so their estimated peak memory stays '
+                                       'within SIZE, e.g. 4G, and report actual peaks')
         
         return parser
         
@@ -43,11 +161,19 @@ class CLI:
         """Run CLI with optional arguments"""
         try:
             parsed_args = self.parser.parse_args(args)
+            if self.manage_threads:
+                configure_threads(resolve_threads(parsed_args.threads))
             
             if parsed_args.command == 'hide':
                 return self._handle_hide(parsed_args)
             elif parsed_args.command == 'extract':
                 return self._handle_extract(parsed_args)
+            elif parsed_args.command == 'probe':
+                return self._handle_probe(parsed_args)
+            elif parsed_args.command == 'plan':
+                return self._handle_plan(parsed_args)
+            elif parsed_args.command == 'batch':
+                return self._handle_batch(parsed_args)
                 
         except SteganoError as e:
             print(f"Error: {str(e)}", file=sys.stderr)
@@ -59,24 +185,152 @@ class CLI:
         return 0
         
     def _handle_hide(self, args: argparse.Namespace) -> int:
-        """Handle hide command"""
-        with open(args.data, 'rb') as f:
-            data = f.read()
-            
-        self.stego.hide_data(
-            data=data,
-            carrier_image_path=args.input,
+        """Handle hide command
+
+        The password is stretched once and shared by all carriers.
+        """
+        if args.carriers:
+            return self._hide_fanout(args)
+        if args.archive:
+            return self._hide_archive(args)
+        if args.shard:
+            return self._hide_sharded(args)
+        if len(args.data) not in (1, len(args.input)):
+            self.parser.error("give one data file, or one per carrier")
+        data_files = args.data * len(args.input) if len(args.data) == 1 else args.data
+
+        if len(args.input) == 1:
+            outputs = [args.output]
+        else:
+            Path(args.output).mkdir(parents=True, exist_ok=True)
+            outputs = [str(Path(args.output) / (Path(p).stem + '.png')) for p in args.input]
+
+        session = KeySession(args.password)
+        for carrier, data_file, output in zip(args.input, data_files, outputs):
+            with open(data_file, 'rb') as f:
+                data = f.read()
+
+            self.stego.hide_data(
+                data=data,
+                carrier_image_path=carrier,
+                output_path=output,
+                password=session,
+                method=args.method,
+                quality=args.quality,
+                compression_level=args.compression_level
+            )
+
+            print(f"Data hidden successfully in {output}")
+        return 0
+        
+    def _hide_archive(self, args: argparse.Namespace) -> int:
+        """Hide all data files as one archive, named by their file names"""
+        if len(args.input) != 1:
+            self.parser.error("--archive takes a single carrier")
+        files = [(Path(p).name, Path(p).read_bytes()) for p in args.data]
+
+        self.stego.hide_archive(
+            files=files,
+            carrier_image_path=args.input[0],
             output_path=args.output,
             password=args.password,
             method=args.method,
-            quality=args.quality
+            quality=args.quality,
+            compression_level=args.compression_level
         )
+
+        print(f"{len(files)} files hidden successfully in {args.output}")
+        return 0
         
-        print(f"Data hidden successfully in {args.output}")
+    def _hide_fanout(self, args: argparse.Namespace) -> int:
+        """Embed one data file into every carrier matching a glob
+
+        The data is encrypted once; carriers are embedded by a worker pool.
+        """
+        if len(args.data) != 1:
+            self.parser.error("--carriers takes a single data file")
+        carriers = sorted(glob.glob(args.carriers, recursive=True))
+        if not carriers:
+            self.parser.error(f"no carriers match {args.carriers}")
+        Path(args.output).mkdir(parents=True, exist_ok=True)
+        outputs = [str(Path(args.output) / (Path(p).stem + '.png')) for p in carriers]
+        if len(set(outputs)) < len(outputs):
+            self.parser.error("carriers share file names; output names would collide")
+
+        failed = 0
+        for carrier, output, error in self.stego.hide_fanout(
+                data=Path(args.data[0]).read_bytes(),
+                carrier_image_paths=carriers,
+                output_paths=outputs,
+                password=args.password,
+                method=args.method,
+                quality=args.quality,
+                compression_level=args.compression_level,
+                workers=args.jobs):
+            if error is not None:
+                failed += 1
+                print(f"Error: {carrier}: {error}", file=sys.stderr)
+
+        print(f"Data hidden in {len(carriers) - failed} of {len(carriers)} carriers in {args.output}")
+        return 1 if failed else 0
+
+    def _hide_sharded(self, args: argparse.Namespace) -> int:
+        """Split one data file across all carriers, written into the output directory"""
+        if len(args.data) != 1:
+            self.parser.error("--shard takes a single data file")
+        Path(args.output).mkdir(parents=True, exist_ok=True)
+        outputs = [str(Path(args.output) / (Path(p).stem + '.png')) for p in args.input]
+
+        count = self.stego.hide_sharded(
+            data=args.data[0],
+            carrier_image_paths=args.input,
+            output_paths=outputs,
+            password=args.password,
+            method=args.method,
+            quality=args.quality,
+            compression_level=args.compression_level,
+            workers=args.jobs
+        )
+
+        print(f"Data split into {count} shards in {args.output}")
         return 0
         
     def _handle_extract(self, args: argparse.Namespace) -> int:
         """Handle extract command"""
+        if args.shard:
+            if not args.output:
+                self.parser.error("the following arguments are required: -o/--output")
+            data = self.stego.extract_sharded(args.input, args.password, args.method, args.jobs)
+            Path(args.output).write_bytes(data)
+            print(f"Data extracted successfully to {args.output}")
+            return 0
+        if len(args.input) != 1:
+            self.parser.error("give one stego image, or use --shard")
+        args.input = args.input[0]
+
+        if args.list:
+            for entry in self.stego.list_archive(args.input, args.password, args.method):
+                print(f"{entry.size:>10}  {entry.name}")
+            return 0
+        if not args.output:
+            self.parser.error("the following arguments are required: -o/--output")
+
+        if args.member:
+            data = self.stego.extract_member(args.input, args.member, args.password, args.method)
+            Path(args.output).write_bytes(data)
+            print(f"{args.member} extracted successfully to {args.output}")
+            return 0
+
+        if self.stego.is_archive(args.input, args.method):
+            files = self.stego.extract_archive(args.input, args.password, args.method)
+            out_dir = Path(args.output)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for name, data in files.items():
+                # Keep members inside the output directory
+                (out_dir / Path(name).name).write_bytes(data)
+            print(f"{len(files)} files extracted successfully to {args.output}")
+            return 0
+
         extracted_data = self.stego.extract_data(
             stego_image_path=args.input,
             password=args.password,
@@ -89,6 +343,191 @@ class CLI:
         print(f"Data extracted successfully to {args.output}")
         return 0
 
+    def _handle_probe(self, args: argparse.Namespace) -> int:
+        """Handle probe command, printing one JSON object per line"""
+        codec_names = {v: k for k, v in CODECS.items()}
+        for path, result, error in self.stego.probe_many(self._collect_images(args), args.jobs):
+            if error is not None:
+                print(f"Error: {path}: {error}", file=sys.stderr)
+            elif result is not None:
+                print(json.dumps({
+                    "path": path,
+                    "method": result.method,
+                    "version": result.version,
+                    "codec": codec_names.get(result.codec, result.codec),
+                    "payload_bytes": result.payload_bytes
+                }))
+            elif args.all:
+                print(json.dumps({"path": path, "method": None}))
+        return 0
+        
+    def _handle_plan(self, args: argparse.Namespace) -> int:
+        """Handle plan command: compute or load a plan, then optionally run it"""
+        if args.from_manifest:
+            if not args.password:
+                self.parser.error("--from needs -p/--password to execute the manifest")
+            plan = read_manifest(args.from_manifest)
+        else:
+            if not (args.carriers and args.output):
+                self.parser.error("the following arguments are required: -c/--carriers, -o/--output")
+            plan = plan_jobs(self._collect_files(args.data, args.recursive),
+                             self._collect_files(args.carriers, args.recursive,
+                                                 self.stego.supported_formats),
+                             args.output, args.method, args.strategy)
+            if args.manifest:
+                write_manifest(plan, args.manifest)
+            else:
+                print(json.dumps(manifest(plan), indent=2))
+
+            placed = sum(len(job.files) for job in plan.jobs)
+            print(f"Planned {placed} payloads into {len(plan.jobs)} carriers", file=sys.stderr)
+            for path in plan.unplaced:
+                print(f"Error: {path}: too large for every carrier", file=sys.stderr)
+            for path in plan.unreadable:
+                print(f"Error: {path}: unreadable carrier", file=sys.stderr)
+            if not args.password:
+                return 1 if plan.unplaced else 0
+
+        failed = 0
+        for job, error in self.stego.execute_plan(plan, args.password,
+                                                  compression_level=args.compression_level):
+            if error is not None:
+                failed += 1
+                print(f"Error: {job.carrier}: {error}", file=sys.stderr)
+            else:
+                print(f"{len(job.files)} files hidden successfully in {job.output}",
+                      file=sys.stderr)
+        return 1 if failed or plan.unplaced else 0
+
+    def _handle_batch(self, args: argparse.Namespace) -> int:
+        """Handle batch command: record jobs in the manifest, then run the incomplete ones"""
+        if args.pipeline and args.kind != 'hide':
+            print("Error: --pipeline only applies to hide batches", file=sys.stderr)
+            return 1
+        if args.pipeline and args.memory_budget:
+            print("Error: --memory-budget does not apply to --pipeline", file=sys.stderr)
+            return 1
+        with JobStore(args.db) as store:
+            if args.source:
+                jobs = self._batch_jobs(args)
+                if args.kind == 'hide':
+                    added = store.add_hide_jobs(jobs)
+                else:
+                    added = store.add_extract_jobs(jobs)
+                print(f"Added {added} new jobs to {args.db}", file=sys.stderr)
+
+            pending = store.incomplete(args.kind, args.retry_failed)
+            ids = [job_id for job_id, _ in pending]
+            jobs = [job for _, job in pending]
+            for job in jobs:
+                Path(job.output).parent.mkdir(parents=True, exist_ok=True)
+            many = self.stego.hide_many if args.kind == 'hide' else self.stego.extract_many
+            run = lambda jobs, password, workers: many(jobs, password, workers,
+                                                       args.memory_budget)
+            if args.pipeline:
+                run = lambda jobs, password, workers: self.stego.hide_pipeline(
+                    jobs, password, workers=workers)
+
+            start = time.perf_counter()
+            done = failed = 0
+            nbytes = 0
+            peaks = []
+            # Skip the key derivation when there is nothing left to do
+            results = run(jobs, args.password, args.jobs) if jobs else ()
+            for result in results:
+                store.record(ids[result.index], result.error)
+                if result.error is not None:
+                    failed += 1
+                    print(f"Error: {result.job.output}: {result.error}", file=sys.stderr)
+                else:
+                    done += 1
+                    nbytes += Path(result.job.output).stat().st_size
+                    if result.peak is not None and result.estimate:
+                        peaks.append((result.peak, result.estimate))
+            elapsed = time.perf_counter() - start
+            counts = store.counts(args.kind)
+
+        if args.pipeline and results:
+            for stage in results.stats():
+                print(f"Stage {stage.name}: {stage.workers} workers, {stage.jobs} jobs, "
+                      f"{stage.busy:.1f}s busy, {stage.utilization:.0%} utilized")
+
+        if peaks:
+            ratios = sorted(peak / estimate for peak, estimate in peaks)
+            largest = max(estimate for _, estimate in peaks)
+            print(f"Peak memory per job: estimated up to {largest / 2**20:.1f} MiB, "
+                  f"measured up to {max(peak for peak, _ in peaks) / 2**20:.1f} MiB; "
+                  f"measured/estimated median {ratios[len(ratios) // 2]:.2f}, "
+                  f"max {ratios[-1]:.2f}")
+
+        rate = (done + failed) / elapsed if elapsed else 0.0
+        print(f"Ran {done + failed} jobs in {elapsed:.1f}s ({rate:.1f} jobs/s, "
+              f"{nbytes / max(elapsed, 1e-9) / 2**20:.1f} MB/s written): "
+              f"{done} done, {failed} failed")
+        print(f"Manifest: {counts['done']} done, {counts['failed']} failed, "
+              f"{counts['pending']} pending")
+        return 1 if counts['failed'] or counts['pending'] else 0
+
+    def _batch_jobs(self, args: argparse.Namespace) -> list:
+        """Read batch jobs from a CSV file, a directory of images or a plan manifest
+
+        Hide CSVs have data, carrier and output columns, extract CSVs
+        stego and output columns; an optional method column overrides -m.
+        Manifests give one hide per planned carrier, with the plan's method;
+        carriers given several files hide them as an archive.
+        """
+        source = Path(args.source)
+        if source.suffix.lower() == '.json':
+            if args.kind != 'hide':
+                self.parser.error("plan manifests hold hide jobs")
+            plan = read_manifest(source)
+            for path in plan.unplaced:
+                print(f"Error: {path}: too large for every carrier", file=sys.stderr)
+            return [HideJob(job.files[0] if len(job.files) == 1 else job.files,
+                            job.carrier, job.output, plan.method) for job in plan.jobs]
+        if source.is_dir():
+            if not args.output:
+                self.parser.error("a directory source needs -o/--output")
+            images = self._collect_files([source], args.recursive, self.stego.supported_formats)
+            out = Path(args.output)
+            if args.kind == 'hide':
+                if not args.data:
+                    self.parser.error("hiding into a directory of carriers needs -d/--data")
+                return [HideJob(args.data, image, str(out / (Path(image).stem + '.png')),
+                                args.method) for image in images]
+            return [ExtractJob(image, str(out / (Path(image).stem + '.bin')), args.method)
+                    for image in images]
+
+        columns = ('data', 'carrier', 'output') if args.kind == 'hide' else ('stego', 'output')
+        with open(source, newline='') as f:
+            reader = csv.DictReader(f)
+            missing = set(columns) - set(reader.fieldnames or ())
+            if missing:
+                self.parser.error(f"{source} lacks columns: {', '.join(sorted(missing))}")
+            rows = [[row[c] for c in columns] + [row.get('method') or args.method]
+                    for row in reader]
+        if args.kind == 'hide':
+            return [HideJob(data, carrier, output, method)
+                    for data, carrier, output, method in rows]
+        return [ExtractJob(stego, output, method) for stego, output, method in rows]
+
+    def _collect_images(self, args: argparse.Namespace) -> list:
+        """Expand probe paths, listing supported images inside directories"""
+        return self._collect_files(args.paths, args.recursive, self.stego.supported_formats)
+
+    def _collect_files(self, entries: list, recursive: bool, suffixes: list = None) -> list:
+        """Expand paths, listing files inside directories, optionally by suffix"""
+        files = []
+        for entry in entries:
+            path = Path(entry)
+            if not path.is_dir():
+                files.append(str(path))
+                continue
+            found = path.rglob('*') if recursive else path.iterdir()
+            files.extend(sorted(str(p) for p in found if p.is_file()
+                                and (suffixes is None or p.suffix.lower() in suffixes)))
+        return files
+
 def main():
     """CLI entry point"""
     cli = CLI()
@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from steganography import SteganoExfil
+from steganography import SteganoExfil, KeyCache
 import os
 from PIL import Image, ImageTk
 import threading
@@ -10,7 +10,9 @@ class SteganographyGUI:
         self.window = tk.Tk()
         self.window.title("Steganography Tool")
         self.window.geometry("800x600")
-        self.stego = SteganoExfil()
+        self.stego = SteganoExfil(key_cache=KeyCache())
+        self.carrier_path = None
+        self.data_paths = []
         
         # Style configuration
         style = ttk.Style()
@@ -52,7 +54,7 @@ class SteganographyGUI:
         
         # Data input
         self.data_frame = ttk.LabelFrame(self.window, text="Data")
-        self.data_btn = ttk.Button(self.data_frame, text="Select Data File",
+        self.data_btn = ttk.Button(self.data_frame, text="Select Data Files",
                                  command=self._select_data)
         self.data_label = ttk.Label(self.data_frame, text="No data file selected")
         
@@ -134,14 +136,19 @@ class SteganographyGUI:
         filetypes = [("Image files", "*.png *.jpg *.jpeg *.bmp")]
         filename = filedialog.askopenfilename(filetypes=filetypes)
         if filename:
+            self.carrier_path = filename
             self.carrier_label.config(text=os.path.basename(filename))
             self._update_preview(filename)
             
     def _select_data(self):
-        """Open file dialog to select data file"""
-        filename = filedialog.askopenfilename()
-        if filename:
-            self.data_label.config(text=os.path.basename(filename))
+        """Open file dialog to select one or more data files"""
+        filenames = filedialog.askopenfilenames()
+        if filenames:
+            self.data_paths = list(filenames)
+            if len(filenames) == 1:
+                self.data_label.config(text=os.path.basename(filenames[0]))
+            else:
+                self.data_label.config(text=f"{len(filenames)} files (packed as an archive)")
             
     def _update_preview(self, image_path):
         """Update image preview"""
@@ -201,14 +208,30 @@ class SteganographyGUI:
         if not output_path:
             return
             
+        # Several files go into one carrier as an archive
+        if len(self.data_paths) > 1:
+            files = []
+            for path in self.data_paths:
+                with open(path, 'rb') as f:
+                    files.append((os.path.basename(path), f.read()))
+            self.stego.hide_archive(
+                files=files,
+                carrier_image_path=self.carrier_path,
+                output_path=output_path,
+                password=self.password_entry.get(),
+                method=self.method_var.get(),
+                quality=self.quality_scale.get()
+            )
+            return
+
         # Read data file
-        with open(self.data_label.cget("text"), 'rb') as f:
+        with open(self.data_paths[0], 'rb') as f:
             data = f.read()
             
         # Hide data
         self.stego.hide_data(
             data=data,
-            carrier_image_path=self.carrier_label.cget("text"),
+            carrier_image_path=self.carrier_path,
             output_path=output_path,
             password=self.password_entry.get(),
             method=self.method_var.get(),
@@ -217,6 +240,21 @@ class SteganographyGUI:
         
     def _process_extract(self):
         """Process extract operation"""
+        # Archives are saved member by member into a directory
+        if self.stego.is_archive(self.carrier_path, self.method_var.get()):
+            output_dir = filedialog.askdirectory()
+            if not output_dir:
+                return
+            files = self.stego.extract_archive(
+                self.carrier_path,
+                password=self.password_entry.get(),
+                method=self.method_var.get()
+            )
+            for name, data in files.items():
+                with open(os.path.join(output_dir, os.path.basename(name)), 'wb') as f:
+                    f.write(data)
+            return
+
         # Get output path
         output_path = filedialog.asksaveasfilename()
         if not output_path:
@@ -224,7 +262,7 @@ class SteganographyGUI:
             
         # Extract data
         extracted_data = self.stego.extract_data(
-            stego_image_path=self.carrier_label.cget("text"),
+            stego_image_path=self.carrier_path,
             password=self.password_entry.get(),
             method=self.method_var.get()
         )
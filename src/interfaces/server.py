@@ -0,0 +1,230 @@
+"""Local stego service keeping a warm pool of engine workers
+
+stego-server listens on a Unix domain socket and runs hide, extract,
+probe and capacity requests, and whole stego-cli commands forwarded by
+the thin client, in worker processes that imported the engine and
+warmed up OpenCV, SciPy and the cipher once at startup. Workers keep a
+KeyCache, so repeated extractions under one password skip the KDF. See
+interfaces.client for the framing and the client.
+"""
+import argparse
+import contextlib
+import io
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Tuple
+from steganography import SteganoExfil, HideOptions, KeyCache
+from steganography.exceptions import ConfigError
+from steganography.threads import configure_threads, pool_workers, process_pool, resolve_threads
+from steganography.utils import image_dimensions
+from interfaces.client import StegoClient, default_address, recv_message, send_message
+
+_engine = None
+
+def _init_worker() -> None:
+    """Pool initializer: build the worker's engine and warm it up"""
+    global _engine
+    _engine = SteganoExfil(key_cache=KeyCache())
+    _engine.warm_up()
+
+def _handle(header: Dict[str, Any], body: bytes) -> Tuple[Dict[str, Any], bytes]:
+    """Run one request in a worker, returning the response header and body"""
+    op = header.get('op')
+    try:
+        if op == 'hide':
+            options = HideOptions(header.get('method', 'dct'), header.get('quality'),
+                                  header.get('compression_level', 6))
+            if header.get('output'):
+                _engine.hide_data(body, header['carrier'], header['output'],
+                                  header['password'], options=options)
+                return {'ok': True, 'output': header['output']}, b''
+            image = _engine.hide_buffer(body, Path(header['carrier']).read_bytes(),
+                                        header['password'], options=options)
+            return {'ok': True}, image
+        if op == 'extract':
+            data = _engine.extract_data(header['stego'], header['password'],
+                                        header.get('method', 'dct'))
+            if header.get('output'):
+                Path(header['output']).write_bytes(data)
+                return {'ok': True, 'output': header['output']}, b''
+            return {'ok': True}, data
+        if op == 'probe':
+            result = _engine.probe(header['path'])
+            return {'ok': True, 'result': result._asdict() if result else None}, b''
+        if op == 'capacity':
+            shape = header.get('shape') or image_dimensions(header['path'])
+            info = _engine.capacity(tuple(shape), header.get('method', 'dct'))
+            return {'ok': True, 'result': info._asdict()}, b''
+        if op == 'cli':
+            return _run_cli(header['argv'], header['cwd']), b''
+        return {'ok': False, 'error': f"Unknown request: {op}", 'type': 'ValueError'}, b''
+    except Exception as e:  # Reported to the client; the worker keeps serving
+        return {'ok': False, 'error': str(e) or type(e).__name__, 'type': type(e).__name__}, b''
+
+def _run_cli(argv: list, cwd: str) -> Dict[str, Any]:
+    """Run a stego-cli command in this worker as if started in ``cwd``
+
+    Workers run one request at a time, so changing the working directory
+    and redirecting output cannot affect other requests.
+    """
+    from interfaces.cli import CLI
+    out, err = io.StringIO(), io.StringIO()
+    previous = os.getcwd()
+    try:
+        os.chdir(cwd)
+        cli = CLI()
+        cli.stego = _engine
+        cli.manage_threads = False
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                code = cli.run(argv)
+            except SystemExit as e:  # argparse errors and --help
+                code = e.code if isinstance(e.code, int) else 1
+    finally:
+        os.chdir(previous)
+    return {'ok': True, 'code': code, 'stdout': out.getvalue(), 'stderr': err.getvalue()}
+
+class StegoServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handing each request to the warm worker pool
+
+    Connections are served by threads and may carry any number of
+    requests; the pool bounds how many run at once. A pool broken by a
+    worker that died is replaced, so one crash does not take the server
+    down.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: str, workers: int = None):
+        self.workers = pool_workers(workers)
+        self.pool = self._start_pool()
+        self._pool_lock = threading.Lock()
+        old_umask = os.umask(0o177)  # Socket readable and writable by its owner only
+        try:
+            super().__init__(address, _RequestHandler)
+        except BaseException:
+            self.pool.shutdown()
+            raise
+        finally:
+            os.umask(old_umask)
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """Start and warm up every worker, before they are needed"""
+        pool = process_pool(self.workers, _init_worker)
+        try:
+            for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+        except BaseException:
+            pool.shutdown()
+            raise
+        return pool
+
+    def run(self, header: Dict[str, Any], body: bytes) -> Tuple[Dict[str, Any], bytes]:
+        """Run a request in the pool, replacing the pool if a worker died
+
+        A request finding the pool already broken is retried on the new
+        one. A request whose own worker died is reported as failed, since
+        running it again might crash the next worker too.
+        """
+        pool = self.pool
+        try:
+            future = pool.submit(_handle, header, body)
+        except BrokenProcessPool:
+            pool = self._replace_pool(pool)
+            future = pool.submit(_handle, header, body)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            return {'ok': False, 'error': "Worker process died; the pool was restarted",
+                    'type': 'BrokenProcessPool'}, b''
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Swap a broken pool for a new one, once however many requests saw it break"""
+        with self._pool_lock:
+            if self.pool is broken:
+                self.pool = self._start_pool()
+                broken.shutdown(wait=False)
+            return self.pool
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown()
+        with contextlib.suppress(OSError):
+            os.unlink(self.server_address)
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (ConnectionError, ValueError):
+                return
+            if message is None:
+                return
+            header, body = message
+            if header.get('op') == 'ping':
+                response = {'ok': True, 'workers': self.server.workers}, b''
+            else:
+                response = self.server.run(header, body)
+            try:
+                send_message(self.request, *response)
+            except OSError:
+                return
+
+def _check_stale(address: str) -> None:
+    """Remove a socket left behind by a server that is gone
+
+    Raises:
+        SystemExit: If a server is already listening on ``address``
+    """
+    if not os.path.exists(address):
+        return
+    try:
+        StegoClient(address, timeout=1).close()
+    except PermissionError as e:
+        sys.exit(f"Error: {str(e)}")
+    except OSError:
+        os.unlink(address)
+    else:
+        sys.exit(f"Error: a server is already listening on {address}")
+
+def main():
+    """stego-server entry point"""
+    if not hasattr(socket, 'AF_UNIX'):
+        sys.exit("Error: stego-server needs Unix domain sockets")
+    parser = argparse.ArgumentParser(
+        description="Serve steganography requests from a warm pool of workers")
+    parser.add_argument('--socket', default=default_address(),
+                        help='Socket path (default: $STEGO_SERVER, or a per-user path)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Worker processes (default: thread budget)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Threads shared by the workers (default: $STEGO_THREADS '
+                             'or the CPU count)')
+    args = parser.parse_args()
+    try:
+        configure_threads(resolve_threads(args.threads))
+    except ConfigError as e:
+        sys.exit(f"Error: {str(e)}")
+
+    _check_stale(args.socket)
+    server = StegoServer(args.socket, args.workers)
+    # Exit through KeyboardInterrupt so the socket is removed on SIGTERM too
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"Listening on {args.socket} with {server.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
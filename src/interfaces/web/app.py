@@ -1,5 +1,7 @@
 import streamlit as st
-from steganography import SteganoExfil
+from steganography import SteganoExfil, KeyCache
+from steganography.threads import configure_threads, resolve_threads
+from steganography.utils import image_dimensions
 from config import Settings
 import os
 import io
@@ -7,9 +9,21 @@ import json
 from pathlib import Path
 import mimetypes
 
+@st.cache_resource
+def shared_engine() -> SteganoExfil:
+    """Engine shared by all sessions and reruns
+
+    The engine keeps no per-call state, so concurrent sessions can use it
+    from their own threads; its key cache lets re-extracting skip the KDF.
+    Native thread pools are sized once here, from STEGO_THREADS or the
+    ``threads`` setting.
+    """
+    configure_threads(resolve_threads(setting=Settings().get("threads")))
+    return SteganoExfil(key_cache=KeyCache())
+
 class SteganoApp:
     def __init__(self):
-        self.stego = SteganoExfil()
+        self.stego = shared_engine()
         self.settings = Settings()
         self.setup_page()
         
@@ -45,20 +59,9 @@ class SteganoApp:
         if not carrier_file:
             return 0
             
-        temp_carrier = f"temp_carrier{Path(carrier_file.name).suffix}"
-        with open(temp_carrier, "wb") as f:
-            f.write(carrier_file.read())
-            
-        try:
-            carrier = self.stego._prepare_carrier_image(temp_carrier)
-            if method == 'dct':
-                capacity = self.stego._calculate_dct_capacity(carrier)
-                return capacity // 8
-            else:
-                return carrier.size * 3 // 8
-        finally:
-            if os.path.exists(temp_carrier):
-                os.remove(temp_carrier)
+        # Dimensions come from the image header; nothing is decoded
+        shape = image_dimensions(carrier_file.getvalue())
+        return self.stego.capacity(shape, method).payload_bytes
 
     def preview_text_file(self, file):
         """Preview text file contents"""
@@ -101,36 +104,42 @@ class SteganoApp:
         status_text.text("Processing complete!")
         progress_bar.progress(1.0)
 
+    def process_archive(self, carrier_file, secret_files, method, password, quality):
+        """Pack all secret files into one archive in a single carrier"""
+        stego_bytes = self.stego.hide_archive_buffer(
+            files=[(f.name, f.getvalue()) for f in secret_files],
+            carrier=carrier_file.getvalue(),
+            password=password,
+            method=method,
+            quality=quality,
+            compression_level=self.settings.get("compression_level", 6)
+        )
+
+        output_name = f"stego_{Path(carrier_file.name).stem}.png"
+        st.download_button(
+            label=f"Download {output_name}",
+            data=stego_bytes,
+            file_name=output_name,
+            mime="image/png"
+        )
+
     def process_single_file(self, carrier_file, secret_data, output_name, method, password, quality):
         """Process a single file for hiding"""
-        temp_carrier = f"temp_carrier{Path(carrier_file.name).suffix}"
-        with open(temp_carrier, "wb") as f:
-            carrier_file.seek(0)
-            f.write(carrier_file.read())
+        stego_bytes = self.stego.hide_buffer(
+            data=secret_data,
+            carrier=carrier_file.getvalue(),
+            password=password,
+            method=method,
+            quality=quality,
+            compression_level=self.settings.get("compression_level", 6)
+        )
         
-        try:
-            self.stego.hide_data(
-                data=secret_data,
-                carrier_image_path=temp_carrier,
-                output_path=output_name,
-                password=password,
-                method=method,
-                quality=quality
-            )
-            
-            with open(output_name, "rb") as f:
-                st.download_button(
-                    label=f"Download {output_name}",
-                    data=f.read(),
-                    file_name=output_name,
-                    mime="image/png"
-                )
-                
-        finally:
-            if os.path.exists(temp_carrier):
-                os.remove(temp_carrier)
-            if os.path.exists(output_name):
-                os.remove(output_name)
+        st.download_button(
+            label=f"Download {output_name}",
+            data=stego_bytes,
+            file_name=output_name,
+            mime="image/png"
+        )
 
     def render_hide_tab(self):
         """Render the hide data tab"""
@@ -171,8 +180,10 @@ class SteganoApp:
                 **Carrier Details:**
                 - Size: {round(carrier_file.size/1024, 2)} KB
                 - Format: {carrier_file.type}
-                - Estimated Capacity: {round(capacity/1024, 2)} KB
+                - Estimated Capacity: {round(max(capacity, 0)/1024, 2)} KB
                 """)
+                if capacity < 0:
+                    st.warning("Carrier is too small to hold any hidden data")
 
         if secret_files:
             with st.expander("File Previews", expanded=True):
@@ -198,11 +209,24 @@ class SteganoApp:
                 help="Higher quality = less capacity"
             )
 
+            pack_archive = st.checkbox(
+                "Pack all files into one image",
+                value=True,
+                help="Hide several files as one archive in a single carrier"
+            )
+
         if st.button(
             "Hide Data",
             type="primary",
             disabled=not (carrier_file and secret_files and password)
         ):
+            if pack_archive and len(secret_files) > 1:
+                try:
+                    with st.spinner("Packing files..."):
+                        self.process_archive(carrier_file, secret_files, method, password, quality)
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+                return
             self.process_multiple_files(
                 carrier_file,
                 secret_files,
@@ -241,19 +265,27 @@ class SteganoApp:
             if st.button("Extract Data", type="primary"):
                 try:
                     with st.spinner("Extracting data..."):
-                        temp_stego = f"temp_stego{Path(stego_file.name).suffix}"
-                        with open(temp_stego, "wb") as f:
-                            f.write(stego_file.read())
-                        
-                        extracted_data = self.stego.extract_data(
-                            stego_image_path=temp_stego,
+                        if self.stego.is_archive(stego_file.getvalue(), method):
+                            files = self.stego.extract_archive(
+                                stego_file.getvalue(), password=password, method=method
+                            )
+                            st.success(f"Extracted {len(files)} files")
+                            for i, (name, data) in enumerate(files.items()):
+                                st.download_button(
+                                    f"Download {name}",
+                                    data=data,
+                                    file_name=Path(name).name,
+                                    mime=mimetypes.guess_type(name)[0] or "application/octet-stream",
+                                    key=f"archive_member_{i}"
+                                )
+                            return
+
+                        extracted_data = self.stego.extract_buffer(
+                            stego=stego_file.getvalue(),
                             password=password,
                             method=method
                         )
                         
-                        if os.path.exists(temp_stego):
-                            os.remove(temp_stego)
-                        
                         file_type = mimetypes.guess_type("extracted_data")[0]
                         if not file_type:
                             file_type = "application/octet-stream"
@@ -298,6 +330,15 @@ class SteganoApp:
         )
         self.settings.set("default_quality", default_quality)
         
+        compression_level = st.slider(
+            "Compression level",
+            min_value=0,
+            max_value=9,
+            value=self.settings.get("compression_level", 6),
+            help="0 disables compression; incompressible data is never compressed"
+        )
+        self.settings.set("compression_level", compression_level)
+        
         if st.button("Save Settings"):
             self.settings.save()
             st.success("Settings saved!")
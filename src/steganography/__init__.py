@@ -1,4 +1,8 @@
-from .core import SteganoExfil
+from .core import HideOptions, SteganoExfil
+from .batch import HideJob, ExtractJob, JobResult
+from .encryption import KeyCache, KeySession
+from .utils import capacity, CapacityInfo
 
 __version__ = '0.1.0'
-__all__ = ['SteganoExfil'] 
\ No newline at end of file
+__all__ = ['SteganoExfil', 'HideOptions', 'KeyCache', 'KeySession', 'capacity', 'CapacityInfo',
+           'HideJob', 'ExtractJob', 'JobResult']
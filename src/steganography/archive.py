@@ -0,0 +1,104 @@
+import struct
+import zlib
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Tuple, Union
+from .compression import compress, decompress
+from .exceptions import ExtractionError, IntegrityError, ValidationError
+
+# Archive plaintext, encrypted as one envelope:
+#   index size (4) | entry count (4) | entries | member data
+# Each entry is
+#   name length (2) | name (UTF-8) | codec (1) | offset (4) | length (4) | size (4) | CRC32 (4)
+# where offset and length locate the stored (possibly compressed) member
+# within the member data, and size and CRC32 describe the original bytes.
+INDEX_PREFIX = struct.Struct('>II')
+ENTRY_FIELDS = struct.Struct('>BIIII')
+MAX_NAME_LENGTH = 0xFFFF
+
+class ArchiveEntry(NamedTuple):
+    """Index entry of one archive member"""
+    name: str
+    codec: int
+    offset: int  # Offset of the stored bytes within the member data
+    length: int  # Stored (compressed) length
+    size: int    # Original length
+    crc: int     # CRC32 of the original bytes
+
+ArchiveFiles = Union[Mapping[str, bytes], Iterable[Tuple[str, bytes]]]
+
+def pack_archive(files: ArchiveFiles, compression_level: int = 6) -> bytes:
+    """Pack named files into archive plaintext, compressing each on its own
+
+    Raises:
+        ValidationError: For empty archives, duplicate or overlong names
+    """
+    items = list(files.items()) if isinstance(files, Mapping) else list(files)
+    if not items:
+        raise ValidationError("Archive needs at least one file")
+
+    index = bytearray()
+    stored = []
+    offset = 0
+    seen = set()
+    for name, data in items:
+        encoded = name.encode('utf-8')
+        if name in seen:
+            raise ValidationError(f"Duplicate archive member: {name}")
+        if len(encoded) > MAX_NAME_LENGTH:
+            raise ValidationError(f"Archive member name too long: {name[:40]}...")
+        seen.add(name)
+
+        codec, body = compress(data, compression_level)
+        index += struct.pack('>H', len(encoded)) + encoded
+        index += ENTRY_FIELDS.pack(codec, offset, len(body), len(data), zlib.crc32(data))
+        stored.append(body)
+        offset += len(body)
+
+    return INDEX_PREFIX.pack(INDEX_PREFIX.size + len(index), len(items)) + index + b''.join(stored)
+
+def packed_size(members: Iterable[Tuple[str, int]]) -> int:
+    """Upper bound of pack_archive's output for (name, data length) pairs
+
+    Members are only stored compressed when that makes them smaller, so
+    the bound is exact for incompressible data.
+    """
+    return INDEX_PREFIX.size + sum(entry_size(name, size) for name, size in members)
+
+def entry_size(name: str, size: int) -> int:
+    """Index entry plus stored bytes of a member of ``size`` bytes, uncompressed"""
+    return 2 + len(name.encode('utf-8')) + ENTRY_FIELDS.size + size
+
+def index_size(prefix: bytes) -> int:
+    """Total index length, prefix included, from the first INDEX_PREFIX.size bytes"""
+    return INDEX_PREFIX.unpack_from(prefix)[0]
+
+def parse_index(index: bytes) -> List[ArchiveEntry]:
+    """Parse a complete index, as sized by index_size"""
+    size, count = INDEX_PREFIX.unpack_from(index)
+    entries = []
+    pos = INDEX_PREFIX.size
+    try:
+        for _ in range(count):
+            (name_length,) = struct.unpack_from('>H', index, pos)
+            name = bytes(index[pos + 2:pos + 2 + name_length]).decode('utf-8')
+            pos += 2 + name_length
+            entries.append(ArchiveEntry(name, *ENTRY_FIELDS.unpack_from(index, pos)))
+            pos += ENTRY_FIELDS.size
+    except (struct.error, UnicodeDecodeError):
+        raise ExtractionError("Corrupt archive index")
+    if pos != size:
+        raise ExtractionError("Corrupt archive index")
+    return entries
+
+def unpack_member(entry: ArchiveEntry, stored: bytes) -> bytes:
+    """Decompress a member's stored bytes and verify its size and CRC32"""
+    data = decompress(stored, entry.codec)
+    if len(data) != entry.size or zlib.crc32(data) != entry.crc:
+        raise IntegrityError(f"Archive member {entry.name} failed verification")
+    return data
+
+def unpack_archive(plaintext: bytes) -> Dict[str, bytes]:
+    """Unpack all members of archive plaintext"""
+    size = index_size(plaintext)
+    return {entry.name: unpack_member(entry, plaintext[size + entry.offset:
+                                                      size + entry.offset + entry.length])
+            for entry in parse_index(plaintext[:size])}
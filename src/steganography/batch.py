@@ -0,0 +1,371 @@
+import json
+import re
+import sqlite3
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from itertools import islice
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+from .threads import process_pool
+
+class SharedRef(NamedTuple):
+    """Location of a SharedArray, all a worker needs to map it"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+class HideJob(NamedTuple):
+    """One hide for SteganoExfil.hide_many
+
+    ``data`` is the payload itself, or the path of a file the worker reads,
+    or a list of file paths hidden as an archive named by their file
+    names. ``carrier`` is an image path or a decoded BGR array; arrays
+    reach pool workers through shared memory. Without ``output`` the
+    result is the stego BGR array.
+    """
+    data: Union[bytes, str, Path, List[str]]
+    carrier: Union[str, Path, np.ndarray]
+    output: Optional[str] = None
+    method: str = 'dct'
+    quality: Optional[float] = None
+    compression_level: int = 6
+
+class ExtractJob(NamedTuple):
+    """One extraction for SteganoExfil.extract_many
+
+    With ``output`` the data is written there by the worker and the result
+    is the path; otherwise the result is the extracted bytes. ``stego`` is
+    an image path or a decoded BGR array, shared as for HideJob.
+    """
+    stego: Union[str, Path, np.ndarray]
+    output: Optional[str] = None
+    method: str = 'dct'
+
+class JobResult(NamedTuple):
+    """Outcome of one batch job, in completion order"""
+    index: int  # Position of the job in the input
+    job: Any
+    result: Any  # Output path, or extracted bytes
+    error: Optional[str]  # Set when the job failed; result is then None
+    peak: Optional[int] = None      # Measured peak memory in bytes, see run_budgeted
+    estimate: Optional[int] = None  # Estimated peak memory in bytes, see run_budgeted
+
+def run_completed(fn: Callable, jobs: Iterable, workers: int,
+                  initializer: Callable = None, initargs: tuple = ()) -> Iterator[JobResult]:
+    """Run fn over jobs in a process pool, yielding results as they finish
+
+    At most two jobs per worker are queued, so jobs from a generator are
+    only built as workers become free. A failing job is reported through
+    JobResult.error without stopping the others.
+    """
+    share_tracker()
+    with process_pool(workers, initializer, initargs) as pool:
+        pending = {}
+        try:
+            for index, job in enumerate(jobs):
+                pending[pool.submit(fn, job)] = (index, job)
+                if len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield _result(future, *pending.pop(future))
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _result(future, *pending.pop(future))
+        finally:
+            for future in pending:
+                future.cancel()
+
+def _result(future: Future, index: int, job: Any) -> JobResult:
+    error = future.exception()
+    if error is not None:
+        return JobResult(index, job, None, str(error) or type(error).__name__)
+    return JobResult(index, job, future.result(), None)
+
+def run_budgeted(fn: Callable, jobs: Iterable, workers: int, budget: int,
+                 estimate: Callable[[Any], Optional[int]], initializer: Callable = None,
+                 initargs: tuple = ()) -> Iterator[JobResult]:
+    """Run fn over jobs in a process pool, admitting jobs by estimated peak memory
+
+    A job is submitted only while the estimates of the jobs submitted and
+    not yet finished, its own included, fit in ``budget`` bytes; a job
+    larger than the budget runs on its own. When the next job does not
+    fit, a later one among the next two per worker that does fit is
+    submitted ahead of it, so small jobs keep workers busy while a large
+    one waits for memory. A job is overtaken at most that many times in a
+    row, after which it is waited for. ``estimate(job)`` gives a job's
+    peak in bytes, or None when unknown, which counts as the whole
+    budget. Results carry the estimate and the peak measured in the
+    worker with PeakMeter; otherwise this behaves like run_completed.
+    """
+    lookahead = 2 * workers
+    source = enumerate(jobs)
+    window = deque()  # (index, job, cost, estimate) of jobs read but not submitted
+    share_tracker()
+    with process_pool(workers, initializer, initargs) as pool:
+        pending = {}
+        in_use = overtaken = 0
+        try:
+            while True:
+                for index, job in islice(source, lookahead - len(window)):
+                    size = estimate(job)
+                    window.append((index, job, budget if size is None else min(size, budget),
+                                   size))
+                while window and len(pending) < lookahead:
+                    pick = _admit(window, budget - in_use, bool(pending),
+                                  overtaken < lookahead)
+                    if pick is None:
+                        break
+                    overtaken = overtaken + 1 if pick else 0
+                    entry = window[pick]
+                    del window[pick]
+                    pending[pool.submit(_measured, fn, entry[1])] = entry
+                    in_use += entry[2]
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, job, cost, size = pending.pop(future)
+                    in_use -= cost
+                    result = _result(future, index, job)
+                    if result.error is None:
+                        value, peak = result.result
+                        result = result._replace(result=value, peak=peak)
+                    yield result._replace(estimate=size)
+        finally:
+            for future in pending:
+                future.cancel()
+
+def _admit(window: deque, free: int, busy: bool, may_overtake: bool) -> Optional[int]:
+    """Position in the window of the job to submit next, or None to wait"""
+    if window[0][2] <= free or not busy:
+        return 0
+    if may_overtake:
+        for position in range(1, len(window)):
+            if window[position][2] <= free:
+                return position
+    return None
+
+def _measured(fn: Callable, job: Any) -> Tuple[Any, int]:
+    with PeakMeter() as meter:
+        result = fn(job)
+    return result, meter.peak
+
+class PeakMeter:
+    """Peak memory in bytes that a block of code adds to this process
+
+    On Linux the resident set high-water mark is reset on entry and
+    compared with the resident size then, so native buffers such as
+    those of image codecs count. Elsewhere tracemalloc's peak is used,
+    which covers NumPy arrays but not native buffers. ``peak`` is set on
+    exit.
+    """
+
+    def __init__(self):
+        self.peak = None
+        self._base = None
+
+    def __enter__(self) -> 'PeakMeter':
+        self._base = _reset_peak_rss()
+        if self._base is None:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._base is not None:
+            self.peak = max(0, _memory_status()['VmHWM'] - self._base)
+        else:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+def _memory_status() -> Dict[str, int]:
+    """Memory counters of /proc/self/status in bytes"""
+    with open('/proc/self/status') as f:
+        return {match[1]: int(match[2]) * 1024
+                for match in re.finditer(r'^(Vm\w+):\s+(\d+) kB', f.read(), re.M)}
+
+def _reset_peak_rss() -> Optional[int]:
+    """Reset the resident high-water mark, returning the resident size, if possible"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _memory_status()['VmRSS']
+    except (OSError, KeyError):
+        return None
+
+class SharedArray:
+    """NumPy array in a shared memory block owned by the creating process
+
+    Pool workers receive ``ref`` instead of the pickled array and map the
+    block with attach or with_shared, so handing over a job costs the same
+    whatever the image size. Workers may write into the block, e.g. embed
+    in place; the owner sees their changes. The owner must call release()
+    once no worker needs the block any more, which frees it.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], dtype: Any = np.uint8):
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf)
+        self.ref = SharedRef(self.memory.name, tuple(shape), dtype.str)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> 'SharedArray':
+        """Shared copy of an array"""
+        block = cls(array.shape, array.dtype)
+        block.array[...] = array
+        return block
+
+    def __enter__(self) -> 'SharedArray':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """Unmap and free the block; the array must not be used afterwards"""
+        if self.memory is not None:
+            self.array = None
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+def share_tracker() -> None:
+    """Start this process's resource tracker before forking pool workers
+
+    Workers register the shared memory they attach with the tracker they
+    inherit. Forked before the tracker runs, each would start its own,
+    which reports the blocks as leaked when the worker exits.
+    """
+    resource_tracker.ensure_running()
+
+def attach(ref: SharedRef, writeable: bool = True
+           ) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Map a SharedArray in another process; close the memory when done"""
+    memory = shared_memory.SharedMemory(name=ref.name)
+    array = np.ndarray(ref.shape, dtype=ref.dtype, buffer=memory.buf)
+    array.flags.writeable = writeable
+    return memory, array
+
+def with_shared(ref: SharedRef, fn: Callable[[np.ndarray], Any], writeable: bool = True) -> Any:
+    """Call fn with a SharedArray mapped for the duration of the call
+
+    fn must not return the array or keep views of it. An exception from
+    fn is re-raised without its tracebacks, whose frames would otherwise
+    keep the mapping alive.
+    """
+    memory, array = attach(ref, writeable)
+    error = None
+    try:
+        return fn(array)
+    except Exception as e:
+        error = chained = e
+        while chained is not None:
+            chained.__traceback__ = None
+            chained = chained.__cause__ or chained.__context__
+    finally:
+        del array
+        memory.close()
+    raise error
+
+# Job states recorded in a JobStore
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+class JobStore:
+    """SQLite record of batch jobs and their states, for resumable runs
+
+    Jobs are unique per (kind, image, output), so adding the same job
+    source again only adds jobs not seen before. Results are committed
+    in groups; after a crash, jobs whose result was not committed are
+    still pending and simply run again. Passwords are never stored.
+    """
+
+    COMMIT_INTERVAL = 1.0  # Seconds between commits of recorded results
+
+    def __init__(self, path: Union[str, Path]):
+        self.db = sqlite3.connect(str(path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                data TEXT,
+                image TEXT NOT NULL,
+                output TEXT NOT NULL,
+                method TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                files TEXT,
+                UNIQUE (kind, image, output)
+            )""")
+        # Archive jobs keep their file list in ``files``, added after the table
+        if 'files' not in {row[1] for row in self.db.execute("PRAGMA table_info(jobs)")}:
+            self.db.execute("ALTER TABLE jobs ADD COLUMN files TEXT")
+        self.db.commit()
+        self._last_commit = time.monotonic()
+
+    def __enter__(self) -> 'JobStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+    def add_hide_jobs(self, jobs: Iterable[HideJob]) -> int:
+        """Add hide jobs whose data is a file path or a list of them; returns the number added"""
+        return self._add('hide', ((None, j.carrier, j.output, j.method, json.dumps(j.data))
+                                  if isinstance(j.data, (list, tuple))
+                                  else (str(j.data), j.carrier, j.output, j.method, None)
+                                  for j in jobs))
+
+    def add_extract_jobs(self, jobs: Iterable[ExtractJob]) -> int:
+        """Add extraction jobs with an output path; returns the number added"""
+        return self._add('extract', ((None, j.stego, j.output, j.method, None) for j in jobs))
+
+    def _add(self, kind: str, rows: Iterable[tuple]) -> int:
+        before = self.db.total_changes
+        self.db.executemany(
+            "INSERT OR IGNORE INTO jobs (kind, data, image, output, method, files) "
+            "VALUES (?, ?, ?, ?, ?, ?)", ((kind,) + row for row in rows))
+        self.db.commit()
+        return self.db.total_changes - before
+
+    def incomplete(self, kind: str, retry_failed: bool = False) -> List[Tuple[int, Any]]:
+        """Jobs of ``kind`` not yet done, as (id, job) pairs"""
+        states = (PENDING, FAILED) if retry_failed else (PENDING,)
+        rows = self.db.execute(
+            f"SELECT id, data, image, output, method, files FROM jobs WHERE kind = ? "
+            f"AND state IN ({', '.join('?' * len(states))}) ORDER BY id", (kind,) + states)
+        if kind == 'hide':
+            return [(row[0], HideJob(json.loads(row[5]) if row[5] else row[1],
+                                     row[2], row[3], row[4])) for row in rows]
+        return [(row[0], ExtractJob(row[2], row[3], row[4])) for row in rows]
+
+    def record(self, job_id: int, error: Optional[str] = None) -> None:
+        """Record a job's outcome, committing at most every COMMIT_INTERVAL"""
+        self.db.execute("UPDATE jobs SET state = ?, error = ? WHERE id = ?",
+                        (FAILED if error else DONE, error, job_id))
+        if time.monotonic() - self._last_commit >= self.COMMIT_INTERVAL:
+            self.db.commit()
+            self._last_commit = time.monotonic()
+
+    def counts(self, kind: str = None) -> Dict[str, int]:
+        """Number of jobs per state"""
+        query = "SELECT state, COUNT(*) FROM jobs"
+        params = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        counts.update(self.db.execute(query + " GROUP BY state", params))
+        return counts
@@ -0,0 +1,119 @@
+import bz2
+import lzma
+import zlib
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Tuple
+import numpy as np
+from .exceptions import ExtractionError
+
+# Codec ids, recorded in the container header flags
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_BZ2 = 3
+CODECS = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'lzma': CODEC_LZMA, 'bz2': CODEC_BZ2}
+
+# Auto-selection thresholds
+ENTROPY_LIMIT = 7.5          # bits per byte above which compression is skipped
+MIN_COMPRESS_SIZE = 64       # smaller payloads are stored as they are
+LZMA_MIN_SIZE = 16 * 1024    # below this the lzma container overhead rarely pays off
+SAMPLE_SIZE = 4096
+SAMPLE_COUNT = 8
+
+def estimate_entropy(data: bytes) -> float:
+    """Estimate Shannon entropy in bits per byte from evenly spaced samples"""
+    view = np.frombuffer(data, dtype=np.uint8)
+    if len(view) > SAMPLE_SIZE * SAMPLE_COUNT:
+        starts = np.linspace(0, len(view) - SAMPLE_SIZE, SAMPLE_COUNT).astype(np.int64)
+        view = np.concatenate([view[s:s + SAMPLE_SIZE] for s in starts])
+    if not len(view):
+        return 0.0
+    counts = np.bincount(view, minlength=256)
+    p = counts[counts > 0] / len(view)
+    return float(-(p * np.log2(p)).sum())
+
+def choose_codec(data: bytes, level: int) -> int:
+    """Pick a codec for data at a 0-9 compression level
+
+    Level 0, tiny payloads and payloads that already look random (encrypted,
+    compressed or media data) are stored uncompressed. Otherwise zlib is
+    used, or lzma for larger payloads at levels 7 and above.
+    """
+    if level <= 0 or len(data) < MIN_COMPRESS_SIZE:
+        return CODEC_NONE
+    if estimate_entropy(data) > ENTROPY_LIMIT:
+        return CODEC_NONE
+    if level >= 7 and len(data) >= LZMA_MIN_SIZE:
+        return CODEC_LZMA
+    return CODEC_ZLIB
+
+def compress(data: bytes, level: int = 6, codec: Optional[str] = None) -> Tuple[int, bytes]:
+    """Compress data and return the codec id used with the compressed bytes
+
+    The codec is chosen by choose_codec unless named explicitly. Data is
+    stored uncompressed when compression does not make it smaller.
+    """
+    level = max(0, min(9, level))
+    if codec is None:
+        codec_id = choose_codec(data, level)
+    elif codec in CODECS:
+        codec_id = CODECS[codec]
+    else:
+        raise ValueError(f"Unsupported codec: {codec}")
+
+    if codec_id == CODEC_ZLIB:
+        body = zlib.compress(data, level)
+    elif codec_id == CODEC_LZMA:
+        body = lzma.compress(data, preset=level)
+    elif codec_id == CODEC_BZ2:
+        body = bz2.compress(data, max(1, level))
+    else:
+        body = data
+
+    if codec_id != CODEC_NONE and len(body) >= len(data):
+        codec_id, body = CODEC_NONE, data
+    return codec_id, body
+
+def _decompressor(codec_id: int):
+    if codec_id == CODEC_ZLIB:
+        return zlib.decompressobj()
+    elif codec_id == CODEC_LZMA:
+        return lzma.LZMADecompressor()
+    elif codec_id == CODEC_BZ2:
+        return bz2.BZ2Decompressor()
+    raise ExtractionError(f"Unknown compression codec: {codec_id}")
+
+def decompress_stream(pieces: Iterable[bytes], codec_id: Optional[int] = None) -> Iterator[bytes]:
+    """Decompress a stream piece by piece
+
+    Without ``codec_id`` the stream is expected to start with a codec byte,
+    as payloads written before the container header did.
+    """
+    pieces = iter(pieces)
+    rest = b''
+    if codec_id is None:
+        for piece in pieces:
+            rest += piece
+            if rest:
+                break
+        if not rest:
+            raise ExtractionError("Missing compression header")
+        codec_id, rest = rest[0], rest[1:]
+
+    if codec_id == CODEC_NONE:
+        yield rest
+        yield from pieces
+        return
+
+    decompressor = _decompressor(codec_id)
+    try:
+        for piece in chain([rest], pieces):
+            yield decompressor.decompress(piece)
+    except (zlib.error, lzma.LZMAError, OSError, EOFError) as e:
+        raise ExtractionError(f"Decompression failed: {str(e)}")
+    if not decompressor.eof:
+        raise ExtractionError("Compressed payload is truncated")
+
+def decompress(data: bytes, codec_id: int) -> bytes:
+    """Decompress a payload compressed with codec ``codec_id``"""
+    return b''.join(decompress_stream([data], codec_id))
@@ -1,166 +1,1414 @@
+import asyncio
+import contextlib
 import numpy as np
 import cv2
-from scipy import fftpack
+from scipy.fft import idctn
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from math import gcd
+from pathlib import Path
+from typing import (Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Sequence, Tuple, Union)
 import os
+import zlib
+from dataclasses import dataclass
 
-from .encryption import encrypt_data, decrypt_data
-from .utils import add_error_detection, verify_error_detection, encode_data_length, decode_data_length
-from .exceptions import SteganoError, CapacityError, FormatError
+from .archive import (ArchiveEntry, ArchiveFiles, INDEX_PREFIX, index_size, pack_archive,
+                      parse_index, unpack_archive, unpack_member)
+from .batch import (ExtractJob, HideJob, JobResult, PeakMeter, SharedArray, SharedRef, attach,
+                    run_budgeted, run_completed, with_shared)
+from .compression import compress, decompress_stream, CODEC_NONE
+from .encryption import (EnvelopeReader, KeyCache, KeySession, Secret, encrypt_stream,
+                         decrypt_stream, decrypt_data, encrypted_size, envelope_version,
+                         key_session, ENVELOPE_VERSION, CHUNK_SIZE,
+                         HEADER_SIZE as ENVELOPE_HEADER_SIZE, SALT_SIZE)
+from .imagefile import read_region
+from .pipeline import Pipeline
+from .planner import Plan, PlannedJob
+from .shards import (ShardHeader, SET_ID_SIZE, join_shards, pack_shard, shard_capacity,
+                     split_sizes, unpack_shard)
+from .threads import pool_workers, process_pool
+from .utils import (add_error_detection, verify_error_detection, decode_data_length,
+                    dct_band_mask, capacity, image_dimensions, CapacityInfo,
+                    pack_header, unpack_header,
+                    ContainerHeader, CONTAINER_MAGIC, CONTAINER_HEADER_SIZE,
+                    DCT_BLOCK_SIZE, LENGTH_PREFIX_SIZE)
+from .exceptions import (SteganoError, CapacityError, FormatError, ExtractionError,
+                         EncryptionError, ValidationError)
+
+# Quantization step for embedded DCT coefficients. Rounding the luma change
+# to whole pixel values shifts a band coefficient by at most 4, which stays
+# inside the DCT_STEP / 2 decision margin. DCT_HEADROOM is the worst-case
+# luma change of one block when every band coefficient moves a full step.
+DCT_STEP = 8.0
+DCT_HEADROOM = 15
+
+# In-memory carriers: encoded image bytes or a decoded BGR array
+CarrierSource = Union[bytes, bytearray, memoryview, np.ndarray]
+
+# Bytes embedded or extracted per engine call when streaming a payload
+SEGMENT_SIZE = 64 * 1024
+
+# Peak memory model used by SteganoExfil.peak_memory, measured with
+# batch.PeakMeter. Decoding a file holds the image twice, since OpenCV
+# copies its decoded Mat into the returned array. Embedding or reading one
+# DCT segment needs about 20 bytes per pixel of the blocks it covers for
+# the clamped copy, the YCrCb conversion and the float32 luma and
+# coefficient planes; LSB needs the segment's expanded bits. The payload
+# exists as data, framed, compressed and encrypted copies. JOB_OVERHEAD
+# covers codec buffers and allocator slack that dominate small images.
+DECODE_COPIES = 2
+DCT_WORKSPACE_PER_PIXEL = 21
+PAYLOAD_COPIES = 4
+JOB_OVERHEAD = 4 << 20
+
+class ProbeResult(NamedTuple):
+    """Container header found by SteganoExfil.probe"""
+    path: str
+    method: str
+    version: int
+    codec: int
+    payload_bytes: int  # Encrypted envelope bytes following the header
+    archive: bool = False
+    shard: bool = False
+
+@dataclass(frozen=True)
+class HideOptions:
+    """Settings of one hide call
+
+    Options are immutable and travel with the call rather than living on
+    the engine, so one SteganoExfil can serve concurrent hides with
+    different settings from several threads. ``quality`` is clamped to
+    0.1-1.0 and ``compression_level`` to 0-9.
+
+    Raises:
+        ValueError: For an unsupported method
+    """
+    method: str = 'dct'
+    quality: Optional[float] = None
+    compression_level: int = 6
+
+    def __post_init__(self):
+        if self.method not in ('dct', 'lsb'):
+            raise ValueError(f"Unsupported method: {self.method}")
+        if self.quality is not None:
+            object.__setattr__(self, 'quality', max(0.1, min(1.0, self.quality)))
+        object.__setattr__(self, 'compression_level', max(0, min(9, self.compression_level)))
+
+def _hide_options(options: Optional[HideOptions], method: str, quality: Optional[float],
+                  compression_level: int) -> HideOptions:
+    """Per-call options, from ``options`` when given or else the keyword arguments"""
+    if options is None:
+        return HideOptions(method, quality, compression_level)
+    return options
+
+def _aligned(pieces: Iterable[bytes], unit: int, size: int) -> Iterator[bytes]:
+    """Regroup a byte stream into segments whose lengths are multiples of unit
+
+    Only the final segment may be shorter, so every segment starts at an
+    offset that is a multiple of ``unit``.
+    """
+    size = max(unit, size - size % unit)
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+@lru_cache(maxsize=None)
+def _dct_band_basis() -> np.ndarray:
+    """Orthonormal 8x8 DCT basis images of the band as a (band, 64) matrix
+
+    Multiplying a stack of flattened blocks by its transpose yields the band
+    coefficients of every block in one batched call.
+    """
+    index = np.flatnonzero(dct_band_mask())
+    unit = np.eye(DCT_BLOCK_SIZE * DCT_BLOCK_SIZE, dtype=np.float32)[index]
+    unit = unit.reshape(-1, DCT_BLOCK_SIZE, DCT_BLOCK_SIZE)
+    return idctn(unit, axes=(1, 2), norm='ortho').reshape(len(index), -1)
+
+_worker_engine = None
+
+def _engine() -> 'SteganoExfil':
+    """Engine shared by the tasks a pool worker runs"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = SteganoExfil()
+    return _worker_engine
+
+def _probe_worker(path: str) -> Tuple[str, Optional[ProbeResult], Optional[str]]:
+    """Probe one path in a pool worker, reporting errors instead of raising"""
+    try:
+        return path, _engine().probe(path), None
+    except (SteganoError, OSError) as e:
+        return path, None, str(e)
+
+def _embed_shard_worker(job: tuple) -> str:
+    """Embed a framed shard stream into a carrier file and write it out"""
+    carrier_path, output_path, method, stream = job
+    engine = _engine()
+    stego = engine._prepare_carrier_image(carrier_path)
+    engine._write_stream([stream], stego, method)
+    engine._write_image(output_path, stego)
+    return output_path
+
+def _read_shard_worker(job: tuple) -> Tuple[int, bytes]:
+    """Read the codec and encrypted envelope of one shard image"""
+    path, method = job
+    engine = _engine()
+    stego = engine._prepare_carrier_image(path)
+    header = engine.read_header(stego, method)
+    if not header.shard:
+        raise ExtractionError(f"{path} does not hold a shard")
+    segments = engine._iter_segments(stego, method, CONTAINER_HEADER_SIZE, header.length)
+    return header.codec, b''.join(segments)
+
+_batch_secret = None
+
+def _init_batch_worker(secret: Secret) -> None:
+    """Pool initializer: keep the batch secret and warm up native code"""
+    global _batch_secret
+    _batch_secret = secret
+    engine = _engine()
+    engine.key_cache = KeyCache()
+    engine.warm_up(secret)
+
+def _hide_worker(job: HideJob) -> Union[str, SharedRef]:
+    if isinstance(job.carrier, SharedRef):
+        # Embed straight into the shared block; the parent reads it back
+        return with_shared(job.carrier, lambda stego: _engine()._run_hide_shared(
+            job, stego, _batch_secret))
+    return _engine()._run_hide_job(job, _batch_secret)
+
+def _extract_worker(job: ExtractJob) -> Union[str, bytes]:
+    if isinstance(job.stego, SharedRef):
+        return with_shared(job.stego, lambda stego: _engine()._run_extract_job(
+            job._replace(stego=stego), _batch_secret), writeable=False)
+    return _engine()._run_extract_job(job, _batch_secret)
+
+def _pipeline_embed(task: tuple) -> None:
+    """Process stage of hide_pipeline: decode, encrypt and embed into a shared block"""
+    data, encoded, ref, options = task
+    engine = _engine()
+
+    def embed(stego: np.ndarray) -> None:
+        img = engine._load_carrier(encoded)
+        if img.shape != stego.shape:
+            raise FormatError("Image header does not match its pixel data")
+        stego[...] = img
+        engine._embed_job(data, stego, _batch_secret, options)
+
+    with_shared(ref, embed)
+
+def _async_prepare(engine: Optional['SteganoExfil'], data: bytes, encoded: bytes,
+                   options: HideOptions) -> Tuple[np.ndarray, int, bytes]:
+    """First CPU stage of ahide: decode the carrier, frame and compress the data"""
+    engine = engine or _engine()
+    carrier = engine._load_carrier(encoded)
+    codec, payload = compress(add_error_detection(data), options.compression_level)
+    _check_capacity(len(payload), carrier.shape, options.method)
+    return carrier, codec, payload
+
+def _async_embed(engine: Optional['SteganoExfil'], carrier: np.ndarray, codec: int,
+                 payload: bytes, session: KeySession, method: str, ext: str) -> bytes:
+    """Last CPU stage of ahide: encrypt, embed and encode the output image"""
+    engine = engine or _engine()
+    stego = engine._embed_payload(payload, carrier, session, method, codec)
+    return engine._encode_image(stego, ext)
+
+def _async_locate(engine: Optional['SteganoExfil'], encoded: bytes,
+                  method: str) -> Tuple[np.ndarray, Optional[bytes]]:
+    """First CPU stage of aextract: decode the image and find the envelope salt"""
+    engine = engine or _engine()
+    stego = engine._load_carrier(encoded)
+    return stego, engine._envelope_salt(stego, method)
+
+def _async_recover(engine: Optional['SteganoExfil'], stego: np.ndarray, password: Secret,
+                   method: str) -> bytes:
+    """Last CPU stage of aextract: decrypt and verify the payload"""
+    return (engine or _engine())._recover(stego, password, method)
+
+def _check_capacity(payload_size: int, shape: tuple, method: str) -> None:
+    """Raise CapacityError unless a carrier shape holds a payload once encrypted"""
+    if CONTAINER_HEADER_SIZE + encrypted_size(payload_size) > capacity(shape, method).raw_bytes:
+        raise CapacityError(f"Data too large for carrier using {method.upper()} method")
+
+async def _in_executor(executor: Optional[Executor], fn: Callable, *args):
+    """Await fn(*args) in an executor as one cancellable stage
+
+    A stage cannot be interrupted once it runs. When the awaiting task is
+    cancelled, the stage is left to finish before CancelledError is
+    raised, so a limiter held by the caller is not released early.
+    """
+    future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        if not future.cancelled():
+            future.exception()  # Consumed; the caller was cancelled
+        raise
+
+def _read_image_file(path: str, formats: List[str]) -> bytes:
+    """Read an image file's encoded bytes, as _prepare_carrier_image checks it"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in formats:
+        raise FormatError(f"Unsupported format: {ext}")
+    try:
+        return Path(path).read_bytes()
+    except OSError:
+        raise FormatError("Could not load image")
+
+_fanout_memory = None
+_fanout_bits = None
+
+def _attach_fanout(ref: SharedRef) -> None:
+    """Pool initializer mapping the shared fan-out bits read-only"""
+    global _fanout_memory, _fanout_bits
+    _fanout_memory, _fanout_bits = attach(ref, writeable=False)
+
+def _fanout_worker(job: tuple) -> Tuple[str, str, Optional[str]]:
+    """Embed the shared fan-out bits into one carrier file"""
+    carrier_path, output_path, method = job
+    return _engine()._embed_bits_file(_fanout_bits, carrier_path, output_path, method)
+
+def _pool_map(fn: Callable, jobs: Iterable, workers: int,
+              initializer: Callable = None, initargs: tuple = ()) -> Iterator:
+    """Map fn over jobs in a process pool, yielding results in order
+
+    At most two jobs per worker are in flight, so job arguments produced
+    by a generator are only built as workers become free. With one worker
+    the jobs run in this process and ``initializer`` is not called.
+    """
+    if workers <= 1:
+        yield from map(fn, jobs)
+        return
+    with process_pool(workers, initializer, initargs) as pool:
+        pending = deque()
+        try:
+            for job in jobs:
+                pending.append(pool.submit(fn, job))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
 
 class SteganoExfil:
-    def __init__(self):
+    def __init__(self, key_cache: KeyCache = None):
+        """Create an engine; pass a KeyCache to reuse keys across extractions"""
         self.supported_formats = ['.png', '.jpg', '.jpeg', '.bmp']
-        self.quality = 0.8
+        self.key_cache = key_cache
         
     def _prepare_carrier_image(self, image_path: str) -> np.ndarray:
-        """Load and prepare carrier image with format handling"""
+        """Load and prepare carrier image with format handling
+
+        JPEGs are decoded straight to BGR with EXIF orientation ignored,
+        which yields the same pixels as a lossless re-encode of the raw
+        decode without any filesystem side effects.
+        """
         ext = os.path.splitext(image_path)[1].lower()
         if ext not in self.supported_formats:
             raise FormatError(f"Unsupported format: {ext}")
         
+        flags = cv2.IMREAD_COLOR
         if ext in ['.jpg', '.jpeg']:
-            img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
-            if img is None:
-                raise FormatError("Could not load image")
-            temp_path = image_path + '.tmp.png'
-            cv2.imwrite(temp_path, img)
-            img = cv2.imread(temp_path)
-            os.remove(temp_path)
-            return img
-        
-        return cv2.imread(image_path)
-
-    def _calculate_dct_capacity(self, carrier: np.ndarray) -> int:
-        """Calculate maximum number of bits that can be hidden using DCT"""
-        y = cv2.cvtColor(carrier, cv2.COLOR_BGR2YCrCb)[:,:,0]
-        capacity = 0
-        for i in range(y.shape[0]):
-            for j in range(y.shape[1]):
-                if 4 <= i + j <= 8:
-                    capacity += 1
-        return capacity
+            flags |= cv2.IMREAD_IGNORE_ORIENTATION
+        img = cv2.imread(image_path, flags)
+        if img is None:
+            raise FormatError("Could not load image")
+        return img
 
-    def hide_data(self, data: bytes, carrier_image_path: str, 
-                 output_path: str, password: str,
-                 method: str = 'dct', quality: float = None) -> None:
-        """Hide data in carrier image using specified method"""
-        if quality is not None:
-            self.quality = max(0.1, min(1.0, quality))
-            
-        # Add error detection and length prefix
-        data_with_detection = add_error_detection(data)
-        data_with_length = encode_data_length(len(data_with_detection)) + data_with_detection
-        encrypted_data = encrypt_data(data_with_length, password)
-        
-        # Load and validate carrier
-        carrier = self._prepare_carrier_image(carrier_image_path)
-        
-        # Check capacity
+    def warm_up(self, secret: Secret = None) -> None:
+        """Pay the one-off setup costs of native code before the first real call
+
+        The first OpenCV colour conversion, SciPy transform and AES-GCM call
+        in a process are slow; a tiny round trip through both methods makes
+        them here. The cipher is only warmed up with a KeySession, whose key
+        is already derived.
+        """
+        warm = np.zeros((16, 16, 3), dtype=np.uint8)
+        for method in ('lsb', 'dct'):
+            self._writer(method)(b'\x00\x00', warm, inplace=True)
+            self._reader(method)(warm, 0, 2)
+        if isinstance(secret, KeySession):
+            b''.join(encrypt_stream([b''], secret))
+
+    def capacity(self, shape: tuple, method: str = 'dct') -> CapacityInfo:
+        """Capacity of a carrier with the given (height, width[, channels])
+
+        Computed from the dimensions alone; see utils.capacity.
+        """
+        return capacity(shape, method)
+
+    def peak_memory(self, shape: tuple, method: str = 'dct', payload_size: int = None,
+                    decode: bool = True) -> int:
+        """Estimated peak memory in bytes of one hide or extraction
+
+        ``shape`` is the carrier's (height, width[, channels]) and
+        ``payload_size`` the data size, by default the carrier's raw
+        capacity, which bounds what an extraction can find. Without
+        ``decode`` the image is taken to be decoded already, e.g. an array
+        in shared memory. The estimate is the larger of decoding and
+        embedding one segment, plus the payload's copies.
+        """
+        height, width = shape[:2]
+        if payload_size is None:
+            payload_size = capacity(shape, method).raw_bytes
+        image = height * width * 3
+        segment = min(payload_size + CONTAINER_HEADER_SIZE, SEGMENT_SIZE)
         if method == 'dct':
-            capacity = self._calculate_dct_capacity(carrier)
-            if len(encrypted_data) * 8 > capacity:
-                raise CapacityError("Data too large for carrier using DCT method")
-            stego_img = self._hide_dct(encrypted_data, carrier)
+            blocks = -(-segment * 8 // int(dct_band_mask().sum()))
+            workspace = DCT_WORKSPACE_PER_PIXEL * min(height * width,
+                                                      blocks * DCT_BLOCK_SIZE * DCT_BLOCK_SIZE)
         elif method == 'lsb':
-            if len(encrypted_data) * 8 > carrier.size * 3:
-                raise CapacityError("Data too large for carrier using LSB method")
-            stego_img = self._hide_lsb(encrypted_data, carrier)
+            workspace = segment * 8
         else:
             raise ValueError(f"Unsupported method: {method}")
+        return (JOB_OVERHEAD + PAYLOAD_COPIES * payload_size
+                + max(DECODE_COPIES * image if decode else 0, image + workspace))
+
+    def _job_peak(self, job: Union[HideJob, ExtractJob]) -> Optional[int]:
+        """peak_memory of a batch job from image headers, or None if unknown"""
+        image = job.carrier if isinstance(job, HideJob) else job.stego
+        try:
+            if isinstance(image, (str, Path)):
+                shape, decode = image_dimensions(image), True
+            else:  # Array or SharedRef, already decoded
+                shape, decode = image.shape, False
+            payload_size = None
+            if isinstance(job, HideJob):
+                if isinstance(job.data, (bytes, bytearray, memoryview)):
+                    payload_size = len(job.data)
+                elif isinstance(job.data, (list, tuple)):
+                    payload_size = sum(os.path.getsize(f) for f in job.data)
+                else:
+                    payload_size = os.path.getsize(job.data)
+            return self.peak_memory(shape, job.method, payload_size, decode)
+        except (SteganoError, OSError, ValueError):
+            return None
+
+    def _load_carrier(self, carrier: CarrierSource) -> np.ndarray:
+        """Decode an in-memory carrier to an 8-bit BGR array
+
+        Encoded images are decoded with cv2.imdecode over a zero-copy view
+        of the buffer. Arrays are validated and returned as they are.
+        """
+        if isinstance(carrier, np.ndarray):
+            if carrier.dtype != np.uint8 or carrier.ndim != 3 or carrier.shape[2] != 3:
+                raise FormatError("Carrier array must be 8-bit BGR of shape (height, width, 3)")
+            return carrier
+
+        buffer = np.frombuffer(carrier, dtype=np.uint8)
+        flags = cv2.IMREAD_COLOR
+        if buffer[:2].tobytes() == b'\xff\xd8':  # JPEG, see _prepare_carrier_image
+            flags |= cv2.IMREAD_IGNORE_ORIENTATION
+        img = cv2.imdecode(buffer, flags)
+        if img is None:
+            raise FormatError("Could not decode image")
+        return img
+
+    def hide_data(self, data: bytes, carrier_image_path: str, 
+                 output_path: str, password: Secret,
+                 method: str = 'dct', quality: float = None,
+                 compression_level: int = 6, options: HideOptions = None) -> None:
+        """Hide data in carrier image using specified method
+
+        ``password`` may be a KeySession to share one key derivation across
+        a batch of hides. Data is compressed before encryption when that
+        pays off; ``compression_level`` 0 disables compression. A
+        HideOptions passed as ``options`` replaces the method, quality and
+        compression arguments; every hide method accepts one.
+        """
+        options = _hide_options(options, method, quality, compression_level)
+        carrier = self._prepare_carrier_image(carrier_image_path)
+        stego_img = self._embed(data, carrier, password, options)
             
         # Save stego image
-        cv2.imwrite(output_path, stego_img)
+        self._write_image(output_path, stego_img)
 
-    def _hide_dct(self, data: bytes, carrier: np.ndarray) -> np.ndarray:
-        """Hide data using DCT with quality control"""
-        ycrcb = cv2.cvtColor(carrier, cv2.COLOR_BGR2YCrCb)
-        y = ycrcb[:,:,0]
-        
-        dct = fftpack.dct(fftpack.dct(y.T, norm='ortho').T, norm='ortho')
-        
-        # Convert data to binary
-        binary_data = ''.join(format(byte, '08b') for byte in data)
-        
-        # Embed data in mid-frequency coefficients
-        data_index = 0
-        for i in range(dct.shape[0]):
-            for j in range(dct.shape[1]):
-                if data_index < len(binary_data):
-                    if 4 <= i + j <= 8:  # Mid-frequency band
-                        dct[i,j] = np.round(dct[i,j])
-                        if binary_data[data_index] == '1':
-                            dct[i,j] = np.ceil(dct[i,j])
-                        else:
-                            dct[i,j] = np.floor(dct[i,j])
-                        data_index += 1
-                        
-        # Inverse DCT
-        y_stego = fftpack.idct(fftpack.idct(dct.T, norm='ortho').T, norm='ortho')
-        ycrcb[:,:,0] = y_stego
-        
-        return cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
+    def hide_array(self, data: bytes, carrier: CarrierSource, password: Secret,
+                   method: str = 'dct', quality: float = None,
+                   compression_level: int = 6, options: HideOptions = None) -> np.ndarray:
+        """Hide data in an in-memory carrier and return the stego BGR array
 
-    def _hide_lsb(self, data: bytes, carrier: np.ndarray) -> np.ndarray:
-        """Hide data using LSB substitution"""
-        binary_data = ''.join(format(byte, '08b') for byte in data)
-        data_len = len(binary_data)
-        
-        flat_carrier = carrier.flatten()
-        if data_len > len(flat_carrier):
+        The carrier may be encoded image bytes, a memoryview or a BGR array;
+        a caller's array is never modified.
+        """
+        options = _hide_options(options, method, quality, compression_level)
+        img = self._load_carrier(carrier)
+        if img is carrier:
+            img = img.copy()
+        return self._embed(data, img, password, options)
+
+    def hide_buffer(self, data: bytes, carrier: CarrierSource, password: Secret,
+                    method: str = 'dct', quality: float = None,
+                    compression_level: int = 6, options: HideOptions = None) -> bytes:
+        """Hide data in an in-memory carrier and return PNG-encoded bytes"""
+        stego_img = self.hide_array(data, carrier, password, method, quality,
+                                    compression_level, options)
+        return self._encode_png(stego_img)
+
+    async def ahide(self, data: bytes, carrier_image_path: str, output_path: str,
+                    password: Secret, method: str = 'dct', quality: float = None,
+                    compression_level: int = 6, options: HideOptions = None, *,
+                    executor: Executor = None, limiter: asyncio.Semaphore = None) -> None:
+        """Coroutine counterpart of hide_data that never blocks the event loop
+
+        The carrier is read and the output written in the loop's default
+        executor. The CPU stages - decoding and compressing, deriving the
+        key, embedding and encoding - run one after another in
+        ``executor``: None for the loop's default thread pool, or any
+        concurrent.futures executor. OpenCV, NumPy and the cipher release
+        the GIL, so threads embed in parallel; with a ProcessPoolExecutor
+        each stage runs on the worker's own engine. Cancelling the task
+        stops it between stages, so a cancelled hide never writes its
+        output. ``limiter``, e.g. an asyncio.Semaphore shared by callers,
+        bounds how many calls run at once.
+        """
+        options = _hide_options(options, method, quality, compression_level)
+        if limiter is None:
+            return await self._ahide(data, carrier_image_path, output_path, password,
+                                     options, executor)
+        async with limiter:
+            return await self._ahide(data, carrier_image_path, output_path, password,
+                                     options, executor)
+
+    async def _ahide(self, data: bytes, carrier_image_path: str, output_path: str,
+                     password: Secret, options: HideOptions,
+                     executor: Optional[Executor]) -> None:
+        engine = self._stage_engine(executor)
+        encoded = await _in_executor(None, _read_image_file, str(carrier_image_path),
+                                     self.supported_formats)
+        carrier, codec, payload = await _in_executor(executor, _async_prepare, engine,
+                                                     data, encoded, options)
+        if not isinstance(password, KeySession):
+            password = await _in_executor(executor, key_session, password)
+        image = await _in_executor(executor, _async_embed, engine, carrier, codec, payload,
+                                   password, options.method,
+                                   os.path.splitext(str(output_path))[1].lower())
+        await _in_executor(None, Path(output_path).write_bytes, image)
+
+    def _stage_engine(self, executor: Optional[Executor]) -> Optional['SteganoExfil']:
+        """Engine passed to async stages; None makes process workers use their own"""
+        return None if isinstance(executor, ProcessPoolExecutor) else self
+
+    def hide_archive(self, files: ArchiveFiles, carrier_image_path: str,
+                     output_path: str, password: Secret, method: str = 'dct',
+                     quality: float = None, compression_level: int = 6,
+                     options: HideOptions = None) -> None:
+        """Hide several named files in one carrier under one encryption envelope
+
+        ``files`` maps names to contents, or is a sequence of (name, data)
+        pairs. Members are compressed one by one and indexed, so a single
+        member can later be extracted with extract_member.
+        """
+        options = _hide_options(options, method, quality, compression_level)
+        carrier = self._prepare_carrier_image(carrier_image_path)
+        stego_img = self._embed_payload(pack_archive(files, options.compression_level), carrier,
+                                        password, options.method, archive=True)
+        self._write_image(output_path, stego_img)
+
+    def hide_archive_buffer(self, files: ArchiveFiles, carrier: CarrierSource,
+                            password: Secret, method: str = 'dct', quality: float = None,
+                            compression_level: int = 6,
+                            options: HideOptions = None) -> bytes:
+        """Hide an archive of named files in an in-memory carrier; returns PNG bytes"""
+        options = _hide_options(options, method, quality, compression_level)
+        img = self._load_carrier(carrier)
+        if img is carrier:
+            img = img.copy()
+        stego_img = self._embed_payload(pack_archive(files, options.compression_level), img,
+                                        password, options.method, archive=True)
+        return self._encode_png(stego_img)
+
+    def hide_sharded(self, data: Union[bytes, str, Path], carrier_image_paths: Sequence[str],
+                     output_paths: Sequence[str], password: Secret, method: str = 'dct',
+                     quality: float = None, compression_level: int = 6,
+                     workers: int = None, options: HideOptions = None) -> int:
+        """Split data too large for one carrier across several carriers
+
+        ``data`` is the payload bytes, or the path of a file that is read
+        one slice at a time. Each carrier receives a slice in proportion
+        to its capacity, read from the image header. Slices are compressed
+        and encrypted as separate envelopes under one key derivation and
+        carry their set id, position and CRC32, so extract_sharded
+        reassembles them from the images in any order. Carriers are
+        decoded, embedded and written by ``workers`` processes (default:
+        thread budget), with at most two slices per worker in memory.
+        Carriers left without a slice are not written. Returns the number
+        of shards.
+        """
+        if len(carrier_image_paths) != len(output_paths):
+            raise ValidationError("Need one output path per carrier")
+        if not carrier_image_paths:
+            raise ValidationError("Need at least one carrier")
+        options = _hide_options(options, method, quality, compression_level)
+        method = options.method
+
+        capacities = [shard_capacity(image_dimensions(p), method) for p in carrier_image_paths]
+        total = os.path.getsize(data) if isinstance(data, (str, Path)) else len(data)
+        sizes = split_sizes(total, capacities)
+        # Empty data still needs one shard to carry the set
+        used = ([i for i, size in enumerate(sizes) if size]
+                or [capacities.index(max(capacities))])
+        session = password if isinstance(password, KeySession) else KeySession(password)
+        set_id = os.urandom(SET_ID_SIZE)
+
+        def jobs() -> Iterator[tuple]:
+            with contextlib.ExitStack() as stack:
+                if isinstance(data, (str, Path)):
+                    source = stack.enter_context(open(data, 'rb'))
+                    read = source.read
+                else:
+                    view, offset = memoryview(data), 0
+
+                    def read(size: int) -> memoryview:
+                        nonlocal offset
+                        offset += size
+                        return view[offset - size:offset]
+                for index, i in enumerate(used):
+                    piece = read(sizes[i])
+                    if len(piece) != sizes[i]:
+                        raise ValidationError(f"{data} changed while it was being read")
+                    codec, body = compress(piece, options.compression_level)
+                    header = ShardHeader(set_id, index, len(used), total, zlib.crc32(piece))
+                    envelope = b''.join(encrypt_stream([pack_shard(header, body)], session))
+                    yield (str(carrier_image_paths[i]), str(output_paths[i]), method,
+                           pack_header(method, codec, len(envelope), shard=True) + envelope)
+
+        workers = min(pool_workers(workers), len(used))
+        for _ in _pool_map(_embed_shard_worker, jobs(), workers):
+            pass
+        return len(used)
+
+    def _encode_png(self, stego_img: np.ndarray) -> bytes:
+        return self._encode_image(stego_img, '.png')
+
+    def _encode_image(self, stego_img: np.ndarray, ext: str) -> bytes:
+        """Encode a stego array in the format named by a file extension"""
+        try:
+            ok, encoded = cv2.imencode(ext, stego_img)
+        except cv2.error:
+            ok = False
+        if not ok:
+            raise FormatError(f"Could not encode stego image as {ext or 'an image'}")
+        return encoded.tobytes()
+
+    def _embed(self, data: bytes, carrier: np.ndarray, password: Secret,
+               options: HideOptions) -> np.ndarray:
+        """Frame, compress, encrypt and embed data into a carrier array in place"""
+        # Add error detection, then compress
+        data_with_detection = add_error_detection(data)
+        codec, compressed = compress(data_with_detection, options.compression_level)
+        return self._embed_payload(compressed, carrier, password, options.method, codec)
+
+    def _embed_payload(self, payload: bytes, carrier: np.ndarray, password: Secret,
+                       method: str, codec: int = CODEC_NONE,
+                       archive: bool = False) -> np.ndarray:
+        """Encrypt prepared payload bytes and embed them in place
+
+        Encrypted chunks are written to the carrier as they are produced,
+        so only one segment of payload bits is expanded at a time.
+        """
+        self._writer(method)
+
+        # Check capacity before paying for key derivation
+        _check_capacity(len(payload), carrier.shape, method)
+        encrypted_length = encrypted_size(len(payload))
+
+        stego = np.ascontiguousarray(carrier)
+        stream = chain([pack_header(method, codec, encrypted_length, archive)],
+                       encrypt_stream([payload], password))
+        self._write_stream(stream, stego, method)
+        return stego
+
+    def hide_many(self, jobs: Iterable[HideJob], password: Secret,
+                  workers: int = None, memory_budget: int = None) -> Iterator[JobResult]:
+        """Run hide jobs across a process pool, yielding results as they finish
+
+        The password is stretched once for the whole batch. Each worker
+        warms up OpenCV, SciPy and the cipher when it starts. Results come
+        in completion order; JobResult.index gives the job's input position
+        and JobResult.error describes a failed job without stopping the
+        others. ``workers`` defaults to the thread budget; with 1 the jobs run
+        in this process. Carriers given as arrays travel to and from the
+        workers through shared memory rather than being pickled; a caller's
+        array is never modified.
+
+        With ``memory_budget`` (bytes), jobs are admitted so that the
+        estimated peak memory (see peak_memory) of the jobs in flight
+        stays within it, smaller jobs running around larger ones; see
+        batch.run_budgeted. Results then carry the estimated and the
+        measured peak of every job.
+        """
+        session = password if isinstance(password, KeySession) else KeySession(password)
+        return self._run_batch(_hide_worker, self._run_hide_job, jobs, 'carrier',
+                               session, workers, memory_budget)
+
+    def extract_many(self, jobs: Iterable[ExtractJob], password: Secret,
+                     workers: int = None, memory_budget: int = None) -> Iterator[JobResult]:
+        """Run extraction jobs across a process pool, yielding results as they finish
+
+        Each worker keeps its own KeyCache, so images hidden under one key
+        session cost one key derivation per worker; so does a serial run
+        on an engine without a cache. See hide_many.
+        """
+        engine = self if self.key_cache is not None else SteganoExfil(key_cache=KeyCache())
+        return self._run_batch(_extract_worker, engine._run_extract_job, jobs, 'stego',
+                               password, workers, memory_budget)
+
+    def hide_pipeline(self, jobs: Iterable[HideJob], password: Secret, readers: int = 2,
+                      workers: int = None, writers: int = 2, depth: int = None) -> Pipeline:
+        """Run hide jobs as a pipeline of read, embed and write stages
+
+        ``readers`` threads read each job's payload and encoded carrier and
+        size a shared block for it from the image header; ``workers``
+        processes (default: thread budget) decode the carrier into the block,
+        compress, encrypt and embed; ``writers`` threads encode the PNG
+        from the block and write it out. Stages are joined by queues of
+        ``depth`` jobs, see pipeline.Pipeline. The password is stretched
+        once for the whole batch.
+
+        Jobs need a carrier path and an output path. Iterate the returned
+        pipeline for JobResults in completion order; its stats() then
+        give per-stage utilization.
+        """
+        session = password if isinstance(password, KeySession) else KeySession(password)
+
+        def read(job: HideJob) -> tuple:
+            if job.output is None or not isinstance(job.carrier, (str, Path)):
+                raise ValidationError("Pipeline jobs need a carrier path and an output path")
+            ext = os.path.splitext(str(job.carrier))[1].lower()
+            if ext not in self.supported_formats:
+                raise FormatError(f"Unsupported format: {ext}")
+            options = HideOptions(job.method, job.quality, job.compression_level)
+            data = self._job_data(job)
+            encoded = Path(job.carrier).read_bytes()
+            block = SharedArray(image_dimensions(encoded) + (3,))
+            return (data, encoded, block.ref, options), block
+
+        def write(job: HideJob, block: SharedArray, _) -> str:
+            self._write_image(job.output, block.array)
+            return job.output
+
+        return Pipeline(jobs, read, _pipeline_embed, write, release=SharedArray.release,
+                        readers=readers, workers=workers, writers=writers, depth=depth,
+                        initializer=_init_batch_worker, initargs=(session,))
+
+    def _run_batch(self, worker: Callable, run: Callable, jobs: Iterable, field: str,
+                   secret: Secret, workers: int = None,
+                   memory_budget: int = None) -> Iterator[JobResult]:
+        workers = pool_workers(workers)
+        if workers > 1:
+            return self._run_pool(worker, jobs, field, secret, workers, memory_budget)
+        return self._run_serial(run, jobs, secret, measure=memory_budget is not None)
+
+    def _run_pool(self, worker: Callable, jobs: Iterable, field: str, secret: Secret,
+                  workers: int, memory_budget: int = None) -> Iterator[JobResult]:
+        """Run jobs in a process pool, passing image arrays through shared memory
+
+        An array in the job's ``field`` is copied into a SharedArray when
+        the job is submitted and the worker gets its SharedRef. The block
+        is released as soon as the job's result is collected, or when the
+        run stops early, so at most the queued jobs hold one each. A hide
+        worker embeds into the block and answers with its ref; the stego
+        image is then copied out for the caller.
+        """
+        blocks = {}
+
+        def submitted() -> Iterator:
+            for index, job in enumerate(jobs):
+                value = getattr(job, field)
+                if isinstance(value, np.ndarray):
+                    try:
+                        block = SharedArray.copy_of(self._load_carrier(value))
+                    except FormatError:
+                        yield job  # Fails in the worker and is reported there
+                        continue
+                    blocks[index] = block, job
+                    job = job._replace(**{field: block.ref})
+                yield job
+
+        if memory_budget is None:
+            results = run_completed(worker, submitted(), workers, _init_batch_worker, (secret,))
+        else:
+            results = run_budgeted(worker, submitted(), workers, memory_budget, self._job_peak,
+                                   _init_batch_worker, (secret,))
+        try:
+            for result in results:
+                if result.index in blocks:
+                    block, job = blocks.pop(result.index)
+                    value = result.result
+                    if isinstance(value, SharedRef):
+                        value = block.array.copy()
+                    block.release()
+                    result = result._replace(job=job, result=value)
+                yield result
+        finally:
+            for block, _ in blocks.values():
+                block.release()
+
+    def _run_serial(self, run: Callable, jobs: Iterable, secret: Secret,
+                    measure: bool = False) -> Iterator[JobResult]:
+        """Run jobs one by one here; with ``measure``, report peaks as run_budgeted does"""
+        for index, job in enumerate(jobs):
+            estimate = self._job_peak(job) if measure else None
+            meter = PeakMeter() if measure else None
+            try:
+                with meter or contextlib.nullcontext():
+                    result = run(job, secret)
+            except Exception as e:  # Reported per job, as pool workers' errors are
+                yield JobResult(index, job, None, str(e) or type(e).__name__,
+                                estimate=estimate)
+            else:
+                yield JobResult(index, job, result, None, meter and meter.peak, estimate)
+
+    def _run_hide_job(self, job: HideJob, secret: Secret) -> Union[str, np.ndarray]:
+        options = HideOptions(job.method, job.quality, job.compression_level)
+        if isinstance(job.carrier, (str, Path)):
+            carrier = self._prepare_carrier_image(str(job.carrier))
+        else:
+            carrier = self._load_carrier(job.carrier)
+            if carrier is job.carrier:
+                carrier = carrier.copy()
+        stego = self._embed_job(self._job_data(job), carrier, secret, options)
+        if job.output is None:
+            return stego
+        self._write_image(job.output, stego)
+        return job.output
+
+    def _run_hide_shared(self, job: HideJob, stego: np.ndarray,
+                         secret: Secret) -> Union[str, SharedRef]:
+        """Run a hide job whose carrier was mapped from shared memory, in place"""
+        options = HideOptions(job.method, job.quality, job.compression_level)
+        self._embed_job(self._job_data(job), stego, secret, options)
+        if job.output is None:
+            return job.carrier
+        self._write_image(job.output, stego)
+        return job.output
+
+    def _job_data(self, job: HideJob) -> Union[bytes, ArchiveFiles]:
+        """Payload of a hide job, or (name, data) members for a list of files"""
+        if isinstance(job.data, (bytes, bytearray, memoryview)):
+            return job.data
+        if isinstance(job.data, (list, tuple)):
+            return [(Path(f).name, Path(f).read_bytes()) for f in job.data]
+        return Path(job.data).read_bytes()
+
+    def _embed_job(self, data: Union[bytes, ArchiveFiles], carrier: np.ndarray,
+                   secret: Secret, options: HideOptions) -> np.ndarray:
+        """Embed _job_data in place, as an archive when it lists members"""
+        if isinstance(data, list):
+            return self._embed_payload(pack_archive(data, options.compression_level), carrier,
+                                       secret, options.method, archive=True)
+        return self._embed(data, carrier, secret, options)
+
+    def _write_image(self, path: str, stego: np.ndarray) -> None:
+        """Write a stego image, raising FormatError when OpenCV cannot"""
+        try:
+            ok = cv2.imwrite(str(path), stego)
+        except cv2.error:  # e.g. no encoder for the extension
+            ok = False
+        if not ok:
+            raise FormatError(f"Could not write {path}")
+
+    def _run_extract_job(self, job: ExtractJob, secret: Secret) -> Union[str, bytes]:
+        if isinstance(job.stego, (str, Path)):
+            data = self.extract_data(str(job.stego), secret, job.method)
+        else:
+            data = self.extract_buffer(job.stego, secret, job.method)
+        if job.output is None:
+            return data
+        Path(job.output).write_bytes(data)
+        return job.output
+
+    def execute_plan(self, plan: Plan, password: Secret, quality: float = None,
+                     compression_level: int = 6
+                     ) -> Iterator[Tuple[PlannedJob, Optional[str]]]:
+        """Run the jobs of a plan from planner.plan_jobs or read_manifest
+
+        Jobs with one file are hidden as with hide_data, jobs with several
+        as an archive named by their file names. The password is stretched
+        once for the whole plan. Yields (job, error) in plan order;
+        ``error`` describes a failed job without stopping the others.
+        """
+        options = HideOptions(plan.method, quality, compression_level)
+        session = password if isinstance(password, KeySession) else KeySession(password)
+        for job in plan.jobs:
+            try:
+                Path(job.output).parent.mkdir(parents=True, exist_ok=True)
+                if len(job.files) == 1:
+                    self.hide_data(Path(job.files[0]).read_bytes(), job.carrier, job.output,
+                                   session, options=options)
+                else:
+                    files = [(Path(f).name, Path(f).read_bytes()) for f in job.files]
+                    self.hide_archive(files, job.carrier, job.output, session, options=options)
+                yield job, None
+            except (SteganoError, OSError) as e:
+                yield job, str(e)
+
+    def hide_fanout(self, data: bytes, carrier_image_paths: Iterable[str],
+                    output_paths: Iterable[str], password: Secret, method: str = 'dct',
+                    quality: float = None, compression_level: int = 6,
+                    workers: int = None, options: HideOptions = None
+                    ) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """Embed the same data into many carriers, preparing it only once
+
+        The data is framed, compressed and encrypted once and expanded to
+        bits once; the bits are shared read-only with ``workers`` processes
+        (default: thread budget) through shared memory, so each carrier only
+        costs its decode, embed and PNG write. Every carrier holds the same
+        envelope and extracts with extract_data.
+
+        Yields (carrier path, output path, error) in input order; ``error``
+        describes carriers that could not be written, e.g. because they are
+        too small, without stopping the others.
+        """
+        options = _hide_options(options, method, quality, compression_level)
+        method = options.method
+        codec, payload = compress(add_error_detection(data), options.compression_level)
+        envelope = b''.join(encrypt_stream([payload], password))
+        stream = pack_header(method, codec, len(envelope)) + envelope
+        jobs = ((str(c), str(o), method) for c, o in zip(carrier_image_paths, output_paths))
+
+        workers = pool_workers(workers)
+        if workers == 1:
+            bits = np.unpackbits(np.frombuffer(stream, dtype=np.uint8))
+            for job in jobs:
+                yield self._embed_bits_file(bits, *job)
+            return
+
+        with SharedArray((len(stream) * 8,)) as block:
+            block.array[:] = np.unpackbits(np.frombuffer(stream, dtype=np.uint8))
+            yield from _pool_map(_fanout_worker, jobs, workers, _attach_fanout, (block.ref,))
+
+    def _embed_bits_file(self, bits: np.ndarray, carrier_path: str, output_path: str,
+                         method: str) -> Tuple[str, str, Optional[str]]:
+        """Embed a framed bit stream into a carrier file, reporting errors"""
+        try:
+            # Reject small carriers from their header, before decoding
+            if len(bits) > capacity(image_dimensions(carrier_path), method).bits:
+                raise CapacityError(f"Data too large for carrier using {method.upper()} method")
+            stego = self._prepare_carrier_image(carrier_path)
+            self._write_bits(bits, stego, method)
+            self._write_image(output_path, stego)
+            return carrier_path, output_path, None
+        except (SteganoError, OSError) as e:
+            return carrier_path, output_path, str(e)
+
+    def _write_bits(self, bits: np.ndarray, stego: np.ndarray, method: str) -> None:
+        """Embed an expanded bit stream from offset 0, segment by segment, in place"""
+        write = self._bit_writer(method)
+        unit = self._write_unit(method)
+        step = max(unit, SEGMENT_SIZE - SEGMENT_SIZE % unit) * 8
+        for start in range(0, len(bits), step):
+            write(bits[start:start + step], stego, start)
+
+    def _write_stream(self, pieces: Iterable[bytes], stego: np.ndarray, method: str) -> None:
+        """Embed a framed byte stream from offset 0, segment by segment, in place"""
+        write = self._writer(method)
+        offset = 0
+        for segment in _aligned(pieces, self._write_unit(method), SEGMENT_SIZE):
+            write(segment, stego, inplace=True, offset=offset)
+            offset += len(segment)
+
+    def _writer(self, method: str):
+        """Engine function writing bytes at a byte offset for a method"""
+        if method == 'dct':
+            return self._hide_dct
+        elif method == 'lsb':
+            return self._hide_lsb
+        raise ValueError(f"Unsupported method: {method}")
+
+    def _bit_writer(self, method: str):
+        """Engine function embedding expanded bits at a bit offset in place"""
+        if method == 'dct':
+            return self._embed_dct_bits
+        elif method == 'lsb':
+            return self._embed_lsb_bits
+        raise ValueError(f"Unsupported method: {method}")
+
+    def _reader(self, method: str):
+        """Engine function reading bytes at a byte offset for a method"""
+        if method == 'dct':
+            return self._read_dct
+        elif method == 'lsb':
+            return self._read_lsb
+        raise ValueError(f"Unsupported method: {method}")
+
+    def _write_unit(self, method: str) -> int:
+        """Byte granularity at which a method's writes may start"""
+        if method == 'dct':
+            # DCT writes must start on a block boundary
+            per_block = int(dct_band_mask().sum())
+            return per_block // gcd(per_block, 8)
+        return 1
+
+    def _to_blocks(self, plane: np.ndarray) -> np.ndarray:
+        """Stack the 8x8 blocks of a plane in raster order as (nblocks, 64)"""
+        b = DCT_BLOCK_SIZE
+        rows, cols = plane.shape[0] // b, plane.shape[1] // b
+        return (plane[:rows*b, :cols*b]
+                .reshape(rows, b, cols, b)
+                .swapaxes(1, 2)
+                .reshape(-1, b * b))
+
+    def _from_blocks(self, blocks: np.ndarray, rows: int, cols: int) -> np.ndarray:
+        """Inverse of _to_blocks for a rows x cols block grid"""
+        b = DCT_BLOCK_SIZE
+        return blocks.reshape(rows, cols, b, b).swapaxes(1, 2).reshape(rows*b, cols*b)
+
+    def _embed_dct_region(self, region: np.ndarray, bits: np.ndarray) -> None:
+        """Embed bits in raster order into the blocks of a BGR region in place"""
+        basis = _dct_band_basis()
+        rows = region.shape[0] // DCT_BLOCK_SIZE
+        cols = region.shape[1] // DCT_BLOCK_SIZE
+
+        base = np.clip(region, DCT_HEADROOM, 255 - DCT_HEADROOM)
+        y = cv2.cvtColor(base, cv2.COLOR_BGR2YCrCb)[:, :, 0].astype(np.float32)
+        band = self._to_blocks(y) @ basis.T
+
+        # Move each coefficient to the nearest quantization index whose
+        # parity is the bit, stepping towards the coefficient when rounding
+        # landed on the wrong parity
+        coeffs = band.reshape(-1)[:len(bits)]
+        index = np.rint(coeffs / DCT_STEP)
+        wrong = (index.astype(np.int64) & 1) != bits
+        toward = np.where(coeffs >= index * DCT_STEP, 1, -1)
+        index += wrong * toward
+
+        delta = np.zeros_like(band)
+        delta.reshape(-1)[:len(bits)] = index * DCT_STEP - coeffs
+        delta_y = np.rint(delta @ basis).astype(np.int8)
+        delta_y = self._from_blocks(delta_y, rows, cols).view(np.uint8)
+
+        # The clamp guarantees base + delta stays in range, so wrapping
+        # uint8 addition of the two's complement delta is exact
+        np.add(base, cv2.merge((delta_y, delta_y, delta_y)), out=region)
+
+    def _block_rects(self, first: int, last: int, cols: int) -> Iterator[tuple]:
+        """Cover blocks [first, last) of a raster grid with rectangles
+
+        Yields (row0, row1, col0, col1) block ranges in raster order: a
+        partial leading row, the full rows, then a partial trailing row.
+        """
+        row, col = divmod(first, cols)
+        end_row, end_col = divmod(last, cols)
+        if row == end_row:
+            if end_col > col:
+                yield row, row + 1, col, end_col
+            return
+        if col:
+            yield row, row + 1, col, cols
+            row += 1
+        if end_row > row:
+            yield row, end_row, 0, cols
+        if end_col:
+            yield end_row, end_row + 1, 0, end_col
+
+    def _hide_dct(self, data: bytes, carrier: np.ndarray,
+                  inplace: bool = False, offset: int = 0) -> np.ndarray:
+        """Hide data in mid-band coefficients of 8x8 luma DCT blocks
+
+        Each band coefficient is quantized with DCT_STEP so that the parity
+        of its quantization index equals the embedded bit. The luma change
+        is added equally to B, G and R, which keeps chroma unchanged and
+        makes the decoder's Y plane match the embedded one to within
+        rounding. Touched blocks are first clamped into
+        [DCT_HEADROOM, 255 - DCT_HEADROOM] so that the change never clips;
+        other blocks are left as they are.
+
+        Writing starts at byte ``offset``, which must fall on a block
+        boundary (see _write_unit) so that earlier blocks are not clamped
+        again.
+        """
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        stego = carrier if inplace else carrier.copy()
+        return self._embed_dct_bits(bits, stego, offset * 8)
+
+    def _embed_dct_bits(self, bits: np.ndarray, stego: np.ndarray, start: int) -> np.ndarray:
+        """Embed expanded bits from bit ``start`` into DCT blocks in place"""
+        per_block = int(dct_band_mask().sum())
+        grid_cols = stego.shape[1] // DCT_BLOCK_SIZE
+        if start % per_block:
+            raise ValueError("DCT writes must start on a block boundary")
+        if start + len(bits) > capacity(stego.shape, 'dct').bits:
+            raise CapacityError("Data too large for carrier using DCT method")
+
+        b = DCT_BLOCK_SIZE
+        first = start // per_block
+        last = first + -(-len(bits) // per_block)
+        pos = 0
+        for row0, row1, col0, col1 in self._block_rects(first, last, grid_cols):
+            count = (row1 - row0) * (col1 - col0) * per_block
+            self._embed_dct_region(stego[row0*b:row1*b, col0*b:col1*b], bits[pos:pos + count])
+            pos += count
+        return stego
+
+    def _read_dct(self, stego: np.ndarray, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes starting at byte ``offset`` from DCT blocks
+
+        Only the block rows that hold the requested bits are converted and
+        transformed.
+        """
+        per_block = int(dct_band_mask().sum())
+        grid_cols = stego.shape[1] // DCT_BLOCK_SIZE
+        start, stop = offset * 8, (offset + length) * 8
+        if stop > capacity(stego.shape, 'dct').bits:
+            raise ExtractionError("No hidden data found or data corrupted")
+        if length == 0:
+            return b""
+
+        first, last = start // per_block, -(-stop // per_block)
+        row0, row1 = first // grid_cols, -(-last // grid_cols)
+        b = DCT_BLOCK_SIZE
+        strip = stego[row0*b:row1*b, :grid_cols*b]
+        y = cv2.cvtColor(strip, cv2.COLOR_BGR2YCrCb)[:, :, 0].astype(np.float32)
+        blocks = self._to_blocks(y)[first - row0*grid_cols:last - row0*grid_cols]
+
+        band = (blocks @ _dct_band_basis().T).reshape(-1)
+        band = band[start - first*per_block:stop - first*per_block]
+        bits = (np.rint(band / DCT_STEP).astype(np.int64) & 1).astype(np.uint8)
+        return np.packbits(bits).tobytes()
+
+    def _extract_dct(self, stego: np.ndarray) -> bytes:
+        """Extract the length-prefixed payload from DCT blocks"""
+        return b''.join(self._iter_payload(stego, 'dct'))
+
+    def _hide_lsb(self, data: bytes, carrier: np.ndarray,
+                  inplace: bool = False, offset: int = 0) -> np.ndarray:
+        """Hide data using LSB substitution
+
+        Bits are written MSB-first into the row/column/channel order of the
+        carrier, starting at byte ``offset``. With ``inplace=True`` a
+        contiguous carrier is modified directly instead of being copied;
+        always use the returned array.
+        """
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        if offset * 8 + len(bits) > carrier.size:
             raise CapacityError("Data too large for carrier image")
-            
-        for i in range(data_len):
-            flat_carrier[i] = (flat_carrier[i] & 254) | int(binary_data[i])
-            
-        return flat_carrier.reshape(carrier.shape)
 
-    def extract_data(self, stego_image_path: str, password: str,
+        stego = carrier if inplace and carrier.flags.c_contiguous else carrier.copy()
+        return self._embed_lsb_bits(bits, stego, offset * 8)
+
+    def _embed_lsb_bits(self, bits: np.ndarray, stego: np.ndarray, start: int) -> np.ndarray:
+        """Embed expanded bits from bit ``start`` into a contiguous carrier in place"""
+        if start + len(bits) > stego.size:
+            raise CapacityError("Data too large for carrier image")
+        plane = stego.reshape(-1).view(np.uint8)[start:start + len(bits)]
+        np.bitwise_and(plane, 0xFE, out=plane)
+        np.bitwise_or(plane, bits, out=plane)
+        return stego
+
+    def extract_data(self, stego_image_path: str, password: Secret,
                     method: str = 'dct') -> bytes:
         """Extract hidden data from stego image"""
         stego = self._prepare_carrier_image(stego_image_path)
-        
-        if method == 'dct':
-            encrypted_data = self._extract_dct(stego)
-        elif method == 'lsb':
-            encrypted_data = self._extract_lsb(stego)
-        else:
-            raise ValueError(f"Unsupported method: {method}")
-            
-        # Decrypt and verify data
-        decrypted_data = decrypt_data(encrypted_data, password)
+        return self._recover(stego, password, method)
+
+    def extract_buffer(self, stego: CarrierSource, password: Secret,
+                       method: str = 'dct') -> bytes:
+        """Extract hidden data from encoded image bytes or a BGR array"""
+        return self._recover(self._load_carrier(stego), password, method)
+
+    async def aextract(self, stego_image_path: str, password: Secret, method: str = 'dct', *,
+                       executor: Executor = None, limiter: asyncio.Semaphore = None) -> bytes:
+        """Coroutine counterpart of extract_data that never blocks the event loop
+
+        The image is read in the loop's default executor; decoding, key
+        derivation and decryption run as separate stages in ``executor``,
+        with cancellation and ``limiter`` as for ahide. The engine's
+        KeyCache is used when the stages run in threads.
+        """
+        if limiter is None:
+            return await self._aextract(stego_image_path, password, method, executor)
+        async with limiter:
+            return await self._aextract(stego_image_path, password, method, executor)
+
+    async def _aextract(self, stego_image_path: str, password: Secret, method: str,
+                        executor: Optional[Executor]) -> bytes:
+        self._reader(method)  # Validates the method
+        engine = self._stage_engine(executor)
+        encoded = await _in_executor(None, _read_image_file, str(stego_image_path),
+                                     self.supported_formats)
+        stego, salt = await _in_executor(executor, _async_locate, engine, encoded, method)
+        if salt is not None and not isinstance(password, KeySession):
+            cache = self.key_cache if engine is not None else None
+            password = await _in_executor(executor, key_session, password, salt, cache)
+        return await _in_executor(executor, _async_recover, engine, stego, password, method)
+
+    def _envelope_salt(self, stego: np.ndarray, method: str) -> Optional[bytes]:
+        """Salt of the envelope hidden in a stego array, if one can be read
+
+        Lets aextract derive the key as a stage of its own. Images holding
+        no plain payload give None; _recover then reports what is wrong.
+        """
+        try:
+            head = self._reader(method)(stego, 0, CONTAINER_HEADER_SIZE)
+            if head[:len(CONTAINER_MAGIC)] != CONTAINER_MAGIC:
+                return None
+            header = self.read_header(stego, method, head)
+            if header.archive or header.shard or header.length < ENVELOPE_HEADER_SIZE:
+                return None
+            envelope = self._reader(method)(stego, CONTAINER_HEADER_SIZE, ENVELOPE_HEADER_SIZE)
+            if envelope_version(envelope) == 1:
+                return None
+        except SteganoError:
+            return None
+        return envelope[1:1 + SALT_SIZE]
+
+    def _recover(self, stego: np.ndarray, password: Secret, method: str) -> bytes:
+        """Read, decrypt and verify the payload of a stego array
+
+        The container header is read first, so images without hidden data
+        are rejected after a few dozen bits and before any key derivation.
+        Payload segments are then decrypted and decompressed as they are
+        read from the image.
+        """
+        head = self._reader(method)(stego, 0, CONTAINER_HEADER_SIZE)
+        if head[:len(CONTAINER_MAGIC)] != CONTAINER_MAGIC:
+            return self._recover_legacy(stego, password, method)
+
+        header = self.read_header(stego, method, head)
+        if header.archive:
+            raise ExtractionError("Image holds an archive; use extract_archive or extract_member")
+        if header.shard:
+            raise ExtractionError("Image holds one shard of a set; use extract_sharded")
+        segments = self._iter_segments(stego, method, CONTAINER_HEADER_SIZE, header.length)
+        plaintext = decrypt_stream(segments, password, self.key_cache)
+        return verify_error_detection(b''.join(decompress_stream(plaintext, header.codec)))
+
+    def extract_sharded(self, stego_image_paths: Iterable[str], password: Secret,
+                        method: str = 'dct', workers: int = None) -> bytes:
+        """Reassemble data split by hide_sharded from its images, in any order
+
+        Images are read by ``workers`` processes (default: thread budget) and
+        their envelopes decrypted here, with one key derivation for the set.
+
+        Raises:
+            ExtractionError: If an image is not a shard, or shards are
+            missing, duplicated or from different sets
+            IntegrityError: If a slice does not match its checksum
+        """
+        paths = [str(p) for p in stego_image_paths]
+        # All shards of a set share a salt, so a one-entry cache suffices
+        cache = self.key_cache or KeyCache(maxsize=1)
+        workers = min(pool_workers(workers), len(paths))
+        shards = []
+        for codec, envelope in _pool_map(_read_shard_worker,
+                                         ((p, method) for p in paths), workers):
+            header, body = unpack_shard(decrypt_data(envelope, password, cache))
+            shards.append((header, b''.join(decompress_stream([body], codec))))
+        return join_shards(shards)
+
+    def read_header(self, stego: Union[str, Path, CarrierSource], method: str,
+                    head: bytes = None) -> ContainerHeader:
+        """Read and validate the container header of a stego image
+
+        ``stego`` is an image path, encoded image bytes or a BGR array.
+
+        Raises:
+            ExtractionError: If the image carries no data for ``method``
+        """
+        stego = self._load_stego(stego)
+        if head is None:
+            head = self._reader(method)(stego, 0, CONTAINER_HEADER_SIZE)
+        header = unpack_header(head)
+        if header.method != method:
+            raise ExtractionError(f"Data was hidden with the {header.method.upper()} method")
+        if CONTAINER_HEADER_SIZE + header.length > capacity(stego.shape, method).raw_bytes:
+            raise ExtractionError("No hidden data found or data corrupted")
+        return header
+
+    def is_archive(self, stego: Union[str, Path, CarrierSource], method: str) -> bool:
+        """Whether a stego image holds an archive rather than a single payload
+
+        Images without a container header, including those written before
+        it existed, are not archives; extract_data handles them.
+        """
+        try:
+            return self.read_header(stego, method).archive
+        except ExtractionError:
+            return False
+
+    def list_archive(self, stego: Union[str, Path, CarrierSource], password: Secret,
+                     method: str = 'dct') -> List[ArchiveEntry]:
+        """List the members of an archive, decrypting only its index
+
+        ``stego`` is an image path, encoded image bytes or a BGR array.
+        """
+        _, entries, _ = self._open_archive(self._load_stego(stego), password, method)
+        return entries
+
+    def extract_member(self, stego: Union[str, Path, CarrierSource], name: str,
+                       password: Secret, method: str = 'dct') -> bytes:
+        """Extract one named archive member
+
+        Only the bits of the chunks holding the index and that member are
+        read from the image and decrypted.
+        """
+        read_plain, entries, data_start = self._open_archive(self._load_stego(stego),
+                                                             password, method)
+        for entry in entries:
+            if entry.name == name:
+                start = data_start + entry.offset
+                return unpack_member(entry, read_plain(start, start + entry.length))
+        raise ExtractionError(f"No archive member named {name}")
+
+    def extract_archive(self, stego: Union[str, Path, CarrierSource], password: Secret,
+                        method: str = 'dct') -> Dict[str, bytes]:
+        """Extract every archive member as a name -> data mapping"""
+        img = self._load_stego(stego)
+        header = self.read_header(img, method)
+        if not header.archive:
+            raise ExtractionError("Image does not hold an archive")
+        segments = self._iter_segments(img, method, CONTAINER_HEADER_SIZE, header.length)
+        return unpack_archive(b''.join(decrypt_stream(segments, password, self.key_cache)))
+
+    def _load_stego(self, stego: Union[str, Path, CarrierSource]) -> np.ndarray:
+        """Load a stego image from a path or an in-memory source"""
+        if isinstance(stego, (str, Path)):
+            return self._prepare_carrier_image(str(stego))
+        return self._load_carrier(stego)
+
+    def _open_archive(self, stego: np.ndarray, password: Secret, method: str):
+        """Open an archive for random access
+
+        Returns a function reading plaintext byte ranges, the index entries
+        and the plaintext offset of the member data. Decrypted chunks are
+        kept for the lifetime of the returned function.
+        """
+        header = self.read_header(stego, method)
+        if not header.archive:
+            raise ExtractionError("Image does not hold an archive")
+        read = self._reader(method)
+        envelope = EnvelopeReader(read(stego, CONTAINER_HEADER_SIZE, ENVELOPE_HEADER_SIZE),
+                                  header.length, password, self.key_cache)
+        chunks = {}
+
+        def read_plain(start: int, stop: int) -> bytes:
+            indices = envelope.chunk_range(start, stop)
+            for i in indices:
+                if i not in chunks:
+                    offset, size = envelope.sealed_span(i)
+                    chunks[i] = envelope.decrypt_chunk(
+                        i, read(stego, CONTAINER_HEADER_SIZE + offset, size))
+            base = indices.start * CHUNK_SIZE
+            return b''.join(chunks[i] for i in indices)[start - base:stop - base]
+
+        size = index_size(read_plain(0, INDEX_PREFIX.size))
+        return read_plain, parse_index(read_plain(0, size)), size
+
+    def _recover_legacy(self, stego: np.ndarray, password: Secret, method: str) -> bytes:
+        """Recover data hidden before the container header was introduced
+
+        Those images start with a bare length prefix; the envelope format
+        is checked before any key derivation.
+        """
+        segments = self._iter_payload(stego, method)
+        first = next(segments, b'')
+        try:
+            version = envelope_version(first)
+        except EncryptionError:
+            raise ExtractionError("No hidden data found or data corrupted")
+        plaintext = decrypt_stream(chain([first], segments), password, self.key_cache)
+        if version == ENVELOPE_VERSION:
+            plaintext = decompress_stream(plaintext)
+        decrypted_data = b''.join(plaintext)
         length = decode_data_length(decrypted_data[:4])
         data_with_detection = decrypted_data[4:4+length]
         return verify_error_detection(data_with_detection)
 
-    def _extract_dct(self, stego: np.ndarray) -> bytes:
-        """Extract data from DCT coefficients"""
-        ycrcb = cv2.cvtColor(stego, cv2.COLOR_BGR2YCrCb)
-        y = ycrcb[:,:,0]
-        
-        dct = fftpack.dct(fftpack.dct(y.T, norm='ortho').T, norm='ortho')
-        
-        extracted_bits = []
-        for i in range(dct.shape[0]):
-            for j in range(dct.shape[1]):
-                if 4 <= i + j <= 8:
-                    bit = '1' if np.round(dct[i,j]) % 2 == 1 else '0'
-                    extracted_bits.append(bit)
-                    
-        extracted_bytes = []
-        for i in range(0, len(extracted_bits), 8):
-            byte = int(''.join(extracted_bits[i:i+8]), 2)
-            extracted_bytes.append(byte)
-            
-        return bytes(extracted_bytes)
+    def _read_lsb(self, stego: np.ndarray, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes starting at byte ``offset`` from the LSBs"""
+        start, stop = offset * 8, (offset + length) * 8
+        if stop > stego.size:
+            raise ExtractionError("No hidden data found or data corrupted")
+        plane = stego.reshape(-1)[start:stop]
+        return np.packbits(plane & 1).tobytes()
 
     def _extract_lsb(self, stego: np.ndarray) -> bytes:
-        """Extract data from LSBs"""
-        flat_stego = stego.flatten()
-        extracted_bits = [str(pixel & 1) for pixel in flat_stego]
-        
-        extracted_bytes = []
-        for i in range(0, len(extracted_bits), 8):
-            byte = int(''.join(extracted_bits[i:i+8]), 2)
-            extracted_bytes.append(byte)
-            
-        return bytes(extracted_bytes) 
\ No newline at end of file
+        """Extract the length-prefixed payload from LSBs
+
+        Only the 32-bit length header and the payload bits it announces are
+        read, so the cost scales with the payload rather than the image.
+        """
+        return b''.join(self._iter_payload(stego, 'lsb'))
+
+    def _iter_payload(self, stego: np.ndarray, method: str) -> Iterator[bytes]:
+        """Read a legacy length prefix, then yield the payload it announces"""
+        length = decode_data_length(self._reader(method)(stego, 0, LENGTH_PREFIX_SIZE))
+        return self._iter_segments(stego, method, LENGTH_PREFIX_SIZE, length)
+
+    def _iter_segments(self, stego: np.ndarray, method: str,
+                       offset: int, length: int) -> Iterator[bytes]:
+        """Yield ``length`` embedded bytes from ``offset`` segment by segment"""
+        if offset + length > capacity(stego.shape, method).raw_bytes:
+            raise ExtractionError("No hidden data found or data corrupted")
+        read = self._reader(method)
+        return (read(stego, offset + pos, min(SEGMENT_SIZE, length - pos))
+                for pos in range(0, length, SEGMENT_SIZE))
+
+    def probe(self, image_path: str) -> Optional[ProbeResult]:
+        """Look for a container header without a password
+
+        Only the top-left pixels that can hold the header are decoded; for
+        PNG and BMP files they are read without decoding the rest of the
+        image. Returns None for images without a header, including images
+        written before the container header existed.
+        """
+        height, width = image_dimensions(image_path)
+        region = self._probe_region(image_path, height, width)
+        for method in ('lsb', 'dct'):
+            try:
+                header = unpack_header(self._reader(method)(region, 0, CONTAINER_HEADER_SIZE))
+            except ExtractionError:
+                continue
+            total = CONTAINER_HEADER_SIZE + header.length
+            if header.method == method and total <= capacity((height, width), method).raw_bytes:
+                return ProbeResult(str(image_path), method, header.version,
+                                   header.codec, header.length, header.archive, header.shard)
+        return None
+
+    def _probe_region(self, image_path: str, height: int, width: int) -> np.ndarray:
+        """Decode the top-left pixels holding the header for every method
+
+        The DCT header fills the first blocks in raster order and the LSB
+        header the first pixels of the first rows.
+        """
+        b = DCT_BLOCK_SIZE
+        header_bits = CONTAINER_HEADER_SIZE * 8
+        header_blocks = -(-header_bits // int(dct_band_mask().sum()))
+        grid_cols = max(1, width // b)
+        rows = max(b * -(-header_blocks // grid_cols), -(-header_bits // (3 * width)))
+        cols = header_blocks * b if grid_cols >= header_blocks else width
+
+        region = read_region(image_path, rows, cols)
+        if region is None:
+            region = self._prepare_carrier_image(image_path)[:rows, :cols]
+        return region
+
+    def probe_many(self, paths: Iterable[str], workers: int = None
+                   ) -> Iterator[Tuple[str, Optional[ProbeResult], Optional[str]]]:
+        """Probe many images across a process pool
+
+        Yields (path, result, error) in input order; ``result`` is None when
+        no header was found and ``error`` describes unreadable files.
+        ``workers=1`` probes in this process.
+        """
+        paths = [str(p) for p in paths]
+        workers = pool_workers(workers)
+        if workers == 1 or len(paths) < 2:
+            yield from map(_probe_worker, paths)
+            return
+        chunksize = max(1, min(256, len(paths) // (workers * 4)))
+        with process_pool(workers) as pool:
+            yield from pool.map(_probe_worker, paths, chunksize=chunksize)
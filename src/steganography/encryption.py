@@ -1,16 +1,63 @@
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from collections import OrderedDict
+from itertools import chain
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
 import base64
+import hashlib
 import os
-from .exceptions import EncryptionError
+import threading
+import time
+from .exceptions import EncryptionError, SteganoError
+
+SALT_SIZE = 16
+
+# Streaming envelope (version 3):
+#   version (1) | salt (16) | item id (16) | sealed chunks
+# The salt feeds PBKDF2 for a master key, which may be shared by a batch of
+# envelopes (see KeySession). HKDF over the random item id then gives each
+# envelope its own AES key and nonce prefix. Each chunk holds up to
+# CHUNK_SIZE plaintext bytes followed by a 16-byte AES-GCM tag. The nonce
+# is prefix | chunk counter (4, big-endian) | final flag (1), so chunks
+# cannot be reordered, dropped or truncated, and the envelope header is
+# bound to every chunk as associated data.
+#
+# Version 2 stored a random nonce prefix in place of the item id and used
+# the PBKDF2 key directly; it is still read.
+ENVELOPE_VERSION = 3
+ITEM_ID_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+HEADER_SIZE = 1 + SALT_SIZE + ITEM_ID_SIZE
+V2_HEADER_SIZE = 1 + SALT_SIZE + NONCE_PREFIX_SIZE
+TAG_SIZE = 16
+CHUNK_SIZE = 64 * 1024
+
+# Fernet tokens start with version 0x80 and a big-endian timestamp, which
+# base64-encodes to this prefix for any date before the year 10889
+FERNET_PREFIX = b'gAAAAA'
+
+def encrypted_size(length: int) -> int:
+    """Size of encrypt_data output for a plaintext of ``length`` bytes"""
+    chunks = max(1, -(-length // CHUNK_SIZE))
+    return HEADER_SIZE + length + chunks * TAG_SIZE
+
+def envelope_version(encrypted_data: bytes) -> int:
+    """Return 1 for legacy salt + Fernet data, else the envelope version byte"""
+    if encrypted_data[SALT_SIZE:SALT_SIZE + len(FERNET_PREFIX)] == FERNET_PREFIX:
+        return 1
+    if encrypted_data[:1] in (b'\x02', b'\x03'):
+        return encrypted_data[0]
+    raise EncryptionError("Unrecognized encryption format")
 
 def generate_key(password: str, salt: bytes = None) -> tuple[bytes, bytes]:
     """Generate encryption key from password with optional salt"""
     try:
         if salt is None:
-            salt = os.urandom(16)
-        
+            salt = os.urandom(SALT_SIZE)
+
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
@@ -22,22 +69,230 @@ def generate_key(password: str, salt: bytes = None) -> tuple[bytes, bytes]:
     except Exception as e:
         raise EncryptionError(f"Key generation failed: {str(e)}")
 
-def encrypt_data(data: bytes, password: str) -> bytes:
-    """Encrypt data using Fernet with random salt"""
+class KeySession:
+    """Password-derived master key shared by a batch of envelopes
+
+    The expensive PBKDF2 step runs once, when the session is created; each
+    envelope encrypted with the session gets its own key from HKDF over a
+    random item id kept in its header. The password itself is not stored.
+    Pass a session wherever a password is accepted.
+    """
+
+    def __init__(self, password: str, salt: bytes = None):
+        self.salt, key = generate_key(password, salt)
+        self._master = base64.urlsafe_b64decode(key)
+
+    def item_key(self, item_id: bytes) -> tuple[bytes, bytes]:
+        """Return the AES key and nonce prefix for an envelope item id"""
+        okm = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32 + NONCE_PREFIX_SIZE,
+            salt=None,
+            info=b'steganography item ' + item_id,
+        ).derive(self._master)
+        return okm[:32], okm[32:]
+
+# Anything accepted where a password is expected
+Secret = Union[str, KeySession]
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+class KeyCache:
+    """Bounded cache of derived keys for decrypting known salts
+
+    Entries are keyed by a BLAKE2b hash of (password, salt) under a random
+    per-cache key, so neither the password nor a hash that could be checked
+    offline against it is retained. At most ``maxsize`` entries are kept,
+    least recently used first out, and each expires ``ttl`` seconds after
+    it was derived.
+    """
+
+    def __init__(self, maxsize: int = 32, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._hash_key = os.urandom(32)
+        self._entries: OrderedDict[bytes, tuple[float, KeySession]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, password: str, salt: bytes) -> bytes:
+        h = hashlib.blake2b(key=self._hash_key, digest_size=32)
+        h.update(salt)
+        h.update(password.encode())
+        return h.digest()
+
+    def session(self, password: str, salt: bytes) -> KeySession:
+        """Return the KeySession for (password, salt), deriving it on a miss"""
+        digest = self._digest(password, salt)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(digest, None)
+            self.misses += 1
+
+        session = KeySession(password, salt)
+        with self._lock:
+            self._entries[digest] = (now + self.ttl, session)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return session
+
+    def cache_info(self) -> CacheInfo:
+        """Return hit/miss counters and the current number of entries"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        """Drop all cached keys and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+def key_session(secret: Secret, salt: bytes = None,
+                cache: Optional[KeyCache] = None) -> KeySession:
+    """Return a KeySession for a secret, checking its salt if given"""
+    if isinstance(secret, KeySession):
+        if salt is not None and salt != secret.salt:
+            raise EncryptionError("Data was encrypted under a different key session")
+        return secret
+    if cache is not None and salt is not None:
+        return cache.session(secret, salt)
+    return KeySession(secret, salt)
+
+def _nonce(prefix: bytes, counter: int, final: bool) -> bytes:
+    return prefix + counter.to_bytes(4, byteorder='big') + (b'\x01' if final else b'\x00')
+
+def _split(pieces: Iterable[bytes], size: int) -> Iterator[Tuple[bytes, bool]]:
+    """Re-cut a byte stream into ``size``-byte chunks flagged when final
+
+    One chunk is held back until more input arrives so that the final chunk
+    is known even when the stream length is a multiple of ``size``.
+    """
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) > size:
+            yield bytes(buffer[:size]), False
+            del buffer[:size]
+    yield bytes(buffer), True
+
+def encrypt_stream(pieces: Iterable[bytes], password: Secret) -> Iterator[bytes]:
+    """Encrypt a stream of plaintext pieces into the chunked AEAD envelope
+
+    Yields the envelope header followed by one sealed chunk at a time, so
+    output can be consumed before the whole plaintext is available.
+    """
     try:
-        salt, key = generate_key(password)
-        f = Fernet(key)
-        encrypted = f.encrypt(data)
-        return salt + encrypted
+        session = key_session(password)
+        item_id = os.urandom(ITEM_ID_SIZE)
+        header = bytes([ENVELOPE_VERSION]) + session.salt + item_id
+        key, prefix = session.item_key(item_id)
+        aead = AESGCM(key)
+        yield header
+        for counter, (chunk, final) in enumerate(_split(pieces, CHUNK_SIZE)):
+            yield aead.encrypt(_nonce(prefix, counter, final), chunk, header)
+    except SteganoError:
+        raise
     except Exception as e:
         raise EncryptionError(f"Encryption failed: {str(e)}")
 
-def decrypt_data(encrypted_data: bytes, password: str) -> bytes:
-    """Decrypt data using stored salt"""
+def decrypt_stream(pieces: Iterable[bytes], password: Secret,
+                   cache: Optional[KeyCache] = None) -> Iterator[bytes]:
+    """Decrypt a stream of envelope pieces, yielding plaintext chunk by chunk
+
+    Legacy salt + Fernet data is recognized and decrypted as a whole. With
+    a KeyCache, keys for previously seen (password, salt) pairs are reused.
+    """
     try:
-        salt, encrypted = encrypted_data[:16], encrypted_data[16:]
-        _, key = generate_key(password, salt)
-        f = Fernet(key)
-        return f.decrypt(encrypted)
+        pieces = iter(pieces)
+        head = bytearray()
+        for piece in pieces:
+            head += piece
+            if len(head) >= max(HEADER_SIZE, SALT_SIZE + len(FERNET_PREFIX)):
+                break
+
+        version = envelope_version(head)
+        if version == 1:
+            yield _decrypt_fernet(bytes(head) + b''.join(pieces), password, cache)
+            return
+
+        size = HEADER_SIZE if version == ENVELOPE_VERSION else V2_HEADER_SIZE
+        header = bytes(head[:size])
+        session = key_session(password, header[1:1 + SALT_SIZE], cache)
+        if version == ENVELOPE_VERSION:
+            key, prefix = session.item_key(header[1 + SALT_SIZE:])
+        else:
+            key, prefix = session._master, header[1 + SALT_SIZE:]
+        aead = AESGCM(key)
+        sealed = _split(chain([bytes(head[size:])], pieces), CHUNK_SIZE + TAG_SIZE)
+        for counter, (chunk, final) in enumerate(sealed):
+            yield aead.decrypt(_nonce(prefix, counter, final), chunk, header)
+    except SteganoError:
+        raise
     except Exception as e:
-        raise EncryptionError(f"Decryption failed: {str(e)}") 
\ No newline at end of file
+        raise EncryptionError(f"Decryption failed: {str(e) or type(e).__name__}")
+
+class EnvelopeReader:
+    """Random access to the sealed chunks of a current-version envelope
+
+    Each chunk authenticates on its own, so any plaintext range can be
+    decrypted from just the chunks that cover it. ``length`` is the size
+    of the whole envelope, which fixes which chunk is final.
+    """
+
+    def __init__(self, header: bytes, length: int, password: Secret,
+                 cache: Optional[KeyCache] = None):
+        if header[:1] != bytes([ENVELOPE_VERSION]) or len(header) < HEADER_SIZE:
+            raise EncryptionError("Random access needs a version 3 envelope")
+        self._header = bytes(header[:HEADER_SIZE])
+        session = key_session(password, self._header[1:1 + SALT_SIZE], cache)
+        key, self._prefix = session.item_key(self._header[1 + SALT_SIZE:])
+        self._aead = AESGCM(key)
+        self.length = length
+        sealed = CHUNK_SIZE + TAG_SIZE
+        self.chunk_count = max(1, -(-(length - HEADER_SIZE) // sealed))
+
+    def chunk_range(self, start: int, stop: int) -> range:
+        """Indices of the chunks holding plaintext bytes [start, stop)"""
+        first = start // CHUNK_SIZE
+        return range(first, max(first + 1, -(-stop // CHUNK_SIZE)))
+
+    def sealed_span(self, index: int) -> Tuple[int, int]:
+        """Envelope offset and size of sealed chunk ``index``"""
+        offset = HEADER_SIZE + index * (CHUNK_SIZE + TAG_SIZE)
+        return offset, min(CHUNK_SIZE + TAG_SIZE, self.length - offset)
+
+    def decrypt_chunk(self, index: int, sealed: bytes) -> bytes:
+        """Authenticate and decrypt sealed chunk ``index``"""
+        if not 0 <= index < self.chunk_count:
+            raise EncryptionError(f"Chunk {index} is outside the envelope")
+        nonce = _nonce(self._prefix, index, index == self.chunk_count - 1)
+        try:
+            return self._aead.decrypt(nonce, sealed, self._header)
+        except Exception as e:
+            raise EncryptionError(f"Decryption failed: {str(e) or type(e).__name__}")
+
+def _decrypt_fernet(encrypted_data: bytes, password: Secret,
+                    cache: Optional[KeyCache] = None) -> bytes:
+    """Decrypt the legacy salt + Fernet token format"""
+    salt, encrypted = encrypted_data[:SALT_SIZE], encrypted_data[SALT_SIZE:]
+    session = key_session(password, salt, cache)
+    return Fernet(base64.urlsafe_b64encode(session._master)).decrypt(encrypted)
+
+def encrypt_data(data: bytes, password: Secret) -> bytes:
+    """Encrypt data into a chunked AES-GCM envelope with random salt"""
+    return b''.join(encrypt_stream([data], password))
+
+def decrypt_data(encrypted_data: bytes, password: Secret,
+                 cache: Optional[KeyCache] = None) -> bytes:
+    """Decrypt data using stored salt; legacy Fernet data is accepted"""
+    return b''.join(decrypt_stream([encrypted_data], password, cache))
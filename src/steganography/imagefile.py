@@ -0,0 +1,146 @@
+"""Partial decoding of the top-left corner of PNG and BMP images
+
+Locating a container header only needs the first few pixel rows of an
+image. For non-interlaced 8-bit PNGs and uncompressed BMPs those rows are
+read straight from the file, without decoding the rest of the image; the
+pixels match cv2.imread(path, cv2.IMREAD_COLOR).
+"""
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+import numpy as np
+from .exceptions import FormatError
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG colour type -> samples per pixel (palette images are not handled)
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+def read_region(path: Union[str, Path], rows: int, cols: int) -> Optional[np.ndarray]:
+    """Read the top-left ``rows`` x ``cols`` pixels of an image as 8-bit BGR
+
+    Rows and columns are clipped to the image size. Returns None when the
+    file is not a PNG or BMP variant that can be read partially; callers
+    then fall back to a full decode.
+
+    Raises:
+        FormatError: If a supported file is truncated or corrupt
+    """
+    with open(path, 'rb') as f:
+        head = f.read(8)
+        f.seek(0)
+        if head == PNG_SIGNATURE:
+            return _png_region(f, rows, cols)
+        if head[:2] == b'BM':
+            return _bmp_region(f, rows, cols)
+    return None
+
+def _png_region(f: BinaryIO, rows: int, cols: int) -> Optional[np.ndarray]:
+    f.seek(len(PNG_SIGNATURE))
+    length, chunk_type = struct.unpack('>I4s', f.read(8))
+    if chunk_type != b'IHDR' or length != 13:
+        raise FormatError("Invalid PNG header")
+    width, height, depth, color, _, _, interlace = struct.unpack('>IIBBBBB', f.read(13))
+    f.seek(4, 1)
+    if depth != 8 or interlace or color not in PNG_CHANNELS:
+        return None
+
+    channels = PNG_CHANNELS[color]
+    stride = width * channels
+    rows, cols = min(rows, height), min(cols, width)
+    need = rows * (stride + 1)
+    inflate = zlib.decompressobj()
+    raw = bytearray()
+    try:
+        while len(raw) < need:
+            header = f.read(8)
+            if len(header) < 8:
+                raise FormatError("Truncated PNG data")
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type == b'IEND':
+                break
+            if chunk_type != b'IDAT':
+                f.seek(length + 4, 1)
+                continue
+            data = f.read(length)
+            f.seek(4, 1)
+            while data and len(raw) < need:
+                raw += inflate.decompress(data, need - len(raw))
+                data = inflate.unconsumed_tail
+    except zlib.error as e:
+        raise FormatError(f"Corrupt PNG data: {str(e)}")
+    if len(raw) < need:
+        raise FormatError("Truncated PNG data")
+
+    pixels = np.frombuffer(_unfilter(raw, rows, stride + 1, cols * channels, channels),
+                           dtype=np.uint8).reshape(rows, cols, channels)
+    if channels <= 2:
+        return np.repeat(pixels[:, :, :1], 3, axis=2)
+    return np.ascontiguousarray(pixels[:, :, 2::-1])
+
+def _unfilter(raw: bytearray, rows: int, line: int, n: int, bpp: int) -> bytes:
+    """Undo PNG row filters for the first ``n`` bytes of each row
+
+    Every filter depends only on bytes to the left and above, so a row
+    prefix can be reconstructed without the rest of the row.
+    """
+    prev = bytearray(n)
+    out = bytearray()
+    for r in range(rows):
+        pos = r * line
+        ftype = raw[pos]
+        cur = bytearray(raw[pos + 1:pos + 1 + n])
+        if ftype == 1:
+            for i in range(bpp, n):
+                cur[i] = (cur[i] + cur[i - bpp]) & 0xFF
+        elif ftype == 2:
+            for i in range(n):
+                cur[i] = (cur[i] + prev[i]) & 0xFF
+        elif ftype == 3:
+            for i in range(n):
+                left = cur[i - bpp] if i >= bpp else 0
+                cur[i] = (cur[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif ftype == 4:
+            for i in range(n):
+                a = cur[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    pred = a
+                elif pb <= pc:
+                    pred = b
+                else:
+                    pred = c
+                cur[i] = (cur[i] + pred) & 0xFF
+        elif ftype != 0:
+            raise FormatError(f"Invalid PNG filter type: {ftype}")
+        out += cur
+        prev = cur
+    return bytes(out)
+
+def _bmp_region(f: BinaryIO, rows: int, cols: int) -> Optional[np.ndarray]:
+    head = f.read(54)
+    if len(head) < 54:
+        raise FormatError("Truncated BMP header")
+    offset, dib_size = struct.unpack('<I', head[10:14])[0], struct.unpack('<I', head[14:18])[0]
+    if dib_size < 40:
+        return None
+    width, height, _, bpp, compression = struct.unpack('<iiHHI', head[18:34])
+    if bpp not in (24, 32) or compression != 0 or width <= 0:
+        return None
+
+    channels = bpp // 8
+    stride = (width * channels + 3) & ~3
+    rows, cols = min(rows, abs(height)), min(cols, width)
+    pixels = np.empty((rows, cols, 3), dtype=np.uint8)
+    for r in range(rows):
+        # Positive heights store rows bottom-up
+        file_row = height - 1 - r if height > 0 else r
+        f.seek(offset + file_row * stride)
+        data = f.read(cols * channels)
+        if len(data) < cols * channels:
+            raise FormatError("Truncated BMP data")
+        pixels[r] = np.frombuffer(data, dtype=np.uint8).reshape(cols, channels)[:, :3]
+    return pixels
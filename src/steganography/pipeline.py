@@ -0,0 +1,276 @@
+"""Staged batch execution with bounded queues
+
+A pipeline overlaps the I/O and CPU work of a batch: reader threads load
+jobs, a process pool transforms them and writer threads store the
+results, so disks are busy while images are embedded and the other way
+round. Stages are joined by bounded queues; a slow stage holds the
+others back instead of letting loaded jobs pile up in memory. Every
+stage reports how busy it was, which shows where the bottleneck is.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional
+from .batch import JobResult, share_tracker
+from .threads import pool_workers, process_pool
+
+STAGES = ('read', 'process', 'write')
+
+class StageStats(NamedTuple):
+    """Activity of one pipeline stage"""
+    name: str
+    workers: int
+    jobs: int           # Jobs the stage handled, failed ones included
+    busy: float         # Seconds spent working, summed over the stage's workers
+    utilization: float  # busy / (wall time * workers)
+
+# End of stream, passed from one stage to the next
+_DONE = object()
+# How often blocked queue operations check whether the run was stopped
+_POLL = 0.1
+
+def _timed(fn: Callable, task: Any) -> tuple:
+    """Run a process stage function in a pool worker, with its run time"""
+    start = time.perf_counter()
+    result = fn(task)
+    return result, time.perf_counter() - start
+
+class Pipeline:
+    """Run jobs through read (threads), process (processes) and write (threads)
+
+    ``read(job)`` returns a (task, state) pair. The task is sent to a pool
+    worker running ``process(task)``, which must be a module-level
+    function; the state stays in this process. ``write(job, state,
+    processed)`` then stores the outcome and returns the job's result.
+    ``release(state)``, when given, runs once for every state read,
+    whether its job succeeded or not.
+
+    At most ``depth`` jobs (default: two per worker) wait between reading
+    and processing, and as many are being processed or written. Iterating
+    runs the pipeline and yields a JobResult per job in completion order;
+    a failing job sets its error without stopping the others. stats()
+    then reports per-stage utilization. A pipeline runs once.
+    """
+
+    def __init__(self, jobs: Iterable, read: Callable, process: Callable, write: Callable,
+                 release: Callable = None, readers: int = 2, workers: int = None,
+                 writers: int = 2, depth: int = None, initializer: Callable = None,
+                 initargs: tuple = ()):
+        self.jobs = jobs
+        self.read = read
+        self.process = process
+        self.write = write
+        self.release = release
+        self.workers = {'read': max(1, readers), 'process': pool_workers(workers),
+                        'write': max(1, writers)}
+        self.depth = depth or 2 * self.workers['process']
+        self.initializer = initializer
+        self.initargs = initargs
+        self._busy = dict.fromkeys(STAGES, 0.0)
+        self._count = dict.fromkeys(STAGES, 0)
+        self._lock = threading.Lock()
+        self._wall = 0.0
+        self._error = None
+
+    def stats(self) -> List[StageStats]:
+        """Per-stage activity of the run so far, in stage order"""
+        stats = []
+        for name in STAGES:
+            capacity = self._wall * self.workers[name]
+            stats.append(StageStats(name, self.workers[name], self._count[name],
+                                    self._busy[name],
+                                    self._busy[name] / capacity if capacity else 0.0))
+        return stats
+
+    def __iter__(self) -> Iterator[JobResult]:
+        jobs = enumerate(self.jobs)
+        read_queue = queue.Queue(self.depth)
+        write_queue = queue.Queue()  # Bounded by in_flight
+        results = queue.Queue()
+        in_flight = threading.Semaphore(self.depth)
+        stop = threading.Event()
+        readers_left = [self.workers['read']]
+        writers_left = [self.workers['write']]
+
+        def reader() -> None:
+            try:
+                while not stop.is_set():
+                    with self._lock:
+                        entry = next(jobs, None)
+                    if entry is None:
+                        break
+                    index, job = entry
+                    start = time.perf_counter()
+                    try:
+                        task, state = self.read(job)
+                    except Exception as e:
+                        results.put(JobResult(index, job, None, str(e) or type(e).__name__))
+                        continue
+                    finally:
+                        self._account('read', start)
+                    if not self._put(read_queue, (index, job, task, state), stop):
+                        self._release(state)
+            except BaseException as e:
+                self._fail(e, stop)
+            finally:
+                with self._lock:
+                    readers_left[0] -= 1
+                    last = not readers_left[0]
+                if last:
+                    self._put(read_queue, _DONE, stop)
+
+        # Fork the pool workers before any stage thread runs: a fork while
+        # a thread holds a lock, e.g. the resource tracker's while it
+        # registers shared memory, leaves that lock held in the child
+        share_tracker()
+        pool = process_pool(self.workers['process'], self.initializer, self.initargs)
+        try:
+            pool.submit(int).result()
+        except BaseException:
+            pool.shutdown(wait=True)
+            raise
+
+        def dispatcher() -> None:
+            pending = set()
+
+            def done(future: Future, entry: tuple) -> None:
+                pending.discard(future)
+                write_queue.put((entry, future))
+
+            try:
+                while True:
+                    entry = self._get(read_queue, stop)
+                    if entry is _DONE or entry is None:
+                        break
+                    if not self._acquire(in_flight, stop):
+                        self._release(entry[3])
+                        break
+                    future = pool.submit(_timed, self.process, entry[2])
+                    pending.add(future)
+                    future.add_done_callback(lambda f, entry=entry: done(f, entry))
+            except BaseException as e:
+                self._fail(e, stop)
+            finally:
+                if stop.is_set():
+                    for future in list(pending):
+                        future.cancel()
+                pool.shutdown(wait=True)
+                for _ in range(self.workers['write']):
+                    write_queue.put(_DONE)
+
+        def writer() -> None:
+            while True:
+                item = write_queue.get()
+                if item is _DONE:
+                    break
+                (index, job, _, state), future = item
+                try:
+                    self._finish(index, job, state, future, results, stop)
+                except BaseException as e:
+                    self._fail(e, stop)
+                finally:
+                    self._release(state)
+                    in_flight.release()
+            with self._lock:
+                writers_left[0] -= 1
+                last = not writers_left[0]
+            if last:
+                results.put(_DONE)
+
+        threads = ([threading.Thread(target=reader, daemon=True)
+                    for _ in range(self.workers['read'])]
+                   + [threading.Thread(target=dispatcher, daemon=True)]
+                   + [threading.Thread(target=writer, daemon=True)
+                      for _ in range(self.workers['write'])])
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                result = results.get()
+                if result is _DONE:
+                    break
+                yield result
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            # States read after the dispatcher stopped taking them
+            while True:
+                try:
+                    entry = read_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not _DONE:
+                    self._release(entry[3])
+            self._wall = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+
+    def _finish(self, index: int, job: Any, state: Any, future: Future,
+                results: queue.Queue, stop: threading.Event) -> None:
+        """Write a processed job and report its result"""
+        if future.cancelled() or stop.is_set():
+            return
+        error = future.exception()
+        if error is not None:
+            with self._lock:
+                self._count['process'] += 1
+            results.put(JobResult(index, job, None, str(error) or type(error).__name__))
+            return
+        processed, seconds = future.result()
+        with self._lock:
+            self._busy['process'] += seconds
+            self._count['process'] += 1
+        start = time.perf_counter()
+        try:
+            result = self.write(job, state, processed)
+        except Exception as e:
+            results.put(JobResult(index, job, None, str(e) or type(e).__name__))
+        else:
+            results.put(JobResult(index, job, result, None))
+        finally:
+            self._account('write', start)
+
+    def _account(self, stage: str, start: float) -> None:
+        with self._lock:
+            self._busy[stage] += time.perf_counter() - start
+            self._count[stage] += 1
+
+    def _release(self, state: Any) -> None:
+        if self.release is not None:
+            self.release(state)
+
+    def _fail(self, error: BaseException, stop: threading.Event) -> None:
+        """Stop the run because a stage broke, e.g. the pool died"""
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        stop.set()
+
+    @staticmethod
+    def _put(q: queue.Queue, entry: Any, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(entry, timeout=_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: threading.Event) -> Optional[Any]:
+        while not stop.is_set():
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                pass
+        return None
+
+    @staticmethod
+    def _acquire(semaphore: threading.Semaphore, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            if semaphore.acquire(timeout=_POLL):
+                return True
+        return False
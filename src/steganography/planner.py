@@ -0,0 +1,183 @@
+"""Assignment of payload files to carrier images for bulk hides
+
+Carrier capacities come from image headers and payload sizes from the
+file system, so a plan is computed without decoding an image, reading a
+payload or deriving a key. A carrier given one payload hides it as
+hide_data does; a carrier given several hides them as an archive named
+by their file names. Sizes are taken before compression, so a planned
+job never fails for lack of capacity. Plans run with
+SteganoExfil.execute_plan, or as a resumable `stego-cli batch` from a
+manifest.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Tuple, Union
+from .archive import INDEX_PREFIX, entry_size, packed_size
+from .encryption import encrypted_size
+from .exceptions import FormatError, ValidationError
+from .utils import CONTAINER_HEADER_SIZE, capacity, framed_size, image_dimensions
+
+MANIFEST_VERSION = 1
+# 'fewest' fills as few carriers as possible (first fit decreasing);
+# 'balanced' spreads payloads so the fullest carrier is as empty as
+# possible (worst fit decreasing)
+STRATEGIES = ('fewest', 'balanced')
+
+class PlannedJob(NamedTuple):
+    """One carrier and the payload files it receives"""
+    carrier: str
+    output: str
+    files: List[str]
+    embedded_bytes: int  # Bytes embedded before compression, an upper bound
+    capacity_bytes: int  # Raw bytes the carrier holds
+
+class Plan(NamedTuple):
+    """Carrier assignments computed by plan_jobs"""
+    method: str
+    strategy: str
+    jobs: List[PlannedJob]
+    unplaced: List[str]    # Payloads no carrier can hold
+    unreadable: List[str]  # Carriers whose dimensions could not be read
+
+def embedded_size(files: List[Tuple[str, int]]) -> int:
+    """Bytes embedded for (name, size) payloads sharing one carrier, before compression"""
+    if len(files) == 1:
+        return framed_size(files[0][1])
+    return CONTAINER_HEADER_SIZE + encrypted_size(packed_size(files))
+
+class _Bin:
+    """Running totals of one carrier, so a fit check costs O(1)"""
+
+    def __init__(self, carrier: str, capacity_bytes: int):
+        self.carrier = carrier
+        self.capacity_bytes = capacity_bytes
+        self.files = []
+        self.names = set()
+        self.entries = INDEX_PREFIX.size
+
+    def cost_with(self, name: str, size: int) -> int:
+        """Embedded bytes after adding a payload, or None if it cannot join"""
+        if name in self.names:
+            return None
+        if not self.files:
+            cost = framed_size(size)
+        else:
+            cost = CONTAINER_HEADER_SIZE + encrypted_size(self.entries + entry_size(name, size))
+        return cost if cost <= self.capacity_bytes else None
+
+    def add(self, path: str, name: str, size: int) -> None:
+        self.files.append((path, name, size))
+        self.names.add(name)
+        self.entries += entry_size(name, size)
+
+    def cost(self) -> int:
+        return embedded_size([(name, size) for _, name, size in self.files])
+
+def plan_jobs(payloads: Iterable[Union[str, Path]], carriers: Iterable[Union[str, Path]],
+              output_dir: Union[str, Path], method: str = 'dct',
+              strategy: str = 'fewest') -> Plan:
+    """Assign payload files to carriers
+
+    Largest payloads are placed first. With 'fewest' each goes to the
+    first carrier, largest first, that still holds it; afterwards every
+    used carrier is swapped for the smallest free carrier that holds its
+    payloads, so the run decodes as few pixels as possible. With
+    'balanced' each payload goes to the carrier left least loaded
+    relative to its capacity. Outputs are PNGs in ``output_dir`` named
+    after their carriers.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unsupported strategy: {strategy}")
+    capacity((8, 8), method)  # Validates the method
+
+    bins, unreadable = [], []
+    for carrier in carriers:
+        try:
+            dims = image_dimensions(carrier)
+        except (FormatError, OSError):
+            unreadable.append(str(carrier))
+            continue
+        bins.append(_Bin(str(carrier), capacity(dims, method).raw_bytes))
+    items = sorted(((str(p), Path(p).name, os.path.getsize(p)) for p in payloads),
+                   key=lambda item: item[2], reverse=True)
+    if strategy == 'fewest':
+        bins.sort(key=lambda b: b.capacity_bytes, reverse=True)
+
+    unplaced = []
+    for path, name, size in items:
+        if strategy == 'fewest':
+            target = next((b for b in bins if b.cost_with(name, size) is not None), None)
+        else:
+            costs = ((b.cost_with(name, size), i) for i, b in enumerate(bins))
+            loads = [(cost / bins[i].capacity_bytes, i) for cost, i in costs if cost is not None]
+            target = bins[min(loads)[1]] if loads else None
+        if target is None:
+            unplaced.append(path)
+        else:
+            target.add(path, name, size)
+
+    used = [b for b in bins if b.files]
+    if strategy == 'fewest':
+        used = _shrink(used, [b for b in bins if not b.files])
+    return Plan(method, strategy, _jobs(used, Path(output_dir)), unplaced, unreadable)
+
+def _shrink(used: List[_Bin], free: List[_Bin]) -> List[_Bin]:
+    """Move each used carrier's payloads to the smallest free carrier holding them"""
+    free.sort(key=lambda b: b.capacity_bytes)
+    for b in sorted(used, key=lambda b: b.cost()):
+        cost = b.cost()
+        for candidate in free:
+            if candidate.capacity_bytes >= cost:
+                if candidate.capacity_bytes < b.capacity_bytes:
+                    # Swap carriers; the larger one becomes free again
+                    b.carrier, candidate.carrier = candidate.carrier, b.carrier
+                    b.capacity_bytes, candidate.capacity_bytes = (candidate.capacity_bytes,
+                                                                  b.capacity_bytes)
+                    free.sort(key=lambda f: f.capacity_bytes)
+                break
+    return used
+
+def _jobs(bins: List[_Bin], output_dir: Path) -> List[PlannedJob]:
+    """Build jobs in carrier order with distinct output names"""
+    jobs, taken = [], set()
+    for b in sorted(bins, key=lambda b: b.carrier):
+        stem = Path(b.carrier).stem
+        output, n = output_dir / f"{stem}.png", 1
+        while output in taken:
+            output, n = output_dir / f"{stem}_{n}.png", n + 1
+        taken.add(output)
+        jobs.append(PlannedJob(b.carrier, str(output), [path for path, _, _ in b.files],
+                               b.cost(), b.capacity_bytes))
+    return jobs
+
+def write_manifest(plan: Plan, path: Union[str, Path]) -> None:
+    """Write a plan as a JSON manifest"""
+    Path(path).write_text(json.dumps(manifest(plan), indent=2))
+
+def manifest(plan: Plan) -> dict:
+    """JSON-serializable form of a plan"""
+    return {
+        "version": MANIFEST_VERSION,
+        "method": plan.method,
+        "strategy": plan.strategy,
+        "jobs": [job._asdict() for job in plan.jobs],
+        "unplaced": plan.unplaced,
+        "unreadable": plan.unreadable,
+    }
+
+def read_manifest(path: Union[str, Path]) -> Plan:
+    """Read a plan written by write_manifest
+
+    Raises:
+        ValidationError: If the file is not a manifest of a known version
+    """
+    try:
+        data = json.loads(Path(path).read_text())
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValidationError(f"Unsupported manifest version: {data.get('version')}")
+        return Plan(data["method"], data["strategy"],
+                    [PlannedJob(**job) for job in data["jobs"]],
+                    data["unplaced"], data["unreadable"])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValidationError(f"Invalid manifest: {str(e)}")
@@ -0,0 +1,97 @@
+import struct
+import zlib
+from typing import Iterable, List, NamedTuple, Sequence, Tuple
+from .exceptions import CapacityError, ExtractionError, IntegrityError
+from .utils import ERROR_DETECTION_SIZE, capacity
+
+# Each shard is encrypted as its own envelope whose plaintext starts with
+#   set id (16) | shard index (4) | shard count (4) | total length (8) | CRC32 (4)
+# followed by its slice of the payload, compressed on its own. The CRC32
+# covers the slice before compression, and the 8-byte total allows sets
+# of 4 GiB and more. The prefix is covered by the envelope's
+# authentication, so shards cannot be reordered, dropped or mixed
+# between sets without detection.
+SHARD_HEADER = struct.Struct('>16sIIQI')
+SET_ID_SIZE = 16
+
+class ShardHeader(NamedTuple):
+    """Sequencing fields carried by every shard"""
+    set_id: bytes
+    index: int
+    count: int
+    total: int     # Payload length of the whole set
+    checksum: int  # CRC32 of this shard's slice
+
+def shard_capacity(shape: Tuple[int, ...], method: str = 'dct') -> int:
+    """Largest payload slice a carrier of ``shape`` holds as one shard
+
+    A shard replaces the error detection frame of a plain hide with the
+    shard header, so this follows from the carrier's payload_bytes.
+    Compression never makes a slice larger, so a slice of this size fits
+    whatever its codec.
+    """
+    payload_bytes = capacity(shape, method).payload_bytes
+    return max(0, payload_bytes + ERROR_DETECTION_SIZE - SHARD_HEADER.size)
+
+def split_sizes(total: int, capacities: Sequence[int]) -> List[int]:
+    """Split ``total`` bytes across carriers in proportion to their capacity
+
+    Spreading the payload keeps every carrier at the same embedding rate,
+    so all shards take about as long to embed per pixel.
+
+    Raises:
+        CapacityError: If the carriers cannot hold ``total`` bytes together
+    """
+    available = sum(capacities)
+    if total > available:
+        raise CapacityError(f"Data too large for carriers: {total} bytes, "
+                            f"{available} bytes available")
+    if not available:
+        return [0] * len(capacities)
+    sizes = [total * c // available for c in capacities]
+    # Hand out the rounding remainder to carriers with room to spare
+    rest = total - sum(sizes)
+    for i, c in enumerate(capacities):
+        extra = min(rest, c - sizes[i])
+        sizes[i] += extra
+        rest -= extra
+    return sizes
+
+def pack_shard(header: ShardHeader, data: bytes) -> bytes:
+    """Prefix a payload slice with its shard header"""
+    return SHARD_HEADER.pack(*header) + data
+
+def unpack_shard(plaintext: bytes) -> Tuple[ShardHeader, bytes]:
+    """Split decrypted shard plaintext into its header and payload slice"""
+    if len(plaintext) < SHARD_HEADER.size:
+        raise ExtractionError("Corrupt shard header")
+    return ShardHeader(*SHARD_HEADER.unpack_from(plaintext)), plaintext[SHARD_HEADER.size:]
+
+def join_shards(shards: Iterable[Tuple[ShardHeader, bytes]]) -> bytes:
+    """Reassemble a payload from decompressed shards given in any order
+
+    Raises:
+        ExtractionError: If shards come from different sets, or any shard
+        is missing or duplicated
+        IntegrityError: If a slice does not match its checksum
+    """
+    shards = sorted(shards, key=lambda s: s[0].index)
+    if not shards:
+        raise ExtractionError("No shards given")
+    first = shards[0][0]
+    if any(h.set_id != first.set_id or h.count != first.count or h.total != first.total
+           for h, _ in shards):
+        raise ExtractionError("Images belong to different shard sets")
+    indices = [h.index for h, _ in shards]
+    if indices != list(range(first.count)):
+        missing = sorted(set(range(first.count)) - set(indices))
+        if missing:
+            raise ExtractionError(f"Missing shards {missing} of {first.count}")
+        raise ExtractionError("Duplicate shards in image set")
+    for header, data in shards:
+        if zlib.crc32(data) != header.checksum:
+            raise IntegrityError(f"Shard {header.index} failed its checksum")
+    payload = b''.join(data for _, data in shards)
+    if len(payload) != first.total:
+        raise ExtractionError("Shard set is inconsistent")
+    return payload
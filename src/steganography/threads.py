@@ -0,0 +1,97 @@
+"""One thread budget for native libraries and worker pools
+
+OpenCV and the BLAS behind NumPy's matrix products, which carry the
+per-block DCT, each size their own thread pool to the machine, and
+every worker process of a pool gets a full set. A batch with one worker per core then runs many
+times more threads than there are cores, which makes it slower than a
+serial run. The budget is set in one place instead: configure_threads
+gives all of it to this process's libraries, pools default to one
+worker per thread of it, and process_pool splits it across its workers,
+so batch workers run one native thread each by default. Inside a pool
+worker, pools are never nested: pool_workers is 1 and batches run in
+the worker itself.
+
+The budget comes from, in order: an explicit value such as a --threads
+flag, the STEGO_THREADS environment variable, a setting such as the web
+app's ``threads``, and the CPU count.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+import cv2
+from threadpoolctl import threadpool_limits
+from .exceptions import ConfigError
+
+THREADS_ENV = 'STEGO_THREADS'
+
+_budget = None
+_in_pool = False  # Set in workers started by process_pool
+
+def resolve_threads(threads: int = None, setting: Optional[int] = None) -> int:
+    """Thread budget from ``threads``, else STEGO_THREADS, else ``setting``, else the CPU count
+
+    Raises:
+        ConfigError: If the chosen value is not a positive integer
+    """
+    for source, value in (('threads', threads), (THREADS_ENV, os.environ.get(THREADS_ENV)),
+                          ('threads setting', setting)):
+        if value in (None, ''):
+            continue
+        try:
+            count = int(value)
+        except (TypeError, ValueError):
+            count = 0
+        if count < 1:
+            raise ConfigError(f"{source} must be a positive integer, not {value!r}")
+        return count
+    return os.cpu_count() or 1
+
+def configure_threads(threads: int = None) -> int:
+    """Set this process's thread budget and size its native thread pools to it
+
+    ``threads`` defaults to resolve_threads(). Returns the budget.
+    """
+    global _budget
+    _budget = threads or resolve_threads()
+    set_native_threads(_budget)
+    return _budget
+
+def thread_budget() -> int:
+    """Budget set by configure_threads, else resolve_threads()"""
+    return _budget or resolve_threads()
+
+def pool_workers(workers: int = None) -> int:
+    """Worker processes for a pool: ``workers``, else one per thread of the budget
+
+    Always 1 in a process_pool worker, whose share of the budget is
+    already spoken for; callers then run their jobs in the worker.
+    """
+    if _in_pool:
+        return 1
+    return max(1, workers or thread_budget())
+
+def worker_threads(workers: int) -> int:
+    """Native threads per pool worker: the budget split across ``workers``, at least one"""
+    return max(1, thread_budget() // max(1, workers))
+
+def set_native_threads(count: int) -> None:
+    """Size the OpenCV, BLAS and OpenMP thread pools of this process"""
+    cv2.setNumThreads(count)
+    threadpool_limits(count)
+
+def process_pool(workers: int, initializer: Callable = None,
+                 initargs: tuple = ()) -> ProcessPoolExecutor:
+    """Process pool whose workers share the thread budget
+
+    Each worker sizes its native thread pools to worker_threads(workers)
+    before running ``initializer``.
+    """
+    return ProcessPoolExecutor(workers, initializer=_init_worker,
+                               initargs=(worker_threads(workers), initializer, initargs))
+
+def _init_worker(threads: int, initializer: Optional[Callable], initargs: tuple) -> None:
+    global _in_pool
+    _in_pool = True
+    set_native_threads(threads)
+    if initializer is not None:
+        initializer(*initargs)
@@ -1,10 +1,125 @@
+import io
+import struct
 import zlib
-from typing import Tuple, Union, Optional
+from functools import lru_cache
+from typing import BinaryIO, NamedTuple, Tuple, Union, Optional
 import numpy as np
 import cv2
 import os
 from pathlib import Path
-from .exceptions import CapacityError, FormatError
+from .encryption import encrypted_size
+from .exceptions import CapacityError, ExtractionError, FormatError
+
+# Block DCT layout: coefficients with DCT_BAND[0] <= u + v <= DCT_BAND[1]
+# in every 8x8 luma block carry one bit each
+DCT_BLOCK_SIZE = 8
+DCT_BAND = (4, 5)
+
+def dct_band_mask() -> np.ndarray:
+    """Boolean 8x8 mask of the mid-band coefficients used for embedding"""
+    u, v = np.indices((DCT_BLOCK_SIZE, DCT_BLOCK_SIZE))
+    return (DCT_BAND[0] <= u + v) & (u + v <= DCT_BAND[1])
+
+# Container header embedded ahead of the encrypted envelope:
+#   magic (4) | format version (1) | method (1) | flags (1) | envelope length (4)
+# The low four bits of flags hold the compression codec and FLAG_ARCHIVE
+# marks a multi-file archive (see archive.py); the rest are reserved.
+# Images written before the container carry a bare 4-byte length prefix
+# instead.
+CONTAINER_MAGIC = b'\x89SXF'
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct('>4sBBBI')
+CONTAINER_HEADER_SIZE = CONTAINER_HEADER.size
+METHOD_IDS = {'lsb': 1, 'dct': 2}
+CODEC_FLAGS_MASK = 0x0F
+FLAG_ARCHIVE = 0x10
+FLAG_SHARD = 0x20
+
+# Legacy length prefix and add_error_detection's length and CRC32
+LENGTH_PREFIX_SIZE = 4
+ERROR_DETECTION_SIZE = 8
+
+class ContainerHeader(NamedTuple):
+    """Fields of the container header"""
+    version: int
+    method: str
+    codec: int
+    length: int  # Bytes of encrypted envelope that follow the header
+    archive: bool = False
+    shard: bool = False  # One shard of a payload split across carriers
+
+def pack_header(method: str, codec: int, length: int, archive: bool = False,
+                shard: bool = False) -> bytes:
+    """Build the container header for an envelope of ``length`` bytes"""
+    flags = ((codec & CODEC_FLAGS_MASK) | (FLAG_ARCHIVE if archive else 0)
+             | (FLAG_SHARD if shard else 0))
+    return CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION,
+                                 METHOD_IDS[method], flags, length)
+
+def unpack_header(data: bytes) -> ContainerHeader:
+    """Parse and validate a container header
+
+    Raises:
+        ExtractionError: If the magic, version, method or flags are not
+        recognized, i.e. the data was not written by this tool
+    """
+    if len(data) < CONTAINER_HEADER_SIZE:
+        raise ExtractionError("No hidden data found or data corrupted")
+    magic, version, method_id, flags, length = CONTAINER_HEADER.unpack_from(data)
+    methods = {v: k for k, v in METHOD_IDS.items()}
+    if magic != CONTAINER_MAGIC or method_id not in methods or flags & ~(CODEC_FLAGS_MASK | FLAG_ARCHIVE | FLAG_SHARD):
+        raise ExtractionError("No hidden data found or data corrupted")
+    if version != CONTAINER_VERSION:
+        raise ExtractionError(f"Unsupported container version: {version}")
+    return ContainerHeader(version, methods[method_id], flags & CODEC_FLAGS_MASK, length,
+                           bool(flags & FLAG_ARCHIVE), bool(flags & FLAG_SHARD))
+
+class CapacityInfo(NamedTuple):
+    """Embedding capacity of a carrier shape for one method"""
+    bits: int           # Carrier bits available to the method
+    raw_bytes: int      # Whole bytes of embedded stream
+    payload_bytes: int  # Largest incompressible data length hide_data accepts; -1: none
+
+def framed_size(length: int) -> int:
+    """Number of embedded bytes hide_data produces for ``length`` data bytes"""
+    return CONTAINER_HEADER_SIZE + encrypted_size(ERROR_DETECTION_SIZE + length)
+
+@lru_cache(maxsize=256)
+def _capacity(height: int, width: int, method: str) -> CapacityInfo:
+    if method == 'dct':
+        blocks = (height // DCT_BLOCK_SIZE) * (width // DCT_BLOCK_SIZE)
+        bits = blocks * int(dct_band_mask().sum())
+    elif method == 'lsb':
+        bits = height * width * 3  # 1 bit per BGR channel
+    else:
+        raise ValueError(f"Unsupported method: {method}")
+
+    raw_bytes = bits // 8
+    # framed_size is monotonic, so bisect for the largest payload that fits
+    low, high = -1, raw_bytes
+    while low < high:
+        mid = (low + high + 1) // 2
+        if framed_size(mid) <= raw_bytes:
+            low = mid
+        else:
+            high = mid - 1
+    return CapacityInfo(bits, raw_bytes, low)
+
+def capacity(shape: Tuple[int, ...], method: str = 'dct') -> CapacityInfo:
+    """
+    Calculate embedding capacity from carrier dimensions alone
+    
+    Args:
+        shape: Carrier shape as (height, width) or (height, width, channels);
+            carriers are always embedded as 3-channel BGR
+        method: Steganography method ('dct' or 'lsb')
+        
+    Returns:
+        CapacityInfo: Raw bits and bytes, and the exact number of data
+        bytes that fit after framing and encryption overhead; -1 when
+        the carrier cannot hold the overhead itself
+    """
+    return _capacity(int(shape[0]), int(shape[1]), method)
 
 def calculate_capacity(image: np.ndarray, method: str = 'dct') -> int:
     """
@@ -15,16 +130,68 @@ def calculate_capacity(image: np.ndarray, method: str = 'dct') -> int:
         method: Steganography method ('dct' or 'lsb')
         
     Returns:
-        int: Maximum bytes that can be hidden
+        int: Maximum bytes that can be embedded, before framing overhead
     """
-    if method == 'dct':
-        y = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)[:,:,0]
-        blocks = (y.shape[0] * y.shape[1]) // 64  # 8x8 blocks
-        return int(blocks * 0.1)  # ~10% of coefficients usable
-    elif method == 'lsb':
-        return (image.size * 3) // 8  # 3 channels, 1 bit per channel
-    else:
-        raise ValueError(f"Unsupported method: {method}")
+    return capacity(image.shape, method).raw_bytes
+
+def image_dimensions(source: Union[str, Path, bytes, memoryview, BinaryIO]) -> Tuple[int, int]:
+    """
+    Read image dimensions from the PNG, JPEG or BMP header without decoding
+    
+    Args:
+        source: Image path, encoded bytes or binary file object
+        
+    Returns:
+        Tuple[int, int]: (height, width)
+    
+    Raises:
+        FormatError: If the header is missing or unsupported
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            return image_dimensions(f)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return image_dimensions(io.BytesIO(source))
+
+    head = source.read(26)
+    if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', head[16:24])
+        return height, width
+    if head[:2] == b'BM' and len(head) >= 26:
+        if struct.unpack('<I', head[14:18])[0] == 12:
+            width, height = struct.unpack('<HH', head[18:22])
+        else:
+            width, height = struct.unpack('<ii', head[18:26])
+        return abs(height), width
+    if head[:2] == b'\xff\xd8':
+        return _jpeg_dimensions(source, head[2:])
+    raise FormatError("Unrecognized image header")
+
+def _jpeg_dimensions(source: BinaryIO, pending: bytes) -> Tuple[int, int]:
+    """Walk JPEG marker segments up to the first start-of-frame"""
+    def read(n: int) -> bytes:
+        nonlocal pending
+        data, pending = pending[:n], pending[n:]
+        if len(data) < n:
+            data += source.read(n - len(data))
+        if len(data) < n:
+            raise FormatError("Truncated JPEG header")
+        return data
+
+    while True:
+        marker = read(2)
+        while marker[1] == 0xFF:  # fill bytes
+            marker = marker[1:] + read(1)
+        if marker[0] != 0xFF:
+            raise FormatError("Invalid JPEG marker")
+        code = marker[1]
+        if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+            continue  # standalone markers
+        length = struct.unpack('>H', read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>xHH', read(5))
+            return height, width
+        read(length - 2)
 
 def validate_image(image_path: Union[str, Path], 
                   min_size: Tuple[int, int] = (32, 32),
@@ -63,7 +230,14 @@ def validate_image(image_path: Union[str, Path],
     return img
 
 def add_error_detection(data: bytes) -> bytes:
-    """Add CRC32 checksum and length prefix"""
+    """
+    Add CRC32 checksum and length prefix
+
+    Raises:
+        CapacityError: If data is 4 GiB or more, past the 4-byte length
+    """
+    if len(data) > 0xFFFFFFFF:
+        raise CapacityError(f"Data too large to frame: {len(data)} bytes")
     length = len(data).to_bytes(4, byteorder='big')
     checksum = zlib.crc32(data).to_bytes(4, byteorder='big')
     return length + checksum + data
@@ -100,4 +274,12 @@ def cleanup_temp_files(temp_dir: Union[str, Path],
         try:
             f.unlink()
         except OSError:
-            pass 
\ No newline at end of file
+            pass
+
+def encode_data_length(length: int) -> bytes:
+    """Encode payload length as 4-byte big-endian prefix"""
+    return length.to_bytes(4, byteorder='big')
+
+def decode_data_length(data: bytes) -> int:
+    """Decode 4-byte big-endian length prefix"""
+    return int.from_bytes(data[:4], byteorder='big')
@@ -1,15 +1,35 @@
 import streamlit as st
-from steganography import SteganoExfil
+from steganography import SteganoExfil, KeyCache
+from steganography.threads import configure_threads, resolve_threads
+from steganography.utils import image_dimensions
 import os
 import io
 import json
 from pathlib import Path
 import mimetypes
 
+SETTINGS_FILE = "stego_settings.json"
+
+@st.cache_resource
+def shared_engine() -> SteganoExfil:
+    """Engine shared by all sessions and reruns
+
+    The engine keeps no per-call state, so concurrent sessions can use it
+    from their own threads; its key cache lets re-extracting skip the KDF.
+    Native thread pools are sized once here, from STEGO_THREADS or the
+    saved ``threads`` setting.
+    """
+    threads = None
+    if os.path.exists(SETTINGS_FILE):
+        with open(SETTINGS_FILE, 'r') as f:
+            threads = json.load(f).get("threads")
+    configure_threads(resolve_threads(setting=threads))
+    return SteganoExfil(key_cache=KeyCache())
+
 class SteganoApp:
     def __init__(self):
-        self.stego = SteganoExfil()
-        self.settings_file = "stego_settings.json"
+        self.stego = shared_engine()
+        self.settings_file = SETTINGS_FILE
         self.max_file_size_mb = 10
         self.setup_page()
         
@@ -43,7 +63,9 @@ class SteganoApp:
                 "theme": "Light",
                 "max_file_size_mb": 10,
                 "default_method": "dct",
-                "default_quality": 0.8
+                "default_quality": 0.8,
+                "compression_level": 6,
+                "threads": None
             }
             
     def save_settings(self):
@@ -67,21 +89,9 @@ class SteganoApp:
         if not carrier_file:
             return 0
             
-        # Save carrier temporarily
-        temp_carrier = f"temp_carrier{Path(carrier_file.name).suffix}"
-        with open(temp_carrier, "wb") as f:
-            f.write(carrier_file.read())
-            
-        try:
-            carrier = self.stego._prepare_carrier_image(temp_carrier)
-            if method == 'dct':
-                capacity = self.stego._calculate_dct_capacity(carrier)
-                return capacity // 8  # Convert bits to bytes
-            else:
-                # LSB capacity (3 channels * pixels)
-                return carrier.size * 3 // 8
-        finally:
-            os.remove(temp_carrier)
+        # Dimensions come from the image header; nothing is decoded
+        shape = image_dimensions(carrier_file.getvalue())
+        return self.stego.capacity(shape, method).payload_bytes
 
     def preview_text_file(self, file):
         """Preview text file contents"""
@@ -127,39 +137,45 @@ class SteganoApp:
         status_text.text("Processing complete!")
         progress_bar.progress(1.0)
 
+    def process_archive(self, carrier_file, secret_files, method, password, quality):
+        """Pack all secret files into one archive in a single carrier"""
+        # Members are named after the uploaded files
+        stego_bytes = self.stego.hide_archive_buffer(
+            files=[(f.name, f.getvalue()) for f in secret_files],
+            carrier=carrier_file.getvalue(),
+            password=password,
+            method=method,
+            quality=quality,
+            compression_level=self.settings.get("compression_level", 6)
+        )
+
+        output_name = f"stego_{Path(carrier_file.name).stem}.png"
+        st.download_button(
+            label=f"Download {output_name}",
+            data=stego_bytes,
+            file_name=output_name,
+            mime="image/png"
+        )
+
     def process_single_file(self, carrier_file, secret_data, output_name, method, password, quality):
         """Process a single file for hiding"""
-        # Save carrier temporarily
-        temp_carrier = f"temp_carrier{Path(carrier_file.name).suffix}"
-        with open(temp_carrier, "wb") as f:
-            carrier_file.seek(0)
-            f.write(carrier_file.read())
+        # Hide data entirely in memory
+        stego_bytes = self.stego.hide_buffer(
+            data=secret_data,
+            carrier=carrier_file.getvalue(),
+            password=password,
+            method=method,
+            quality=quality,
+            compression_level=self.settings.get("compression_level", 6)
+        )
         
-        try:
-            # Hide data
-            self.stego.hide_data(
-                data=secret_data,
-                carrier_image_path=temp_carrier,
-                output_path=output_name,
-                password=password,
-                method=method,
-                quality=quality
-            )
-            
-            # Provide download button
-            with open(output_name, "rb") as f:
-                st.download_button(
-                    label=f"Download {output_name}",
-                    data=f.read(),
-                    file_name=output_name,
-                    mime="image/png"
-                )
-                
-        finally:
-            # Cleanup
-            os.remove(temp_carrier)
-            if os.path.exists(output_name):
-                os.remove(output_name)
+        # Provide download button
+        st.download_button(
+            label=f"Download {output_name}",
+            data=stego_bytes,
+            file_name=output_name,
+            mime="image/png"
+        )
 
     def render_hide_tab(self):
         """Render the hide data tab"""
@@ -206,8 +222,10 @@ class SteganoApp:
                 **Carrier Details:**
                 - Size: {round(carrier_file.size/1024, 2)} KB
                 - Format: {carrier_file.type}
-                - Estimated Capacity: {round(capacity/1024, 2)} KB
+                - Estimated Capacity: {round(max(capacity, 0)/1024, 2)} KB
                 """)
+                if capacity < 0:
+                    st.warning("Carrier is too small to hold any hidden data")
 
         # Show file previews
         if secret_files:
@@ -235,12 +253,25 @@ class SteganoApp:
                 help="Higher quality = less capacity"
             )
 
+            pack_archive = st.checkbox(
+                "Pack all files into one image",
+                value=True,
+                help="Hide several files as one archive in a single carrier"
+            )
+
         # Process button
         if st.button(
             "Hide Data",
             type="primary",
             disabled=not (carrier_file and secret_files and password)
         ):
+            if pack_archive and len(secret_files) > 1:
+                try:
+                    with st.spinner("Packing files..."):
+                        self.process_archive(carrier_file, secret_files, method, password, quality)
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+                return
             self.process_multiple_files(
                 carrier_file,
                 secret_files,
@@ -279,21 +310,29 @@ class SteganoApp:
             if st.button("Extract Data", type="primary"):
                 try:
                     with st.spinner("Extracting data..."):
-                        # Save stego image temporarily
-                        temp_stego = f"temp_stego{Path(stego_file.name).suffix}"
-                        with open(temp_stego, "wb") as f:
-                            f.write(stego_file.read())
-                        
+                        # Archives offer one download per member
+                        if self.stego.is_archive(stego_file.getvalue(), method):
+                            files = self.stego.extract_archive(
+                                stego_file.getvalue(), password=password, method=method
+                            )
+                            st.success(f"Extracted {len(files)} files")
+                            for i, (name, data) in enumerate(files.items()):
+                                st.download_button(
+                                    f"Download {name}",
+                                    data=data,
+                                    file_name=Path(name).name,
+                                    mime=mimetypes.guess_type(name)[0] or "application/octet-stream",
+                                    key=f"archive_member_{i}"
+                                )
+                            return
+
                         # Extract data
-                        extracted_data = self.stego.extract_data(
-                            stego_image_path=temp_stego,
+                        extracted_data = self.stego.extract_buffer(
+                            stego=stego_file.getvalue(),
                             password=password,
                             method=method
                         )
                         
-                        # Cleanup
-                        os.remove(temp_stego)
-                        
                         # Try to determine file type
                         file_type = mimetypes.guess_type("extracted_data")[0]
                         if not file_type:
@@ -339,6 +378,14 @@ class SteganoApp:
             value=self.settings.get("default_quality", 0.8)
         )
         
+        self.settings["compression_level"] = st.slider(
+            "Compression level",
+            min_value=0,
+            max_value=9,
+            value=self.settings.get("compression_level", 6),
+            help="0 disables compression; incompressible data is never compressed"
+        )
+        
         # Save settings button
         if st.button("Save Settings"):
             self.save_settings()
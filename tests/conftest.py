@@ -0,0 +1,13 @@
+import pytest
+import numpy as np
+import cv2
+
+@pytest.fixture
+def carriers(tmp_path):
+    """Six random 64x96 PNG carriers in tmp_path"""
+    rng = np.random.default_rng(20)
+    paths = []
+    for i in range(6):
+        paths.append(str(tmp_path / f"carrier{i}.png"))
+        cv2.imwrite(paths[-1], rng.integers(0, 256, (64, 96, 3), dtype=np.uint8))
+    return paths
@@ -3,19 +3,19 @@ import cv2
 import os
 from pathlib import Path
 
+# Carrier sizes as (width, height)
+CARRIER_SIZES = [
+    (100, 100),    # Small
+    (800, 600),    # Medium
+    (1920, 1080),  # Full HD
+    (3840, 2160)   # 4K
+]
+
 def generate_test_images():
     """Generate test carrier images of different sizes and types"""
     data_dir = Path(__file__).parent
     
-    # Create test images of different sizes
-    sizes = [
-        (100, 100),    # Small
-        (800, 600),    # Medium
-        (1920, 1080),  # Full HD
-        (3840, 2160)   # 4K
-    ]
-    
-    for width, height in sizes:
+    for width, height in CARRIER_SIZES:
         # Create random color image
         img = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
         
@@ -1,6 +1,5 @@
 import pytest
 from streamlit.testing.v1 import AppTest
-from pathlib import Path
 import numpy as np
 import cv2
 
@@ -9,11 +8,10 @@ def app():
     return AppTest.from_file("src/interfaces/web/app.py")
 
 @pytest.fixture
-def test_image():
+def test_image(tmp_path):
     """Create a test image"""
     img = np.zeros((100, 100, 3), dtype=np.uint8)
-    img_path = Path("tests/data/test_carrier.png")
-    img_path.parent.mkdir(parents=True, exist_ok=True)
+    img_path = tmp_path / "test_carrier.png"
     cv2.imwrite(str(img_path), img)
     return img_path
 
@@ -0,0 +1,48 @@
+import pytest
+from steganography.archive import (
+    pack_archive, packed_size, parse_index, index_size, unpack_archive, unpack_member
+)
+from steganography.compression import CODEC_NONE
+from steganography.exceptions import IntegrityError, ValidationError
+
+class TestArchive:
+    def test_pack_unpack(self):
+        """Test that members round-trip with their names and order"""
+        files = {"a.txt": b"alpha " * 100, "b.bin": bytes(range(256)), "ü.txt": b""}
+        plaintext = pack_archive(files)
+
+        assert unpack_archive(plaintext) == files
+
+    def test_index_locates_members(self):
+        """Test that index offsets and lengths address the stored members"""
+        plaintext = pack_archive([("one", b"1" * 10), ("two", bytes(range(200)))], 0)
+        size = index_size(plaintext)
+        entries = parse_index(plaintext[:size])
+
+        assert [(e.name, e.codec, e.size) for e in entries] == [
+            ("one", CODEC_NONE, 10), ("two", CODEC_NONE, 200)]
+        two = entries[1]
+        assert plaintext[size + two.offset:size + two.offset + two.length] == bytes(range(200))
+
+    def test_corrupt_member(self):
+        """Test that a member with the wrong bytes fails its CRC"""
+        plaintext = pack_archive({"a": b"abc"}, 0)
+        entry = parse_index(plaintext[:index_size(plaintext)])[0]
+
+        with pytest.raises(IntegrityError):
+            unpack_member(entry, b"abd")
+
+    def test_invalid_archives(self):
+        """Test that empty archives and duplicate names are rejected"""
+        with pytest.raises(ValidationError):
+            pack_archive({})
+        with pytest.raises(ValidationError):
+            pack_archive([("a", b"1"), ("a", b"2")])
+
+    def test_packed_size_bounds_output(self):
+        """Test that packed_size is exact for stored members and bounds compressed ones"""
+        files = [("raw", bytes(range(256))), ("text", b"abc" * 500)]
+        sizes = [(name, len(data)) for name, data in files]
+
+        assert packed_size(sizes[:1]) == len(pack_archive(files[:1], 0))
+        assert packed_size(sizes) >= len(pack_archive(files))
@@ -0,0 +1,134 @@
+import os
+import time
+import pytest
+import numpy as np
+from steganography import SteganoExfil, HideJob, ExtractJob
+from steganography.batch import JobStore, run_budgeted
+
+def _sleep_job(job):
+    start = time.time()
+    time.sleep(0.2)
+    return start, time.time()
+
+class TestBatch:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_hide_and_extract_many(self, carriers, tmp_path, workers):
+        """Test that batches round-trip and failed jobs do not stop the others"""
+        stego = SteganoExfil()
+        payload_file = tmp_path / "payload.txt"
+        payload_file.write_bytes(b"from a file")
+        jobs = [HideJob(f"payload {i}".encode(), c, str(tmp_path / f"stego{i}.png"), 'lsb')
+                for i, c in enumerate(carriers[:4])]
+        jobs[1] = jobs[1]._replace(data=str(payload_file))
+        jobs.append(HideJob(b"lost", str(tmp_path / "missing.png"), str(tmp_path / "x.png")))
+
+        results = list(stego.hide_many(iter(jobs), "test123", workers=workers))
+
+        assert sorted(r.index for r in results) == list(range(5))
+        by_index = {r.index: r for r in results}
+        assert by_index[4].error is not None and by_index[4].result is None
+        assert all(by_index[i].result == jobs[i].output for i in range(4))
+
+        extract_jobs = [ExtractJob(job.output, method='lsb') for job in jobs[:4]]
+        extract_jobs[2] = extract_jobs[2]._replace(output=str(tmp_path / "out.bin"))
+        extracted = {r.index: r.result for r in stego.extract_many(extract_jobs, "test123",
+                                                                   workers=workers)}
+
+        assert extracted[0] == b"payload 0"
+        assert extracted[1] == b"from a file"
+        assert extracted[2] == str(tmp_path / "out.bin")
+        assert (tmp_path / "out.bin").read_bytes() == b"payload 2"
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_bad_jobs_do_not_abort(self, carriers, tmp_path, workers):
+        """Test that unexpected job errors are reported in serial runs as in the pool"""
+        jobs = [HideJob(b"payload", c, str(tmp_path / f"stego{i}.png"), 'lsb')
+                for i, c in enumerate(carriers[:3])]
+        jobs[1] = jobs[1]._replace(output=str(tmp_path / "o1.txt"))
+        jobs.insert(2, HideJob(None, carriers[3], str(tmp_path / "none.png"), 'lsb'))
+
+        results = sorted(SteganoExfil().hide_many(jobs, "test123", workers=workers))
+
+        assert [r.error is None for r in results] == [True, False, False, True]
+        assert "o1.txt" in results[1].error
+        assert results[3].result == jobs[3].output
+
+    def test_wrong_password_is_reported(self, carriers, tmp_path):
+        """Test that a failed extraction is reported as a job error"""
+        stego = SteganoExfil()
+        output = str(tmp_path / "stego.png")
+        stego.hide_data(b"secret", carriers[0], output, "right", method='lsb')
+
+        result, = stego.extract_many([ExtractJob(output, method='lsb')], "wrong", workers=2)
+
+        assert result.result is None and result.error
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_array_carriers(self, workers):
+        """Test that array carriers round-trip and shared blocks are freed"""
+        stego = SteganoExfil()
+        rng = np.random.default_rng(21)
+        arrays = [rng.integers(0, 256, (64, 96, 3), dtype=np.uint8) for _ in range(3)]
+        originals = [a.copy() for a in arrays]
+        jobs = [HideJob(f"frame {i}".encode(), a, method='lsb') for i, a in enumerate(arrays)]
+        jobs.append(HideJob(b"bad", np.zeros((8, 8), dtype=np.float32)))
+        shm = os.path.isdir('/dev/shm') and set(os.listdir('/dev/shm'))
+
+        results = sorted(stego.hide_many(jobs, "test123", workers=workers))
+
+        assert [r.job is jobs[r.index] for r in results] == [True] * 4
+        assert results[3].error and results[3].result is None
+        assert all(np.array_equal(a, o) for a, o in zip(arrays, originals))
+        extracted = sorted(stego.extract_many(
+            [ExtractJob(r.result, method='lsb') for r in results[:3]], "test123",
+            workers=workers))
+        assert [r.result for r in extracted] == [b"frame 0", b"frame 1", b"frame 2"]
+        if shm is not False:
+            assert set(os.listdir('/dev/shm')) == shm
+
+    def test_budget_admission(self):
+        """Test that jobs in flight fit the budget and small jobs overtake large ones"""
+        sizes = [60, 60, 30, 30, None, 150, 10]
+        results = sorted(run_budgeted(_sleep_job, list(enumerate(sizes)), 2, 100,
+                                      lambda job: job[1]))
+
+        assert [r.error for r in results] == [None] * len(sizes)
+        assert [r.estimate for r in results] == sizes
+        assert all(r.peak is not None for r in results)
+        spans = [r.result for r in results]
+        costs = [100 if size is None else min(size, 100) for size in sizes]
+        for i, (start, _) in enumerate(spans):
+            running = [j for j, (s, e) in enumerate(spans) if s <= start < e]
+            assert sum(costs[j] for j in running) <= 100
+        assert spans[2][0] < spans[1][0]  # Small job started while the second 60 waited
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_memory_budget_reports_peaks(self, carriers, tmp_path, workers):
+        """Test that budgeted batches report estimated and measured peaks"""
+        stego = SteganoExfil()
+        jobs = [HideJob(b"budgeted", c, str(tmp_path / f"stego{i}.png"), 'lsb')
+                for i, c in enumerate(carriers)]
+
+        results = list(stego.hide_many(jobs, "test123", workers=workers,
+                                       memory_budget=64 << 20))
+
+        assert [r.error for r in results] == [None] * len(jobs)
+        assert {r.estimate for r in results} == {stego.peak_memory((64, 96), 'lsb', 8)}
+        assert all(r.peak is not None for r in results)
+
+    def test_job_store_resumes_incomplete(self, tmp_path):
+        """Test that reopening the store yields only jobs that are not done"""
+        db = tmp_path / "jobs.sqlite"
+        jobs = [HideJob("data.txt", f"c{i}.png", f"out/s{i}.png") for i in range(3)]
+        with JobStore(db) as store:
+            assert store.add_hide_jobs(jobs) == 3
+            ids = [job_id for job_id, _ in store.incomplete('hide')]
+            store.record(ids[0])
+            store.record(ids[1], "failed")
+
+        with JobStore(db) as store:
+            assert store.add_hide_jobs(jobs) == 0
+            assert [job for _, job in store.incomplete('hide')] == [jobs[2]]
+            assert [job for _, job in store.incomplete('hide', retry_failed=True)] == jobs[1:]
+            assert store.incomplete('extract') == []
+            assert store.counts('hide') == {'pending': 1, 'done': 1, 'failed': 1}
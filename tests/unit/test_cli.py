@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+from cryptography.fernet import Fernet
+from steganography import encryption
+from steganography.utils import add_error_detection
+from interfaces.cli import CLI
+
+@pytest.fixture
+def cli():
+    cli = CLI()
+    cli.manage_threads = False
+    return cli
+
+class TestExtract:
+    def test_legacy_image(self, cli, tmp_path):
+        """Images written before the container header extract as single payloads"""
+        salt, key = encryption.generate_key("test123")
+        detected = add_error_detection(b"Old secret")
+        token = salt + Fernet(key).encrypt(len(detected).to_bytes(4, 'big') + detected)
+        carrier = np.random.default_rng(21).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        image = cli.stego._hide_lsb(len(token).to_bytes(4, 'big') + token, carrier)
+        stego_path = tmp_path / "legacy.png"
+        stego_path.write_bytes(cli.stego._encode_image(image, '.png'))
+        output = tmp_path / "out.txt"
+
+        code = cli.run(["extract", "-i", str(stego_path), "-o", str(output),
+                        "-p", "test123", "-m", "lsb"])
+
+        assert code == 0
+        assert output.read_bytes() == b"Old secret"
+
+    def test_archive_image(self, cli, tmp_path):
+        """Images holding an archive extract member by member"""
+        carrier = np.random.default_rng(22).integers(0, 256, (96, 96, 3), dtype=np.uint8)
+        stego_path = tmp_path / "archive.png"
+        stego_path.write_bytes(cli.stego.hide_archive_buffer(
+            {"a.txt": b"alpha", "b.txt": b"beta"}, carrier, "test123", method='lsb'))
+
+        code = cli.run(["extract", "-i", str(stego_path), "-o", str(tmp_path / "out"),
+                        "-p", "test123", "-m", "lsb"])
+
+        assert code == 0
+        assert (tmp_path / "out" / "b.txt").read_bytes() == b"beta"
+
+class TestBatch:
+    def test_runs_plan_manifest(self, cli, tmp_path):
+        """A manifest written by plan runs as a resumable batch"""
+        rng = np.random.default_rng(23)
+        payloads, carriers = tmp_path / "payloads", tmp_path / "carriers"
+        payloads.mkdir()
+        carriers.mkdir()
+        files = {"a.txt": b"alpha" * 20, "b.txt": b"beta" * 20, "c.bin": rng.bytes(2500)}
+        for name, data in files.items():
+            (payloads / name).write_bytes(data)
+        for name, size in [("small.png", 64), ("large.png", 96)]:
+            cv2.imwrite(str(carriers / name), rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+        manifest = tmp_path / "plan.json"
+
+        assert cli.run(["plan", "-d", str(payloads), "-c", str(carriers), "-o",
+                        str(tmp_path / "out"), "-m", "lsb", "--manifest", str(manifest)]) == 0
+        args = ["batch", "hide", str(manifest), "--db", str(tmp_path / "run.sqlite"),
+                "-p", "test123", "-j", "1"]
+        assert cli.run(args) == 0
+
+        output = tmp_path / "out" / "large.png"
+        assert cli.stego.extract_archive(str(output), "test123", 'lsb') == files
+        # The archive job was recorded with its files, so a rerun has nothing left to do
+        assert cli.run(args) == 0
@@ -0,0 +1,45 @@
+import os
+import pytest
+from steganography.compression import (
+    compress, decompress, decompress_stream, estimate_entropy,
+    CODEC_NONE, CODEC_ZLIB, CODEC_LZMA, CODEC_BZ2
+)
+from steganography.exceptions import ExtractionError
+
+TEXT = b"2024-01-01 12:00:00 INFO request handled in 12ms\n" * 2000
+
+class TestCompression:
+    @pytest.mark.parametrize("codec", ['none', 'zlib', 'lzma', 'bz2'])
+    def test_round_trip(self, codec):
+        """Test every codec round-trips and records itself"""
+        codec_id, compressed = compress(TEXT, 6, codec)
+
+        assert codec_id == {'none': CODEC_NONE, 'zlib': CODEC_ZLIB,
+                            'lzma': CODEC_LZMA, 'bz2': CODEC_BZ2}[codec]
+        assert decompress(compressed, codec_id) == TEXT
+
+    def test_auto_selection(self):
+        """Test that random data is stored and text is compressed"""
+        random_data = os.urandom(100_000)
+
+        assert estimate_entropy(random_data) > 7.9
+        assert estimate_entropy(TEXT) < 5
+        assert compress(random_data, 9)[0] == CODEC_NONE
+        assert compress(TEXT, 0)[0] == CODEC_NONE
+        assert compress(TEXT, 6)[0] == CODEC_ZLIB
+        assert compress(TEXT, 9)[0] == CODEC_LZMA
+        assert len(compress(TEXT, 6)[1]) < len(TEXT) // 10
+
+    def test_streaming_decompression(self):
+        """Test decompression from small pieces"""
+        codec_id, compressed = compress(TEXT, 9)
+        pieces = [compressed[i:i+100] for i in range(0, len(compressed), 100)]
+
+        assert b''.join(decompress_stream(pieces, codec_id)) == TEXT
+
+    def test_truncated_stream(self):
+        """Test that a truncated compressed payload is rejected"""
+        codec_id, compressed = compress(TEXT, 6)
+
+        with pytest.raises(ExtractionError):
+            decompress(compressed[:len(compressed) // 2], codec_id)
@@ -1,9 +1,15 @@
+import asyncio
+import threading
 import pytest
 import numpy as np
 import cv2
-from pathlib import Path
-from steganography import SteganoExfil
-from steganography.exceptions import CapacityError, FormatError
+from concurrent.futures import ThreadPoolExecutor
+from steganography import SteganoExfil, HideOptions, KeyCache, KeySession
+from steganography import core, encryption
+from steganography.encryption import encrypted_size
+from steganography.utils import add_error_detection, CONTAINER_MAGIC
+from cryptography.fernet import Fernet
+from steganography.exceptions import CapacityError, FormatError, ExtractionError
 
 @pytest.fixture
 def stego():
@@ -14,11 +20,10 @@ def test_data():
     return b"Hello, World! This is test data."
 
 @pytest.fixture
-def carrier_image():
+def carrier_image(tmp_path):
     # Create a test image
     img = np.zeros((100, 100, 3), dtype=np.uint8)
-    img_path = Path("tests/data/test_carrier.png")
-    img_path.parent.mkdir(parents=True, exist_ok=True)
+    img_path = tmp_path / "test_carrier.png"
     cv2.imwrite(str(img_path), img)
     return str(img_path)
 
@@ -97,4 +102,454 @@ class TestSteganoExfil:
                 carrier_image_path=str(invalid_path),
                 output_path=str(output_path),
                 password=password
-            ) 
\ No newline at end of file
+            )
+
+    def test_lsb_layout_matches_bitstring(self, stego):
+        """Vectorized LSB embedding keeps the MSB-first bit layout"""
+        rng = np.random.default_rng(0)
+        carrier = rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)
+        data = bytes(rng.integers(0, 256, 40, dtype=np.uint8))
+
+        expected = carrier.flatten()
+        bits = ''.join(format(byte, '08b') for byte in data)
+        for i, bit in enumerate(bits):
+            expected[i] = (expected[i] & 254) | int(bit)
+
+        result = stego._hide_lsb(data, carrier)
+
+        assert np.array_equal(result, expected.reshape(carrier.shape))
+        assert not np.shares_memory(result, carrier)
+
+    def test_lsb_inplace(self, stego):
+        """In-place LSB embedding writes into the caller's buffer"""
+        carrier = np.full((8, 8, 3), 255, dtype=np.uint8)
+
+        result = stego._hide_lsb(b"\x00\xff", carrier, inplace=True)
+
+        assert result is carrier
+        assert carrier.reshape(-1)[:8].tolist() == [254] * 8
+        assert carrier.reshape(-1)[8:16].tolist() == [255] * 8
+
+    def test_lsb_extract_reads_only_payload(self, stego):
+        """LSB extraction stops after the announced payload length"""
+        rng = np.random.default_rng(1)
+        carrier = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        payload = b"payload bytes"
+        framed = len(payload).to_bytes(4, byteorder='big') + payload
+
+        image = stego._hide_lsb(framed, carrier)
+
+        assert stego._extract_lsb(image) == payload
+
+    def test_lsb_extract_rejects_bad_length(self, stego):
+        """An impossible length header raises instead of reading garbage"""
+        carrier = np.full((8, 8, 3), 255, dtype=np.uint8)
+
+        with pytest.raises(ExtractionError):
+            stego._extract_lsb(carrier)
+
+    def test_dct_round_trip_noisy_carrier(self, stego):
+        """Block DCT embedding survives PNG encoding of a noisy carrier"""
+        rng = np.random.default_rng(2)
+        carrier = rng.integers(0, 256, (120, 96, 3), dtype=np.uint8)
+        data = bytes(rng.integers(0, 256, stego.capacity(carrier.shape, 'dct').raw_bytes,
+                                  dtype=np.uint8))
+
+        image = stego._hide_dct(data, carrier)
+        _, encoded = cv2.imencode(".png", image)
+        decoded = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+        assert stego._read_dct(decoded, 0, len(data)) == data
+
+    def test_dct_touches_only_payload_blocks(self, stego):
+        """Blocks past the end of the payload are left untouched"""
+        carrier = np.full((64, 64, 3), 128, dtype=np.uint8)
+
+        image = stego._hide_dct(b"\xa5" * 4, carrier)
+
+        changed = np.argwhere((image != carrier).any(axis=2))
+        assert changed.max(axis=0).tolist() <= [7, 31]
+
+    def test_dct_capacity_scales_with_pixels(self, stego):
+        """DCT capacity grows linearly with the number of 8x8 blocks"""
+        small = stego.capacity((80, 80), 'dct')
+        large = stego.capacity((160, 160), 'dct')
+
+        assert large.bits == 4 * small.bits
+
+    @pytest.mark.parametrize("channels", [3, 1])
+    def test_jpeg_carrier_loaded_in_memory(self, stego, tmp_path, channels):
+        """JPEG carriers match the former temp-PNG round trip without side effects"""
+        rng = np.random.default_rng(3)
+        shape = (48, 64, 3) if channels == 3 else (48, 64)
+        path = tmp_path / "carrier.jpg"
+        cv2.imwrite(str(path), rng.integers(0, 256, shape, dtype=np.uint8))
+
+        raw = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+        cv2.imwrite(str(tmp_path / "reference.png"), raw)
+        expected = cv2.imread(str(tmp_path / "reference.png"))
+        (tmp_path / "reference.png").unlink()
+
+        carrier = stego._prepare_carrier_image(str(path))
+
+        assert carrier.dtype == np.uint8 and carrier.shape == (48, 64, 3)
+        assert np.array_equal(carrier, expected)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["carrier.jpg"]
+
+    @pytest.mark.parametrize("wrap", [bytes, memoryview, "array"])
+    def test_in_memory_round_trip(self, stego, test_data, wrap, tmp_path, monkeypatch):
+        """Buffers and arrays round-trip without touching the filesystem"""
+        monkeypatch.chdir(tmp_path)
+        carrier = np.random.default_rng(4).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        if wrap == "array":
+            source = carrier
+        else:
+            source = wrap(cv2.imencode(".png", carrier)[1].tobytes())
+
+        encoded = stego.hide_buffer(test_data, source, "test123", method='lsb')
+        extracted = stego.extract_buffer(memoryview(encoded), "test123", method='lsb')
+
+        assert extracted == test_data
+        assert encoded[:8] == b"\x89PNG\r\n\x1a\n"
+        assert list(tmp_path.iterdir()) == []
+
+    def test_hide_array_leaves_input_untouched(self, stego, test_data):
+        """hide_array returns a new array and keeps the caller's carrier"""
+        carrier = np.full((100, 100, 3), 100, dtype=np.uint8)
+
+        result = stego.hide_array(test_data, carrier, "test123", method='dct')
+
+        assert (carrier == 100).all()
+        assert stego.extract_buffer(result, "test123", method='dct') == test_data
+
+    def test_invalid_buffer(self, stego, test_data):
+        """Undecodable buffers raise FormatError"""
+        with pytest.raises(FormatError):
+            stego.hide_buffer(test_data, b"not an image", "test123")
+
+    @pytest.mark.parametrize("method", ['lsb', 'dct'])
+    def test_streamed_round_trip_multiple_segments(self, stego, method, monkeypatch):
+        """Payloads are embedded and extracted segment by segment"""
+        monkeypatch.setattr(core, "SEGMENT_SIZE", 1000)
+        rng = np.random.default_rng(5)
+        carrier = rng.integers(16, 240, (720, 720, 3), dtype=np.uint8)
+        # The LSB payload also spans several encryption chunks
+        data = bytes(rng.integers(0, 256, 150_000 if method == 'lsb' else 10_000,
+                                  dtype=np.uint8))
+
+        result = stego.hide_array(data, carrier, "test123", method=method)
+
+        assert stego.extract_buffer(result, "test123", method=method) == data
+
+    def test_dct_writes_at_block_offsets(self, stego):
+        """Writing a DCT payload in aligned segments matches a single write"""
+        rng = np.random.default_rng(6)
+        carrier = rng.integers(0, 256, (64, 80, 3), dtype=np.uint8)
+        data = bytes(rng.integers(0, 256, 99, dtype=np.uint8))
+
+        whole = stego._hide_dct(data, carrier)
+        parts = carrier.copy()
+        bounds = [0, 22, 66, len(data)]
+        for start, end in zip(bounds, bounds[1:]):
+            stego._hide_dct(data[start:end], parts, inplace=True, offset=start)
+
+        assert np.array_equal(whole, parts)
+        with pytest.raises(ValueError):
+            stego._hide_dct(b"x", carrier, offset=1)
+
+    def test_key_session_batch(self, stego, test_data):
+        """Carriers hidden under one KeySession extract with the password"""
+        session = KeySession("test123")
+        rng = np.random.default_rng(7)
+        carriers = [rng.integers(0, 256, (64, 64, 3), dtype=np.uint8) for _ in range(3)]
+
+        results = [stego.hide_array(test_data, c, session, method='lsb') for c in carriers]
+
+        for result in results:
+            assert stego.extract_buffer(result, "test123", method='lsb') == test_data
+
+    def test_key_cache_repeat_extraction(self, test_data):
+        """A second extraction of the same image is served from the key cache"""
+        stego = SteganoExfil(key_cache=KeyCache())
+        carrier = np.random.default_rng(8).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        result = stego.hide_array(test_data, carrier, "test123", method='lsb')
+
+        for _ in range(2):
+            assert stego.extract_buffer(result, "test123", method='lsb') == test_data
+        assert stego.key_cache.cache_info()[:2] == (1, 1)
+
+    def test_compressible_payload_fits_small_carrier(self, stego):
+        """Compressible payloads larger than the raw capacity still fit"""
+        carrier = np.random.default_rng(9).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        data = b"INFO request handled\n" * 1000
+        assert len(data) > stego.capacity(carrier.shape, 'lsb').payload_bytes
+
+        result = stego.hide_array(data, carrier, "test123", method='lsb')
+
+        assert stego.extract_buffer(result, "test123", method='lsb') == data
+        with pytest.raises(CapacityError):
+            stego.hide_array(data, carrier, "test123", method='lsb', compression_level=0)
+
+    def test_container_header(self, stego, test_data):
+        """The container header is embedded first and names the method"""
+        carrier = np.random.default_rng(10).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        result = stego.hide_array(test_data, carrier, "test123", method='lsb')
+
+        header = stego.read_header(result, 'lsb')
+        assert stego._read_lsb(result, 0, 4) == CONTAINER_MAGIC
+        assert (header.method, header.codec) == ('lsb', 0)
+        assert header.length == encrypted_size(8 + len(test_data))
+        with pytest.raises(ExtractionError):
+            stego.read_header(result, 'dct')
+
+    @pytest.mark.parametrize("method", ['lsb', 'dct'])
+    def test_plain_image_rejected_before_kdf(self, stego, method, monkeypatch):
+        """Images without hidden data fail before any key derivation"""
+        def no_kdf(*args):
+            raise AssertionError("key derivation should not run")
+        monkeypatch.setattr(encryption, "generate_key", no_kdf)
+        carrier = np.random.default_rng(11).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+
+        with pytest.raises(ExtractionError):
+            stego.extract_buffer(carrier, "test123", method=method)
+
+    def test_legacy_image_extracts(self, stego, test_data):
+        """Images with a bare length prefix and a Fernet payload still extract"""
+        salt, key = encryption.generate_key("test123")
+        detected = add_error_detection(test_data)
+        token = salt + Fernet(key).encrypt(len(detected).to_bytes(4, 'big') + detected)
+        carrier = np.random.default_rng(12).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        image = stego._hide_lsb(len(token).to_bytes(4, 'big') + token, carrier)
+
+        assert stego.extract_buffer(image, "test123", method='lsb') == test_data
+
+    @pytest.mark.parametrize("method", ['lsb', 'dct'])
+    def test_probe_finds_header(self, stego, test_data, method, tmp_path):
+        """probe reads the container header without a password"""
+        carrier = np.random.default_rng(13).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+        path = tmp_path / "stego.png"
+        path.write_bytes(stego.hide_buffer(test_data, carrier, "test123", method=method))
+
+        result = stego.probe(str(path))
+
+        assert result == (str(path), method, 1, 0, encrypted_size(8 + len(test_data)), False, False)
+
+    def test_probe_many(self, stego, test_data, tmp_path):
+        """probe_many reports hits, misses and unreadable files in order"""
+        carrier = np.random.default_rng(14).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        (tmp_path / "a.png").write_bytes(stego.hide_buffer(test_data, carrier, "test123", method='lsb'))
+        cv2.imwrite(str(tmp_path / "b.jpg"), carrier)
+        (tmp_path / "c.png").write_bytes(b"not an image")
+        paths = [str(tmp_path / name) for name in ("a.png", "b.jpg", "c.png")]
+
+        for workers in (1, 2):
+            results = list(stego.probe_many(paths, workers=workers))
+
+            assert [r[0] for r in results] == paths
+            assert results[0][1].method == 'lsb'
+            assert results[1][1:] == (None, None)
+            assert results[2][1] is None and results[2][2]
+
+    def test_archive_round_trip(self, stego, tmp_path):
+        """Several files hidden in one carrier list and extract by name"""
+        files = {"notes.txt": b"meeting at noon\n" * 50, "key.bin": bytes(range(256)),
+                 "empty": b""}
+        carrier = np.random.default_rng(15).integers(0, 256, (256, 256, 3), dtype=np.uint8)
+        cv2.imwrite(str(tmp_path / "carrier.png"), carrier)
+        stego.hide_archive(files, str(tmp_path / "carrier.png"), str(tmp_path / "stego.png"),
+                           "test123", method='dct')
+        path = str(tmp_path / "stego.png")
+
+        assert [e.name for e in stego.list_archive(path, "test123")] == list(files)
+        assert stego.extract_member(path, "key.bin", "test123") == files["key.bin"]
+        assert stego.extract_archive(path, "test123") == files
+        assert stego.probe(path).archive
+        assert stego.read_header(path, 'dct').archive
+        with pytest.raises(ExtractionError):
+            stego.extract_member(path, "missing", "test123")
+        with pytest.raises(ExtractionError):
+            stego.extract_data(path, "test123")
+
+    def test_sharded_round_trip(self, stego, tmp_path):
+        """Data larger than any one carrier is split and reassembled in any order"""
+        rng = np.random.default_rng(17)
+        carriers, outputs = [], []
+        for i, size in enumerate([(120, 160), (64, 64), (96, 200)]):
+            carriers.append(str(tmp_path / f"carrier{i}.png"))
+            outputs.append(str(tmp_path / f"stego{i}.png"))
+            cv2.imwrite(carriers[-1], rng.integers(0, 256, size + (3,), dtype=np.uint8))
+        data = rng.bytes(9000)
+        assert len(data) > max(stego.capacity(cv2.imread(p).shape, 'lsb').payload_bytes
+                               for p in carriers)
+
+        count = stego.hide_sharded(data, carriers, outputs, "test123", method='lsb', workers=2)
+
+        assert count == 3
+        assert stego.extract_sharded(outputs[::-1], "test123", method='lsb', workers=2) == data
+        assert stego.probe(outputs[1]).shard
+        with pytest.raises(ExtractionError):
+            stego.extract_sharded(outputs[:2], "test123", method='lsb', workers=1)
+        with pytest.raises(ExtractionError):
+            stego.extract_data(outputs[0], "test123", method='lsb')
+        with pytest.raises(CapacityError):
+            stego.hide_sharded(rng.bytes(20000), carriers, outputs, "test123", method='lsb')
+
+    def test_sharded_past_32_bits(self, stego, tmp_path, monkeypatch):
+        """Sets of 4 GiB and more are framed with their full length"""
+        total = (1 << 32) + 6
+        source = tmp_path / "data.bin"
+        source.write_bytes(bytes(range(16)))
+        carriers = []
+        for i, size in enumerate([(16, 16), (32, 32)]):
+            carriers.append(str(tmp_path / f"carrier{i}.png"))
+            cv2.imwrite(carriers[-1], np.zeros(size + (3,), dtype=np.uint8))
+        monkeypatch.setattr(core.os.path, "getsize", lambda path: total)
+        monkeypatch.setattr(core, "shard_capacity",
+                            lambda shape, method: 16 if shape[0] == 16 else 1 << 33)
+        streams = []
+
+        def first_job(fn, jobs, workers):
+            streams.append(next(jobs)[3])  # Only the first, small slice is read
+            return iter(())
+        monkeypatch.setattr(core, "_pool_map", first_job)
+
+        assert stego.hide_sharded(source, carriers, ["a.png", "b.png"], "test123") == 2
+        envelope = streams[0][core.CONTAINER_HEADER_SIZE:]
+        header, body = core.unpack_shard(encryption.decrypt_data(envelope, "test123"))
+        assert (header.index, header.count, header.total) == (0, 2, total)
+        assert body == bytes(range(len(body)))
+
+    @pytest.mark.parametrize("method,workers", [('lsb', 2), ('dct', 1)])
+    def test_fanout(self, stego, tmp_path, method, workers):
+        """One payload lands in every carrier; small carriers report an error"""
+        rng = np.random.default_rng(18)
+        sizes = [(96, 96), (128, 80), (8, 8), (96, 96)]
+        carriers = [str(tmp_path / f"carrier{i}.png") for i in range(len(sizes))]
+        outputs = [str(tmp_path / f"stego{i}.png") for i in range(len(sizes))]
+        for path, size in zip(carriers, sizes):
+            cv2.imwrite(path, rng.integers(0, 256, size + (3,), dtype=np.uint8))
+        data = b"provenance: batch 42"
+
+        results = list(stego.hide_fanout(data, carriers, outputs, "test123",
+                                         method=method, workers=workers))
+
+        assert [(c, o) for c, o, _ in results] == list(zip(carriers, outputs))
+        assert [error is None for _, _, error in results] == [True, True, False, True]
+        for i in (0, 1, 3):
+            assert stego.extract_data(outputs[i], "test123", method=method) == data
+
+    def test_archive_member_random_access(self, stego, monkeypatch):
+        """Extracting one member decrypts only the chunks that hold it"""
+        rng = np.random.default_rng(16)
+        files = [(f"part{i}", rng.bytes(35_000)) for i in range(5)]
+        carrier = rng.integers(0, 256, (720, 720, 3), dtype=np.uint8)
+        image = stego.hide_archive_buffer(files, carrier, "test123", method='lsb')
+
+        decrypted = []
+        original = core.EnvelopeReader.decrypt_chunk
+        monkeypatch.setattr(core.EnvelopeReader, "decrypt_chunk",
+                            lambda self, i, sealed: decrypted.append(i) or original(self, i, sealed))
+
+        assert stego.extract_member(image, "part4", "test123", method='lsb') == files[4][1]
+        assert decrypted == [0, 2]
+
+    def test_hide_options(self, stego):
+        """Options are validated and clamped, and replace the keyword arguments"""
+        options = HideOptions('lsb', quality=3.0, compression_level=12)
+        assert (options.quality, options.compression_level) == (1.0, 9)
+        with pytest.raises(ValueError):
+            HideOptions('fft')
+
+        carrier = np.zeros((64, 64, 3), dtype=np.uint8)
+        image = stego.hide_buffer(b"options", carrier, "test123", method='dct', options=options)
+        assert stego.read_header(image, 'lsb').method == 'lsb'
+
+    def test_concurrent_calls_share_engine(self):
+        """One engine serves concurrent hides and extracts with different options"""
+        engine = SteganoExfil(key_cache=KeyCache())
+        session = KeySession("test123")
+        rng = np.random.default_rng(19)
+        carrier = rng.integers(0, 256, (160, 160, 3), dtype=np.uint8)
+        original = carrier.copy()
+        jobs = [(rng.bytes(int(rng.integers(1, 400))),
+                 HideOptions(('lsb', 'dct')[i % 2], compression_level=i % 10))
+                for i in range(48)]
+
+        def round_trip(job):
+            data, options = job
+            image = engine.hide_buffer(data, carrier, session, options=options)
+            return engine.extract_buffer(image, "test123", method=options.method)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(round_trip, jobs))
+
+        assert results == [data for data, _ in jobs]
+        assert np.array_equal(carrier, original)
+
+    def test_async_hide_extract(self, tmp_path):
+        """Concurrent ahide/aextract calls round-trip within the limiter's bound"""
+        engine = SteganoExfil(key_cache=KeyCache())
+        carrier = str(tmp_path / "carrier.png")
+        cv2.imwrite(carrier, np.random.default_rng(23).integers(0, 256, (160, 160, 3),
+                                                                 dtype=np.uint8))
+        active, peak = [0], [0]
+
+        class Limiter:
+            def __init__(self):
+                self.semaphore = asyncio.Semaphore(2)
+
+            async def __aenter__(self):
+                await self.semaphore.acquire()
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+
+            async def __aexit__(self, *exc):
+                active[0] -= 1
+                self.semaphore.release()
+
+        async def main():
+            limiter = Limiter()
+            outputs = [str(tmp_path / f"stego{i}.png") for i in range(6)]
+            await asyncio.gather(*(
+                engine.ahide(f"async {i}".encode(), carrier, output, "test123",
+                             ('lsb', 'dct')[i % 2], limiter=limiter)
+                for i, output in enumerate(outputs)))
+            extracted = await asyncio.gather(*(
+                engine.aextract(output, "test123", ('lsb', 'dct')[i % 2], limiter=limiter)
+                for i, output in enumerate(outputs)))
+            assert await engine.aextract(outputs[1], "test123", 'dct') == b"async 1"
+            with pytest.raises(core.EncryptionError):
+                await engine.aextract(outputs[0], "wrong", 'lsb')
+            with pytest.raises(FormatError):
+                await engine.ahide(b"data", str(tmp_path / "missing.png"),
+                                   str(tmp_path / "x.png"), "test123")
+            return extracted
+
+        assert asyncio.run(main()) == [f"async {i}".encode() for i in range(6)]
+        assert peak[0] == 2
+        assert engine.key_cache.cache_info().hits == 1
+
+    def test_async_cancel_between_stages(self, carrier_image, tmp_path):
+        """A cancelled ahide finishes its running stage and writes nothing"""
+        engine = SteganoExfil()
+        output = tmp_path / "stego.png"
+        gate = threading.Event()
+
+        async def main():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(gate.wait)  # Holds the first CPU stage back
+                limiter = asyncio.Semaphore(1)
+                task = asyncio.create_task(engine.ahide(
+                    b"never written", carrier_image, str(output), "test123", 'lsb',
+                    executor=executor, limiter=limiter))
+                await asyncio.sleep(0.2)
+                task.cancel()
+                await asyncio.sleep(0.05)
+                assert limiter.locked()  # Held until the queued stage has run
+                gate.set()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                assert not limiter.locked()
+
+        asyncio.run(main())
+        assert not output.exists()
@@ -1,5 +1,14 @@
+import base64
+import os
+import time
 import pytest
-from steganography.encryption import encrypt_data, decrypt_data, generate_key
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from steganography import encryption
+from steganography.encryption import (
+    encrypt_data, decrypt_data, generate_key, encrypted_size,
+    encrypt_stream, decrypt_stream, envelope_version, KeyCache, KeySession, CHUNK_SIZE
+)
 from steganography.exceptions import EncryptionError
 
 class TestEncryption:
@@ -41,4 +50,118 @@ class TestEncryption:
         salt, key1 = generate_key(password)
         _, key2 = generate_key(password, salt)
 
-        assert key1 == key2 
\ No newline at end of file
+        assert key1 == key2 
+
+    def test_stream_cycle_across_chunks(self):
+        """Test streaming encryption over several chunks and piece sizes"""
+        data = os.urandom(2 * CHUNK_SIZE + 123)
+        pieces = [data[i:i+1000] for i in range(0, len(data), 1000)]
+        encrypted = b''.join(encrypt_stream(pieces, "test123"))
+
+        assert len(encrypted) == encrypted_size(len(data))
+        assert envelope_version(encrypted) == encryption.ENVELOPE_VERSION
+
+        segments = [encrypted[i:i+777] for i in range(0, len(encrypted), 777)]
+        assert b''.join(decrypt_stream(segments, "test123")) == data
+
+    @pytest.mark.parametrize("length", [0, CHUNK_SIZE])
+    def test_chunk_boundaries(self, length):
+        """Test empty data and data filling exactly one chunk"""
+        data = os.urandom(length)
+        encrypted = encrypt_data(data, "test123")
+
+        assert len(encrypted) == encrypted_size(length)
+        assert decrypt_data(encrypted, "test123") == data
+
+    def test_truncation_detected(self):
+        """Test that dropping trailing chunks fails authentication"""
+        data = os.urandom(CHUNK_SIZE + 10)
+        encrypted = encrypt_data(data, "test123")
+        truncated = encrypted[:encrypted_size(CHUNK_SIZE)]
+
+        with pytest.raises(EncryptionError):
+            decrypt_data(truncated, "test123")
+
+    def test_tamper_detected(self):
+        """Test that modified ciphertext fails authentication"""
+        encrypted = bytearray(encrypt_data(b"Test data", "test123"))
+        encrypted[-20] ^= 1
+
+        with pytest.raises(EncryptionError):
+            decrypt_data(bytes(encrypted), "test123")
+
+    def test_legacy_fernet(self):
+        """Test that salt + Fernet data from older versions still decrypts"""
+        salt, key = generate_key("test123")
+        legacy = salt + Fernet(key).encrypt(b"Old secret")
+
+        assert envelope_version(legacy) == 1
+        assert decrypt_data(legacy, "test123") == b"Old secret"
+
+    def test_version2_envelope(self):
+        """Test that envelopes without per-item keys still decrypt"""
+        salt, key = generate_key("test123")
+        prefix = os.urandom(7)
+        header = b"\x02" + salt + prefix
+        nonce = prefix + (0).to_bytes(4, byteorder='big') + b"\x01"
+        sealed = AESGCM(base64.urlsafe_b64decode(key)).encrypt(nonce, b"Old secret", header)
+
+        assert decrypt_data(header + sealed, "test123") == b"Old secret"
+
+    def test_key_session_derives_once(self, monkeypatch):
+        """Test that a session runs PBKDF2 once for a batch of envelopes"""
+        calls = []
+        original = encryption.generate_key
+        monkeypatch.setattr(encryption, "generate_key",
+                            lambda *args: calls.append(args) or original(*args))
+
+        session = KeySession("test123")
+        blobs = [encrypt_data(b"item %d" % i, session) for i in range(5)]
+
+        assert len(calls) == 1
+        assert len({blob[:encryption.HEADER_SIZE] for blob in blobs}) == 5
+        assert [decrypt_data(blob, session) for blob in blobs] == [b"item %d" % i for i in range(5)]
+        assert len(calls) == 1
+        assert decrypt_data(blobs[0], "test123") == b"item 0"
+
+    def test_key_session_salt_mismatch(self):
+        """Test that a session refuses data from another session"""
+        encrypted = encrypt_data(b"Test data", KeySession("test123"))
+
+        with pytest.raises(EncryptionError):
+            decrypt_data(encrypted, KeySession("test123"))
+
+    def test_key_cache(self, monkeypatch):
+        """Test that a cached (password, salt) skips the KDF until cleared"""
+        encrypted = encrypt_data(b"Test data", "test123")
+        cache = KeyCache()
+        calls = []
+        original = encryption.generate_key
+        monkeypatch.setattr(encryption, "generate_key",
+                            lambda *args: calls.append(args) or original(*args))
+
+        for _ in range(3):
+            assert decrypt_data(encrypted, "test123", cache) == b"Test data"
+        assert len(calls) == 1
+        assert cache.cache_info() == (2, 1, 32, 1)
+
+        with pytest.raises(EncryptionError):
+            decrypt_data(encrypted, "wrong", cache)
+        cache.clear()
+        assert cache.cache_info() == (0, 0, 32, 0)
+
+    def test_key_cache_bounds(self, monkeypatch):
+        """Test LRU eviction, TTL expiry and that no password is retained"""
+        cache = KeyCache(maxsize=2, ttl=60)
+        salts = [os.urandom(16) for _ in range(3)]
+        for salt in salts:
+            cache.session("test123", salt)
+        cache.session("test123", salts[2])
+
+        assert cache.cache_info() == (1, 3, 2, 2)
+        assert all(b"test123" not in digest for digest in cache._entries)
+
+        now = time.monotonic()
+        monkeypatch.setattr(encryption.time, "monotonic", lambda: now + 61)
+        cache.session("test123", salts[2])
+        assert cache.misses == 4
@@ -0,0 +1,78 @@
+import struct
+import zlib
+import pytest
+import numpy as np
+import cv2
+from steganography.imagefile import read_region
+from steganography.exceptions import FormatError
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+def _png(rgb: np.ndarray, filter_type: int) -> bytes:
+    """Encode an RGB image with the same PNG filter on every row"""
+    height, width, bpp = rgb.shape
+    prev = bytes(width * bpp)
+    raw = bytearray()
+    for row in rgb.reshape(height, -1):
+        cur = row.tobytes()
+        line = bytearray()
+        for i, x in enumerate(cur):
+            a = cur[i - bpp] if i >= bpp else 0
+            b, c = prev[i], prev[i - bpp] if i >= bpp else 0
+            pred = [0, a, b, (a + b) >> 1, _paeth(a, b, c)][filter_type]
+            line.append((x - pred) & 0xFF)
+        raw += bytes([filter_type]) + line
+        prev = cur
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr)
+            + chunk(b'IDAT', zlib.compress(bytes(raw))) + chunk(b'IEND', b''))
+
+class TestReadRegion:
+    @pytest.mark.parametrize("filter_type", range(5))
+    def test_png_filters(self, tmp_path, filter_type):
+        """Every PNG filter type decodes to the same pixels as OpenCV"""
+        rgb = np.random.default_rng(filter_type).integers(0, 256, (20, 40, 3), dtype=np.uint8)
+        path = tmp_path / "image.png"
+        path.write_bytes(_png(rgb, filter_type))
+
+        region = read_region(path, 10, 16)
+
+        assert np.array_equal(region, cv2.imread(str(path))[:10, :16])
+
+    @pytest.mark.parametrize("ext,shape", [(".png", (30, 50)), (".png", (30, 50, 4)),
+                                           (".bmp", (30, 50, 3)), (".bmp", (31, 7, 3))])
+    def test_matches_opencv(self, tmp_path, ext, shape):
+        """Gray, RGBA and bottom-up BMP images match cv2.imread"""
+        image = np.random.default_rng(1).integers(0, 256, shape, dtype=np.uint8)
+        path = tmp_path / f"image{ext}"
+        cv2.imwrite(str(path), image)
+
+        region = read_region(path, 16, 64)
+
+        assert np.array_equal(region, cv2.imread(str(path))[:16, :64])
+
+    def test_unsupported_formats(self, tmp_path):
+        """JPEGs and palette BMPs are left to a full decode"""
+        image = np.zeros((16, 16), dtype=np.uint8)
+        cv2.imwrite(str(tmp_path / "image.jpg"), image)
+        cv2.imwrite(str(tmp_path / "image.bmp"), image)
+
+        assert read_region(tmp_path / "image.jpg", 8, 8) is None
+        assert read_region(tmp_path / "image.bmp", 8, 8) is None
+
+    def test_truncated_png(self, tmp_path):
+        """Truncated PNG data raises FormatError"""
+        path = tmp_path / "image.png"
+        cv2.imwrite(str(path), np.random.default_rng(2).integers(0, 256, (64, 64, 3), dtype=np.uint8))
+        path.write_bytes(path.read_bytes()[:200])
+
+        with pytest.raises(FormatError):
+            read_region(path, 64, 64)
@@ -0,0 +1,61 @@
+import os
+import pytest
+from steganography import SteganoExfil, HideJob
+from steganography.pipeline import Pipeline
+
+def _square(task):
+    if task < 0:
+        raise ValueError("negative")
+    return task * task
+
+def _shared_blocks():
+    return os.path.isdir('/dev/shm') and set(os.listdir('/dev/shm'))
+
+class TestPipeline:
+    def test_stages_and_stats(self):
+        """Test that jobs pass every stage and failures are reported per job"""
+        released = []
+        pipeline = Pipeline(range(-1, 8), lambda job: (job, f"state{job}"), _square,
+                            lambda job, state, squared: (state, squared),
+                            release=released.append, workers=2, depth=2)
+
+        results = sorted(pipeline)
+
+        assert [r.index for r in results] == list(range(9))
+        assert results[0].error == "negative"
+        assert [r.result for r in results[1:]] == [(f"state{n}", n * n) for n in range(8)]
+        assert sorted(released) == sorted(f"state{n}" for n in range(-1, 8))
+        stats = {s.name: s for s in pipeline.stats()}
+        assert (stats['read'].jobs, stats['process'].jobs, stats['write'].jobs) == (9, 9, 8)
+        assert all(0 <= s.utilization <= 1 for s in stats.values())
+
+    def test_hide_pipeline(self, carriers, tmp_path):
+        """Test that pipelined hides extract and bad jobs do not stop the others"""
+        stego = SteganoExfil()
+        shm = _shared_blocks()
+        jobs = [HideJob(f"payload {i}".encode(), c, str(tmp_path / f"stego{i}.png"), 'lsb')
+                for i, c in enumerate(carriers)]
+        jobs.append(HideJob(b"lost", str(tmp_path / "missing.png"), str(tmp_path / "x.png")))
+        jobs.append(HideJob(b"no output", carriers[0]))
+
+        results = sorted(stego.hide_pipeline(jobs, "test123", workers=2))
+
+        assert [r.error is None for r in results] == [True] * 6 + [False, False]
+        for job in jobs[:6]:
+            assert stego.extract_data(job.output, "test123", method='lsb') == job.data
+        if shm is not False:
+            assert _shared_blocks() == shm
+
+    def test_stopping_early_frees_blocks(self, carriers, tmp_path):
+        """Test that abandoning a pipeline releases the jobs still queued"""
+        stego = SteganoExfil()
+        shm = _shared_blocks()
+        jobs = [HideJob(b"data", c, str(tmp_path / f"stego{i}.png"))
+                for i, c in enumerate(carriers * 4)]
+        results = iter(stego.hide_pipeline(jobs, "test123", workers=1, depth=2))
+
+        assert next(results).error is None
+        results.close()
+
+        if shm is not False:
+            assert _shared_blocks() == shm
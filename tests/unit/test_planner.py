@@ -0,0 +1,70 @@
+import os
+import pytest
+import numpy as np
+import cv2
+from steganography import SteganoExfil
+from steganography.planner import plan_jobs, read_manifest, write_manifest
+from steganography.utils import capacity
+from steganography.exceptions import ValidationError
+
+@pytest.fixture
+def pool(tmp_path):
+    """Carriers of three sizes and payloads of known sizes"""
+    carriers = []
+    for name, size in [("big", (200, 200)), ("mid", (120, 120)), ("small", (64, 64))]:
+        path = tmp_path / f"{name}.png"
+        cv2.imwrite(str(path), np.random.default_rng(len(name)).integers(
+            0, 256, size + (3,), dtype=np.uint8))
+        carriers.append(str(path))
+    payloads = []
+    for name, size in [("a.bin", 900), ("b.bin", 300), ("c.bin", 200), ("huge.bin", 20000)]:
+        path = tmp_path / name
+        path.write_bytes(os.urandom(size))
+        payloads.append(str(path))
+    return carriers, payloads
+
+class TestPlanner:
+    def test_fewest_packs_into_smallest_carrier(self, pool, tmp_path):
+        """Test that small payloads share one carrier, moved to the smallest that fits"""
+        carriers, payloads = pool
+        plan = plan_jobs(payloads, carriers, tmp_path / "out", method='lsb')
+
+        assert [job.carrier for job in plan.jobs] == [carriers[1]]
+        assert sorted(plan.jobs[0].files) == sorted(payloads[:3])
+        assert plan.unplaced == [payloads[3]]
+        for job in plan.jobs:
+            assert job.embedded_bytes <= job.capacity_bytes
+            assert job.capacity_bytes == capacity(cv2.imread(job.carrier).shape, 'lsb').raw_bytes
+
+    def test_balanced_spreads_payloads(self, pool, tmp_path):
+        """Test that the balanced strategy spreads payloads to lower the peak load"""
+        carriers, payloads = pool
+        fewest = plan_jobs(payloads[:3], carriers, tmp_path / "out", method='lsb')
+        balanced = plan_jobs(payloads[:3], carriers, tmp_path / "out", method='lsb',
+                             strategy='balanced')
+
+        def peak(plan):
+            return max(job.embedded_bytes / job.capacity_bytes for job in plan.jobs)
+
+        assert len(balanced.jobs) > len(fewest.jobs)
+        assert peak(balanced) < peak(fewest)
+        assert sorted(f for job in balanced.jobs for f in job.files) == sorted(payloads[:3])
+
+    def test_manifest_round_trip_and_execute(self, pool, tmp_path):
+        """Test that a written manifest executes and every payload extracts"""
+        carriers, payloads = pool
+        path = tmp_path / "plan.json"
+        write_manifest(plan_jobs(payloads, carriers + [str(path)], tmp_path / "out",
+                                 method='lsb'), path)
+        plan = read_manifest(path)
+        stego = SteganoExfil()
+
+        assert plan.unreadable == [str(path)]
+        assert [error for _, error in stego.execute_plan(plan, "pw")] == [None]
+        job = plan.jobs[0]
+        extracted = stego.extract_archive(job.output, "pw", method='lsb')
+        assert extracted == {os.path.basename(p): open(p, 'rb').read() for p in job.files}
+
+        path.write_text('{"version": 99}')
+        with pytest.raises(ValidationError):
+            read_manifest(path)
@@ -0,0 +1,85 @@
+import os
+import socket
+import threading
+import pytest
+import numpy as np
+import cv2
+from concurrent.futures.process import BrokenProcessPool
+from steganography.threads import pool_workers
+from interfaces.client import StegoClient, ServerError, forward
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                                reason="needs Unix domain sockets")
+
+@pytest.fixture
+def stego_server(tmp_path):
+    from interfaces.server import StegoServer
+    address = str(tmp_path / "stego.sock")
+    server = StegoServer(address, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    assert not os.path.exists(address)
+
+@pytest.fixture
+def server(stego_server):
+    return stego_server.server_address
+
+@pytest.fixture
+def carrier(tmp_path):
+    path = str(tmp_path / "carrier.png")
+    cv2.imwrite(path, np.random.default_rng(22).integers(0, 256, (64, 96, 3), dtype=np.uint8))
+    return path
+
+class TestServer:
+    def test_requests(self, server, carrier, tmp_path):
+        """Test that client requests round-trip and errors reach the caller"""
+        assert os.stat(server).st_mode & 0o777 == 0o600
+        with StegoClient(server) as client:
+            assert client.ping()['workers'] == 1
+            stego = str(tmp_path / "stego.png")
+            assert client.hide(b"over the socket", carrier, "test123", stego, 'lsb') == stego
+            assert client.extract(stego, "test123", 'lsb') == b"over the socket"
+            assert client.probe(stego)['method'] == 'lsb'
+            assert client.probe(carrier) is None
+            assert client.capacity(carrier, 'lsb') == client.capacity((64, 96), 'lsb')
+
+            png = client.hide(b"in memory", carrier, "test123", method='lsb')
+            (tmp_path / "memory.png").write_bytes(png)
+            assert client.extract(tmp_path / "memory.png", "test123", 'lsb') == b"in memory"
+
+            with pytest.raises(ServerError) as error:
+                client.extract(stego, "wrong", 'lsb')
+            assert error.value.kind == 'EncryptionError'
+
+    def test_forward(self, server, carrier, tmp_path, monkeypatch, capsys):
+        """Test that stego-cli commands run on the server from the caller's directory"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "data.txt").write_bytes(b"forwarded")
+
+        assert forward(['hide', '-i', carrier, '-d', 'data.txt', '-o', 'out.png',
+                        '-p', 'test123', '-m', 'lsb'], server) == 0
+        assert forward(['extract', '-i', 'out.png', '-o', 'back.txt',
+                        '-p', 'test123', '-m', 'lsb'], server) == 0
+        assert (tmp_path / "back.txt").read_bytes() == b"forwarded"
+        assert forward(['extract', '-i', 'out.png', '-o', 'x', '-p', 'bad', '-m', 'lsb'],
+                       server) == 1
+        assert "Error" in capsys.readouterr().err
+        assert forward(['plan', '-d', '.'], server) is None
+        assert forward(['probe', 'out.png'], str(tmp_path / "absent.sock")) is None
+
+    def test_worker_crash_replaces_pool(self, stego_server, carrier):
+        """Test that requests keep working after a worker process died"""
+        broken = stego_server.pool
+        assert isinstance(broken.submit(os._exit, 1).exception(), BrokenProcessPool)
+
+        with StegoClient(stego_server.server_address) as client:
+            assert client.probe(carrier) is None
+        assert stego_server.pool is not broken
+
+    def test_workers_do_not_nest_pools(self, stego_server):
+        """Test that batches forwarded to a worker run in the worker itself"""
+        assert stego_server.pool.submit(pool_workers, 4).result() == 1
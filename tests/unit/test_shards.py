@@ -0,0 +1,45 @@
+import pytest
+import zlib
+from steganography.shards import (
+    SHARD_HEADER, ShardHeader, join_shards, pack_shard, shard_capacity, split_sizes, unpack_shard
+)
+from steganography.utils import capacity, framed_size
+from steganography.exceptions import CapacityError, ExtractionError, IntegrityError
+
+class TestShards:
+    def test_split_sizes(self):
+        """Test that slices follow capacity and never exceed it"""
+        assert split_sizes(100, [300, 100, 0]) == [75, 25, 0]
+        sizes = split_sizes(1001, [1000, 7, 3])
+        assert sum(sizes) == 1001
+        assert all(s <= c for s, c in zip(sizes, [1000, 7, 3]))
+        with pytest.raises(CapacityError):
+            split_sizes(11, [5, 5])
+
+    def test_shard_capacity_is_exact(self):
+        """Test that a full shard frames to no more than the raw capacity"""
+        info = capacity((64, 64), 'lsb')
+        room = shard_capacity((64, 64), 'lsb')
+        # framed_size counts the error detection frame the shard header replaces
+        extra = SHARD_HEADER.size - 8
+        assert framed_size(room + extra) <= info.raw_bytes < framed_size(room + extra + 1)
+
+    def test_join_any_order(self):
+        """Test that shards reassemble regardless of input order"""
+        parts = [b"abc", b"", b"defg"]
+        shards = [unpack_shard(pack_shard(ShardHeader(b"s" * 16, i, 3, 7, zlib.crc32(p)), p))
+                  for i, p in enumerate(parts)]
+
+        assert join_shards(reversed(shards)) == b"abcdefg"
+        with pytest.raises(ExtractionError):
+            join_shards(shards[:2])
+        with pytest.raises(ExtractionError):
+            join_shards(shards + [shards[0]])
+        with pytest.raises(IntegrityError):
+            join_shards(shards[:2] + [(shards[2][0], b"defh")])
+
+    def test_total_past_32_bits(self):
+        """Test that set lengths of 4 GiB and more survive the shard header"""
+        header = ShardHeader(b"s" * 16, 1, 2, (1 << 32) + 6, 0)
+
+        assert unpack_shard(pack_shard(header, b"")) == (header, b"")
@@ -0,0 +1,44 @@
+import cv2
+import pytest
+from threadpoolctl import threadpool_info, threadpool_limits
+from steganography import threads
+from steganography.exceptions import ConfigError
+
+def _native_threads(_=None):
+    blas = {info['num_threads'] for info in threadpool_info() if info['user_api'] == 'blas'}
+    return cv2.getNumThreads(), blas
+
+@pytest.fixture(autouse=True)
+def restore_threads(monkeypatch):
+    monkeypatch.delenv(threads.THREADS_ENV, raising=False)
+    budget = threads._budget
+    opencv, blas = _native_threads()
+    yield
+    threads._budget = budget
+    threads.set_native_threads(opencv)
+    threadpool_limits(max(blas, default=1), user_api='blas')
+
+class TestThreads:
+    def test_resolve_order(self, monkeypatch):
+        """Test that a flag beats the environment, which beats the setting"""
+        assert threads.resolve_threads(setting=3) == 3
+        monkeypatch.setenv(threads.THREADS_ENV, '5')
+        assert threads.resolve_threads(setting=3) == 5
+        assert threads.resolve_threads(2, setting=3) == 2
+        monkeypatch.setenv(threads.THREADS_ENV, 'many')
+        with pytest.raises(ConfigError):
+            threads.resolve_threads()
+        with pytest.raises(ConfigError):
+            threads.resolve_threads(0)
+
+    def test_budget_sizes_libraries_and_pools(self):
+        """Test that the budget sizes native pools here and is split across workers"""
+        assert threads.configure_threads(4) == 4
+        assert _native_threads() == (4, {4})
+        assert threads.pool_workers() == 4
+        assert threads.worker_threads(4) == 1
+
+        with threads.process_pool(2) as pool:
+            assert list(pool.map(_native_threads, range(2))) == [(2, {2})] * 2
+        with threads.process_pool(threads.pool_workers()) as pool:
+            assert list(pool.map(_native_threads, range(4))) == [(1, {1})] * 4
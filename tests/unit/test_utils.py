@@ -0,0 +1,56 @@
+import os
+import pytest
+import numpy as np
+import cv2
+from steganography import SteganoExfil
+from steganography.utils import capacity, framed_size, image_dimensions
+from steganography.exceptions import CapacityError, FormatError
+
+class TestCapacity:
+    def test_capacity_closed_form(self):
+        """Raw capacity follows from the dimensions alone"""
+        assert capacity((100, 100, 3), 'lsb').bits == 30000
+        assert capacity((100, 100), 'dct').bits == 12 * 12 * 11
+
+    def test_payload_bytes_is_exact(self, tmp_path):
+        """payload_bytes is the largest incompressible data size that still fits"""
+        carrier = tmp_path / "carrier.png"
+        cv2.imwrite(str(carrier), np.zeros((40, 40, 3), dtype=np.uint8))
+        info = capacity((40, 40), 'lsb')
+        stego = SteganoExfil()
+
+        assert framed_size(info.payload_bytes) <= info.raw_bytes
+        assert framed_size(info.payload_bytes + 1) > info.raw_bytes
+        stego.hide_data(os.urandom(info.payload_bytes), str(carrier),
+                        str(tmp_path / "out.png"), "pw", method='lsb')
+        with pytest.raises(CapacityError):
+            stego.hide_data(os.urandom(info.payload_bytes + 1), str(carrier),
+                            str(tmp_path / "out.png"), "pw", method='lsb')
+
+    @pytest.mark.parametrize("shape", [(33, 47), (64, 9)])
+    def test_overhead_does_not_fit(self, tmp_path, shape):
+        """Carriers too small for the framing report -1, not 0 bytes free"""
+        carrier = tmp_path / "carrier.png"
+        cv2.imwrite(str(carrier), np.zeros(shape + (3,), dtype=np.uint8))
+
+        assert capacity(shape, 'dct').payload_bytes == -1
+        with pytest.raises(CapacityError):
+            SteganoExfil().hide_data(b'', str(carrier), str(tmp_path / "out.png"), "pw")
+
+    def test_unknown_method(self):
+        """Unknown methods are rejected"""
+        with pytest.raises(ValueError):
+            capacity((100, 100), 'fft')
+
+class TestImageDimensions:
+    @pytest.mark.parametrize("ext", [".png", ".jpg", ".bmp"])
+    def test_header_dimensions(self, ext):
+        """Dimensions are read from PNG, JPEG and BMP headers"""
+        _, encoded = cv2.imencode(ext, np.zeros((37, 53, 3), dtype=np.uint8))
+
+        assert image_dimensions(encoded.tobytes()) == (37, 53)
+
+    def test_unknown_header(self):
+        """Non-image data raises FormatError"""
+        with pytest.raises(FormatError):
+            image_dimensions(b"not an image at all")